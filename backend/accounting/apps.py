@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounting'
+
+    def ready(self):
+        from inventory.item_index import register_item_model
+        register_item_model(self.get_model('Item'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+from backend.utils.tree import rebuild_paths
+
+
+def backfill_account_paths(apps, schema_editor):
+    rebuild_paths(apps.get_model('accounting', 'Account'), parent_field='parent_account')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_customer_item_ledgerentry_supplier_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_account_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def link_inventory_items(apps, schema_editor):
+    # Accounting items carry no SKU, so only names that are unique on both sides are linked
+    Item = apps.get_model('accounting', 'Item')
+    InventoryItem = apps.get_model('inventory', 'Item')
+
+    inventory_names = Counter(InventoryItem.objects.values_list('name', flat=True))
+    inventory_ids = {name: pk for pk, name in InventoryItem.objects.values_list('id', 'name') if inventory_names[name] == 1}
+    accounting_names = Counter(Item.objects.values_list('name', flat=True))
+    linked = []
+    for item in Item.objects.filter(inventory_item__isnull=True).only('id', 'name').iterator():
+        if accounting_names[item.name] == 1 and item.name in inventory_ids:
+            item.inventory_item_id = inventory_ids[item.name]
+            linked.append(item)
+    Item.objects.bulk_update(linked, ['inventory_item'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_account_depth_account_path'),
+        ('inventory', '0006_itemgroup_depth_itemgroup_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='accounting_items', to='inventory.item'),
+        ),
+        migrations.RunPython(link_inventory_items, migrations.RunPython.noop),
+    ]
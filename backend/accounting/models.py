@@ -1,5 +1,7 @@
 from django.db import models
 
+from backend.utils.tree import MaterializedPathModel
+
 # Create your models here.
 
 # Company details
@@ -16,7 +18,9 @@ class Company(models.Model):
 
 
 # Chart of Accounts
-class Account(models.Model):
+class Account(MaterializedPathModel):
+    parent_field = 'parent_account'
+
     ACCOUNT_TYPES = [
         ('Asset', 'Asset'),
         ('Liability', 'Liability'),
@@ -239,6 +243,7 @@ class Item(models.Model):
     description = models.TextField(null=True, blank=True)
     cost_price = models.DecimalField(max_digits=12, decimal_places=2)
     sale_price = models.DecimalField(max_digits=12, decimal_places=2)
+    inventory_item = models.ForeignKey('inventory.Item', on_delete=models.SET_NULL, null=True, blank=True, related_name='accounting_items')
 
 
 class PurchaseInvoiceItem(models.Model):
@@ -0,0 +1,40 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+
+from .models import JournalEntry, JournalEntryLine
+
+# One line of a journal entry to post; either debit or credit is set
+JournalLine = namedtuple('JournalLine', ['account_id', 'debit', 'credit', 'cost_center_id'], defaults=(None,))
+
+
+def post_journal_entries(entries):
+    """
+    Post many balanced journal entries with one bulk_create for the entries
+    and one for all their lines.
+
+    `entries` is a list of (JournalEntry, [JournalLine, ...]) pairs whose
+    entries are not saved yet. Every entry is checked to balance before
+    anything is written. Must run inside a transaction. Returns the saved
+    JournalEntry objects.
+    """
+    errors = []
+    for index, (entry, lines) in enumerate(entries):
+        debit = sum((line.debit or Decimal(0) for line in lines), Decimal(0))
+        credit = sum((line.credit or Decimal(0) for line in lines), Decimal(0))
+        if not lines or debit != credit:
+            errors.append(f"Journal entry {entry.reference or index + 1} does not balance: debit {debit}, credit {credit}.")
+    if errors:
+        raise ValidationError(errors)
+
+    journal_entries = JournalEntry.objects.bulk_create([entry for entry, _ in entries], batch_size=1000)
+    JournalEntryLine.objects.bulk_create([
+        JournalEntryLine(
+            journal_entry=entry, account_id=line.account_id, cost_center_id=line.cost_center_id,
+            debit=line.debit or 0, credit=line.credit or 0,
+        )
+        for entry, (_, lines) in zip(journal_entries, entries)
+        for line in lines if line.debit or line.credit
+    ], batch_size=1000)
+    return journal_entries
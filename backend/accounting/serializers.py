@@ -6,6 +6,7 @@ from .models import (
     BankReconciliation, SubscriptionPlan, Subscription,
     Shareholder, ShareTransfer, Supplier, PurchaseInvoiceItem, Customer, Item, SalesInvoiceItem, LedgerEntry
 )
+from backend.utils.tree import validate_tree_parent
 
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,6 +18,9 @@ class AccountSerializer(serializers.ModelSerializer):
         model = Account
         fields = '__all__'
 
+    def validate_parent_account(self, value):
+        return validate_tree_parent(self.instance, value)
+
 class FiscalYearSerializer(serializers.ModelSerializer):
     class Meta:
         model = FiscalYear
@@ -24,6 +24,7 @@ from .serializers import (
     GrossProfitSerializer,AccountsReceivableSerializer,ProfitAndLossSerializer
 )
 from backend.utils.response import Response
+from backend.utils.tree import filter_by_tree
 from drf_spectacular.openapi import AutoSchema
 
 class CustomSchema(AutoSchema):
@@ -132,6 +133,10 @@ class AccountViewSet(CustomResponseModelViewSet):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
 
+    def get_queryset(self):
+        # ?descendants_of=<id> / ?ancestors_of=<id>
+        return filter_by_tree(super().get_queryset(), self.request.GET, '', Account, '')
+
 
 @extend_schema(
     summary="Manage fiscal years",
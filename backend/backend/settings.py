@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'drf_spectacular',
+    'caching',
     'accounting',
     'crm',
     'projects',
@@ -61,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.utils.versioning.VersionSnapshotMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -126,6 +128,19 @@ DATABASES = {
 }
 
 
+# Version stamps of the in-process indexes (BOM resolver, item index, tax
+# table, department tree) must be seen by every worker, so the cache lives in
+# the database rather than in process memory. The table is created by
+# the caching app's migration (or `manage.py createcachetable`). Stamps are
+# read once per request, see backend.utils.versioning.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'erap_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
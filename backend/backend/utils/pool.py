@@ -0,0 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.db import connections
+
+
+def _init_worker():
+    # Spawned workers import models when unpickling their tasks
+    django.setup()
+
+
+@contextmanager
+def process_pool(max_workers):
+    """
+    ProcessPoolExecutor for CPU bound work on plain data. Database connections
+    are closed first so forked workers never share them, and every worker
+    sets Django up so models import under the spawn start method too.
+    """
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+        yield pool
@@ -0,0 +1,157 @@
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from rest_framework import exceptions
+
+SEGMENT_WIDTH = 10  # zero padded primary key digits per path segment
+
+
+CYCLE_MESSAGE = "A node cannot be moved under itself or one of its descendants."
+
+
+def node_path(pk, parent_path=''):
+    return f"{parent_path}{pk:0{SEGMENT_WIDTH}d}/"
+
+
+def validate_tree_parent(node, parent):
+    """
+    Serializer check for a new parent of `node` (None when creating): raises
+    a DRF ValidationError, so the API answers 400, if the move would put the
+    node under itself or its own subtree. Use from `validate_<parent_field>`.
+    """
+    if node is not None and node.pk is not None and parent is not None:
+        if parent.pk == node.pk or (node.path and parent.path.startswith(node.path)):
+            raise exceptions.ValidationError(CYCLE_MESSAGE)
+    return parent
+
+
+class MaterializedPathModel(models.Model):
+    """
+    Abstract base for self-referencing hierarchies.
+
+    Keeps a materialized path of zero padded ancestor ids (e.g.
+    "0000000001/0000000007/") in step with the parent foreign key named by
+    `parent_field`, so a whole subtree is one indexed prefix match and the
+    ancestors of a node can be read straight from its path.
+    """
+    parent_field = 'parent'
+
+    path = models.CharField(max_length=255, db_index=True, blank=True, default='', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        model = type(self)
+        parent_id = getattr(self, f"{self.parent_field}_id")
+        parent_path = ''
+        if parent_id is not None:
+            parent_path = model.objects.filter(pk=parent_id).values_list('path', flat=True).first() or ''
+            if self.pk is not None and (parent_id == self.pk or (self.path and parent_path.startswith(self.path))):
+                raise ValidationError(CYCLE_MESSAGE)
+
+        old_path = self.path
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            new_path = node_path(self.pk, parent_path)
+            if new_path == old_path:
+                return
+            new_depth = new_path.count('/') - 1
+            model.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            if old_path:
+                # Re-prefix the moved subtree in one UPDATE
+                model.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (new_depth - (old_path.count('/') - 1)),
+                )
+            self.path, self.depth = new_path, new_depth
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.path:
+                # Children that survive the delete (SET_NULL parents) become roots
+                type(self).objects.filter(path__startswith=self.path).exclude(pk=self.pk).update(
+                    path=Substr('path', len(self.path) + 1),
+                    depth=F('depth') - (self.depth + 1),
+                )
+            return super().delete(*args, **kwargs)
+
+    def get_ancestor_ids(self):
+        return [int(segment) for segment in self.path.split('/')[:-2]]
+
+    def get_ancestors(self):
+        return type(self).objects.filter(pk__in=self.get_ancestor_ids()).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        descendants = type(self).objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+
+def rebuild_paths(model, parent_field='parent'):
+    """
+    Recompute path and depth for every row of `model` from its parent links.
+    Works with historical models, so migrations use it to backfill.
+    Rows caught in a parent cycle are treated as roots.
+    """
+    parents = dict(model.objects.values_list('pk', f"{parent_field}_id"))
+    paths = {}
+
+    def resolve(pk):
+        chain = []
+        seen = set()
+        current = pk
+        while current is not None and current not in paths and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            current = parents.get(current)
+        prefix = paths.get(current, '')
+        for node in reversed(chain):
+            prefix = node_path(node, prefix)
+            paths[node] = prefix
+
+    for pk in parents:
+        if pk not in paths:
+            resolve(pk)
+
+    rows = [model(pk=pk, path=path, depth=path.count('/') - 1) for pk, path in paths.items()]
+    model.objects.bulk_update(rows, ['path', 'depth'], batch_size=1000)
+
+
+def _tree_node_path(tree_model, raw_pk, param):
+    try:
+        pk = int(raw_pk)
+    except (TypeError, ValueError):
+        raise exceptions.ValidationError({param: "Must be an integer ID."})
+    return tree_model.objects.filter(pk=pk).values_list('path', flat=True).first()
+
+
+def filter_by_tree(queryset, params, param_prefix, tree_model, field):
+    """
+    Apply `<param_prefix>_descendants_of` and `<param_prefix>_ancestors_of`
+    query parameters to `queryset`, where `field` is the lookup from the
+    queryset's model to `tree_model` (e.g. 'item__item_group'). With an empty
+    prefix and field the parameters are `descendants_of` / `ancestors_of` and
+    filter the tree model itself.
+    Descendant filters include the node itself and compile to a single
+    indexed prefix match on the node's path.
+    """
+    descendants_param = f"{param_prefix}_descendants_of" if param_prefix else 'descendants_of'
+    ancestors_param = f"{param_prefix}_ancestors_of" if param_prefix else 'ancestors_of'
+    prefix = f"{field}__" if field else ''
+
+    if params.get(descendants_param):
+        path = _tree_node_path(tree_model, params[descendants_param], descendants_param)
+        if path is None:
+            return queryset.none()
+        queryset = queryset.filter(**{f"{prefix}path__startswith": path})
+
+    if params.get(ancestors_param):
+        path = _tree_node_path(tree_model, params[ancestors_param], ancestors_param)
+        if path is None:
+            return queryset.none()
+        ancestor_ids = [int(segment) for segment in path.split('/')[:-2]]
+        queryset = queryset.filter(**{f"{prefix}pk__in": ancestor_ids})
+
+    return queryset
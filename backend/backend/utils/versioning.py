@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.core.cache import cache
+
+_snapshot = threading.local()
+
+
+@contextmanager
+def version_snapshot():
+    """
+    Read each version stamp from the shared cache at most once inside the
+    block; later lookups reuse the stamp read first. Wrap requests (see
+    VersionSnapshotMiddleware) and long loops of index lookups in it, so
+    they do not pay a cache query per lookup. Nested blocks share the
+    outermost snapshot.
+    """
+    if getattr(_snapshot, 'stamps', None) is not None:
+        yield
+        return
+    _snapshot.stamps = {}
+    try:
+        yield
+    finally:
+        _snapshot.stamps = None
+
+
+def current_version(key):
+    """
+    Version stamp stored under `key`, created on first use. In-process
+    indexes compare it with the stamp they were built at and reload when it
+    differs.
+    """
+    stamps = getattr(_snapshot, 'stamps', None)
+    if stamps is not None and key in stamps:
+        return stamps[key]
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    if stamps is not None:
+        stamps[key] = version
+    return version
+
+
+def bump_version(key):
+    """
+    Give `key` a new version stamp. Stamps are random rather than counters:
+    the cache lives in the database, so a bump inside a rolled back
+    transaction is undone, and a counter would later hand out the same value
+    again for different data.
+    """
+    version = uuid4().hex
+    cache.set(key, version, timeout=None)
+    stamps = getattr(_snapshot, 'stamps', None)
+    if stamps is not None:
+        stamps[key] = version
+
+
+class VersionSnapshotMiddleware:
+    """Run every request inside a version_snapshot()."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with version_snapshot():
+            return self.get_response(request)
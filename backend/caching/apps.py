@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class CachingConfig(AppConfig):
+    # Owns the database cache table (settings.CACHES); it has no models
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'caching'
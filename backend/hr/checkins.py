@@ -0,0 +1,187 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Attendance, Employee, EmployeeCheckin, HRSettings
+from .signals import attendance_changed
+
+MAX_PUNCHES = 50000
+MAX_REPORTED_ERRORS = 1000
+PAIRING_BATCH_SIZE = 5000  # Employee-days paired per transaction
+LOG_TYPES = ('in', 'out')
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        timestamp = parse_datetime(str(value).strip())
+        if timestamp is None:
+            raise ValueError(f"Invalid timestamp {value!r}.")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+@transaction.atomic
+def ingest_checkins(punches):
+    """
+    Store a batch of device punches, each a dict with `employee_id` (the
+    employee code), `timestamp` and `log_type` ('in' or 'out').
+
+    Employee codes are resolved with one query, punches repeated within the
+    batch or already stored are dropped, and the rest are bulk created. Bad
+    punches are reported by their index and do not stop the batch. New
+    punches are left unpaired for `pair_checkins`.
+
+    `attempted` counts the punches that were new when checked. One stored by
+    another gateway in the meantime is skipped by the insert, but is still
+    counted there rather than as a duplicate.
+    """
+    codes = {str(punch.get('employee_id', '')).strip() for punch in punches if isinstance(punch, dict)}
+    employees = dict(Employee.objects.filter(employee_id__in=codes).values_list('employee_id', 'id'))
+
+    errors = []
+    rejected = 0
+    keys = {}
+    for index, punch in enumerate(punches):
+        try:
+            if not isinstance(punch, dict):
+                raise ValueError("Expected an object.")
+            code = str(punch.get('employee_id', '')).strip()
+            if code not in employees:
+                raise ValueError(f"Unknown employee {code!r}.")
+            log_type = str(punch.get('log_type', '')).strip().lower()
+            if log_type not in LOG_TYPES:
+                raise ValueError(f"Invalid log type {punch.get('log_type')!r}.")
+            keys.setdefault((employees[code], _parse_timestamp(punch.get('timestamp')), log_type), index)
+        except ValueError as exc:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'index': index, 'error': str(exc)})
+
+    existing = set()
+    if keys:
+        timestamps = [timestamp for _, timestamp, _ in keys]
+        existing = set(EmployeeCheckin.objects.filter(
+            employee_id__in={employee_id for employee_id, _, _ in keys},
+            timestamp__range=(min(timestamps), max(timestamps)),
+        ).values_list('employee_id', 'timestamp', 'log_type'))
+    new = [key for key in keys if key not in existing]
+    # ignore_conflicts covers punches stored concurrently by another gateway
+    EmployeeCheckin.objects.bulk_create(
+        [EmployeeCheckin(employee_id=employee_id, timestamp=timestamp, log_type=log_type) for employee_id, timestamp, log_type in new],
+        batch_size=1000, ignore_conflicts=True,
+    )
+    return {
+        'received': len(punches),
+        'attempted': len(new),
+        'duplicates': len(punches) - rejected - len(new),
+        'rejected': rejected,
+        'errors': errors,
+    }
+
+
+def worked_hours(punches):
+    """
+    Hours between paired punches of one day, given (timestamp, log_type)
+    pairs in time order. A repeated 'in' keeps the first one; an 'out'
+    without an open 'in' is ignored.
+    """
+    worked = timedelta()
+    opened = None
+    for timestamp, log_type in punches:
+        if log_type == 'in':
+            opened = opened or timestamp
+        elif opened is not None:
+            worked += timestamp - opened
+            opened = None
+    return worked.total_seconds() / 3600
+
+
+def attendance_status(hours, working_hours):
+    """Full working hours make a present day, half of them a half day, anything less an absence."""
+    if hours >= working_hours:
+        return 'present'
+    if hours >= working_hours / 2:
+        return 'half_day'
+    return 'absent'
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+@transaction.atomic
+def _pair_batch(days, working_hours):
+    """Derive attendance for a set of (employee_id, date) pairs from all their punches."""
+    employee_ids = {employee_id for employee_id, _ in days}
+    first, last = min(day for _, day in days), max(day for _, day in days)
+    punches = defaultdict(list)
+    for checkin_id, employee_id, timestamp, log_type in EmployeeCheckin.objects.filter(
+        employee_id__in=employee_ids, timestamp__gte=_day_bounds(first)[0], timestamp__lt=_day_bounds(last)[1],
+    ).order_by('timestamp', 'id').values_list('id', 'employee_id', 'timestamp', 'log_type'):
+        key = (employee_id, timezone.localdate(timestamp))
+        if key in days:
+            punches[key].append((checkin_id, timestamp, log_type))
+
+    attendance = {}
+    for record in Attendance.objects.filter(employee_id__in=employee_ids, date__range=(first, last)).order_by('id'):
+        attendance.setdefault((record.employee_id, record.date), record)
+
+    created, updated = [], []
+    for key, day_punches in punches.items():
+        hours = worked_hours([(timestamp, log_type) for _, timestamp, log_type in day_punches])
+        status = attendance_status(hours, working_hours)
+        remarks = f"From check-ins: {hours:.2f} hour(s) worked"
+        record = attendance.get(key)
+        if record is None:
+            record = Attendance(employee_id=key[0], date=key[1], attendance_status=status, remarks=remarks)
+            created.append(record)
+            attendance[key] = record
+        elif record.attendance_status != 'on_leave':  # Leave is never overridden by punches
+            record.attendance_status = status
+            record.remarks = remarks
+            updated.append(record)
+    Attendance.objects.bulk_create(created, batch_size=1000)
+    Attendance.objects.bulk_update(updated, ['attendance_status', 'remarks'], batch_size=1000)
+
+    links = []
+    for key, day_punches in punches.items():
+        for checkin_id, _, _ in day_punches:
+            links.append(EmployeeCheckin(id=checkin_id, attendance_id=attendance[key].id))
+    EmployeeCheckin.objects.bulk_update(links, ['attendance'], batch_size=1000)
+
+    if created or updated:
+        attendance_changed.send(sender=Attendance, employee_ids=employee_ids, start_date=first, end_date=last)
+    return len(created), len(updated)
+
+
+def pair_checkins(batch_size=PAIRING_BATCH_SIZE):
+    """
+    Derive Attendance for every employee-day with unpaired punches: in/out
+    pairs give the hours worked, which set the day's status against
+    HRSettings.default_working_hours. Days are recomputed from all their
+    punches, so late punches correct an already paired day. Bulk writes
+    skip model signals, so `attendance_changed` is sent for each batch.
+    Returns (attendance created, attendance updated).
+    """
+    working_hours = HRSettings.objects.values_list('default_working_hours', flat=True).first() or 8
+    created = updated = 0
+    while True:
+        days = set()
+        for employee_id, timestamp in EmployeeCheckin.objects.filter(attendance__isnull=True).order_by('id').values_list(
+            'employee_id', 'timestamp'
+        ).iterator(chunk_size=2000):
+            days.add((employee_id, timezone.localdate(timestamp)))
+            if len(days) >= batch_size:
+                break
+        if not days:
+            return created, updated
+        batch_created, batch_updated = _pair_batch(days, working_hours)
+        created += batch_created
+        updated += batch_updated
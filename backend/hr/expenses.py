@@ -0,0 +1,166 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounting.models import Account, JournalEntry
+from accounting.posting import JournalLine, post_journal_entries
+from .models import EmployeeAdvance, ExpenseClaim, HRSettings
+
+
+def _approve(queryset, ids, status_field, from_status, to_status, label):
+    """Move every row in `ids` from `from_status` to `to_status` with one UPDATE; all or nothing."""
+    ids = set(ids)
+    eligible = set(queryset.select_for_update().filter(pk__in=ids, **{status_field: from_status}).values_list('pk', flat=True))
+    if eligible != ids:
+        raise ValidationError(f"{label} not {from_status}: {', '.join(str(pk) for pk in sorted(ids - eligible)[:50])}.")
+    return queryset.filter(pk__in=eligible).update(**{status_field: to_status})
+
+
+@transaction.atomic
+def submit_expense_claims(claim_ids):
+    """Submit draft expense claims for approval in one UPDATE. Returns the number changed."""
+    return _approve(ExpenseClaim.objects, claim_ids, 'expense_claim_status', 'draft', 'submitted', "Expense claim(s)")
+
+
+@transaction.atomic
+def approve_expense_claims(claim_ids, approve=True):
+    """Approve (or reject) submitted expense claims in one UPDATE. Returns the number changed."""
+    return _approve(
+        ExpenseClaim.objects, claim_ids, 'expense_claim_status', 'submitted',
+        'approved' if approve else 'rejected', "Expense claim(s)",
+    )
+
+
+@transaction.atomic
+def approve_employee_advances(advance_ids, approve=True):
+    """Approve (or reject) pending employee advances in one UPDATE. Returns the number changed."""
+    return _approve(
+        EmployeeAdvance.objects, advance_ids, 'advance_status', 'pending',
+        'approved' if approve else 'rejected', "Employee advance(s)",
+    )
+
+
+def allocate_advances(claims, advances):
+    """
+    Net claims against outstanding advances of one employee. `claims` are
+    (claim_id, amount, advance_id) in settlement order, `advances` are
+    {advance_id: outstanding} in the order they were given. A claim draws
+    first on the advance it names, then on the oldest advances.
+    Returns ({claim_id: adjusted}, {advance_id: drawn}).
+    """
+    outstanding = dict(advances)
+    adjusted, drawn = {}, defaultdict(Decimal)
+    for claim_id, amount, advance_id in claims:
+        remaining = amount
+        order = ([advance_id] if advance_id in outstanding else []) + [pk for pk in outstanding if pk != advance_id]
+        for pk in order:
+            if remaining <= 0:
+                break
+            take = min(remaining, outstanding[pk])
+            if take > 0:
+                outstanding[pk] -= take
+                drawn[pk] += take
+                remaining -= take
+        adjusted[claim_id] = amount - remaining
+    return adjusted, dict(drawn)
+
+
+@transaction.atomic
+def settle_expense_claims(employee_ids=None, company_id=None, posting_date=None):
+    """
+    Settle every approved expense claim (optionally only those of some
+    employees or one company) as a single job.
+
+    Per employee, claims are netted against outstanding approved advances
+    and one journal entry is posted: the claims are debited to the expense
+    account, the netted part is credited to the employee advance account
+    and the rest to the expense payable account. Claims, advances, journal
+    entries and their lines are read and written with a fixed number of
+    bulk queries whatever the number of claims. The HR settings accounts
+    belong to one company, so claims of any other company's employees are
+    rejected.
+    """
+    settings = HRSettings.objects.first()
+    accounts = settings and (settings.expense_account_id, settings.employee_advance_account_id, settings.expense_payable_account_id)
+    if not accounts or not all(accounts):
+        raise ValidationError("Set the expense, employee advance and expense payable accounts in HR settings first.")
+    expense_account, advance_account, payable_account = accounts
+    account_companies = set(Account.objects.filter(pk__in=accounts).values_list('company_id', flat=True))
+    if len(account_companies) != 1:
+        raise ValidationError("The expense, employee advance and expense payable accounts must belong to one company.")
+    account_company_id = account_companies.pop()
+    posting_date = posting_date or timezone.localdate()
+
+    claims = ExpenseClaim.objects.select_for_update().filter(expense_claim_status='approved')
+    if employee_ids is not None:
+        claims = claims.filter(employee_id__in=employee_ids)
+    if company_id is not None:
+        claims = claims.filter(employee__company_id=company_id)
+    rows = list(claims.order_by('employee_id', 'expense_date', 'id').values_list(
+        'id', 'employee_id', 'employee__company_id', 'amount', 'advance_id'
+    ))
+    if not rows:
+        return {'claims_settled': 0, 'journal_entries': 0, 'advance_adjusted': Decimal(0), 'payable': Decimal(0)}
+
+    other_companies = {employee_company_id for _, _, employee_company_id, _, _ in rows} - {account_company_id}
+    if other_companies:
+        raise ValidationError(
+            f"The HR settings accounts belong to company {account_company_id}, but approved claims of company(ies) "
+            f"{', '.join(str(pk) for pk in sorted(other_companies))} were selected; pass company_id={account_company_id}."
+        )
+
+    by_employee = defaultdict(list)
+    for claim_id, employee_id, _, amount, advance_id in rows:
+        by_employee[employee_id].append((claim_id, amount, advance_id))
+
+    advances = defaultdict(dict)
+    for advance_id, employee_id, outstanding in EmployeeAdvance.objects.select_for_update().filter(
+        employee_id__in=by_employee, advance_status='approved', claimed_amount__lt=F('amount'),
+    ).order_by('date', 'id').values_list('id', 'employee_id', F('amount') - F('claimed_amount')):
+        advances[employee_id][advance_id] = outstanding
+
+    adjusted, drawn, entries = {}, defaultdict(Decimal), []
+    for employee_id, employee_claims in by_employee.items():
+        claim_adjusted, advance_drawn = allocate_advances(employee_claims, advances.get(employee_id, {}))
+        adjusted.update(claim_adjusted)
+        for advance_id, amount in advance_drawn.items():
+            drawn[advance_id] += amount
+        total = sum(amount for _, amount, _ in employee_claims)
+        netted = sum(claim_adjusted.values())
+        entries.append((
+            JournalEntry(
+                company_id=account_company_id, date=posting_date, reference=f"Expense Claims - Employee #{employee_id}",
+                narration=f"Settlement of expense claim(s) {', '.join(str(claim_id) for claim_id, _, _ in employee_claims)}",
+            ),
+            [
+                JournalLine(expense_account, total, 0),
+                JournalLine(advance_account, 0, netted),
+                JournalLine(payable_account, 0, total - netted),
+            ],
+        ))
+    journal_entries = post_journal_entries(entries)
+
+    journal_for = {employee_id: entry.pk for employee_id, entry in zip(by_employee, journal_entries)}
+    ExpenseClaim.objects.bulk_update([
+        ExpenseClaim(
+            pk=claim_id, expense_claim_status='settled', advance_adjusted=adjusted[claim_id],
+            journal_entry_id=journal_for[employee_id],
+        )
+        for claim_id, employee_id, _, _, _ in rows
+    ], ['expense_claim_status', 'advance_adjusted', 'journal_entry'], batch_size=1000)
+    advance_rows = EmployeeAdvance.objects.in_bulk(list(drawn))
+    for advance_id, amount in drawn.items():
+        advance_rows[advance_id].claimed_amount += amount
+    EmployeeAdvance.objects.bulk_update(advance_rows.values(), ['claimed_amount'], batch_size=1000)
+
+    netted = sum(adjusted.values(), Decimal(0))
+    return {
+        'claims_settled': len(rows),
+        'journal_entries': len(journal_entries),
+        'advance_adjusted': netted,
+        'payable': sum((amount for _, _, _, amount, _ in rows), Decimal(0)) - netted,
+    }
@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import LeaveApplication, LeaveBalance, LeaveLedgerEntry
+
+# Balance column each ledger entry type accumulates into
+ENTRY_FIELDS = {'ALLOCATION': 'allocated', 'LEAVE': 'taken', 'CARRY_FORWARD': 'carried_forward'}
+
+
+def leave_days_by_year(from_date, to_date):
+    """{year: calendar days} of a leave period, split at year ends."""
+    days = {}
+    while from_date <= to_date:
+        year_end = min(date(from_date.year, 12, 31), to_date)
+        days[from_date.year] = Decimal((year_end - from_date).days + 1)
+        from_date = year_end + timedelta(days=1)
+    return days
+
+
+def allocation_entries(employee_id, leave_type_id, from_date, total_leaves, sign=1, allocation_id=None):
+    """Ledger entries crediting (sign=1) or withdrawing (sign=-1) an allocation in the year it starts."""
+    if not total_leaves:
+        return []
+    return [LeaveLedgerEntry(
+        employee_id=employee_id, leave_type_id=leave_type_id, year=from_date.year, entry_type='ALLOCATION',
+        days=total_leaves * sign, leave_allocation_id=allocation_id,
+        remarks=f"Allocation #{allocation_id}" + (" withdrawn" if sign < 0 else ""),
+    )]
+
+
+def application_entries(employee_id, leave_type_id, from_date, to_date, sign=1, application_id=None):
+    """Ledger entries debiting (sign=1) or restoring (sign=-1) the days of an approved application."""
+    return [
+        LeaveLedgerEntry(
+            employee_id=employee_id, leave_type_id=leave_type_id, year=year, entry_type='LEAVE',
+            days=-days * sign, leave_application_id=application_id,
+            remarks=f"Leave application #{application_id}" + (" reversed" if sign < 0 else ""),
+        )
+        for year, days in leave_days_by_year(from_date, to_date).items()
+    ]
+
+
+def post_leave_entries(entries):
+    """
+    Write ledger entries and apply them to their LeaveBalance rows in bulk.
+    Missing balances are first inserted empty with one conflict-ignoring
+    bulk_create, so concurrent first postings cannot collide; every balance
+    is then locked with SELECT ... FOR UPDATE and written back with one
+    bulk_update. Must be called inside a transaction.
+    """
+    if not entries:
+        return
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for entry in entries:
+        key = (entry.employee_id, entry.leave_type_id, entry.year)
+        field = ENTRY_FIELDS[entry.entry_type]
+        deltas[key][field] += -entry.days if field == 'taken' else entry.days
+        deltas[key]['balance'] += entry.days
+
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(employee_id=employee_id, leave_type_id=leave_type_id, year=year) for employee_id, leave_type_id, year in deltas],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    balances = {
+        (balance.employee_id, balance.leave_type_id, balance.year): balance
+        for balance in LeaveBalance.objects.select_for_update().filter(
+            employee_id__in={key[0] for key in deltas},
+            leave_type_id__in={key[1] for key in deltas},
+            year__in={key[2] for key in deltas},
+        )
+    }
+    to_update = []
+    for key, changes in deltas.items():
+        balance = balances[key]
+        for field, change in changes.items():
+            setattr(balance, field, getattr(balance, field) + change)
+        to_update.append(balance)
+    LeaveBalance.objects.bulk_update(to_update, ['allocated', 'carried_forward', 'taken', 'balance'], batch_size=1000)
+
+
+@transaction.atomic
+def carry_forward_leaves(year):
+    """
+    Close `year` for every leave type with carry_forward set: each positive
+    balance is carried out of the year in full and into the next year,
+    capped at the leave type's max_leaves; the excess lapses. Closed
+    balances are zero, so running it again does nothing.
+    Returns the number of balances carried forward.
+    """
+    balances = LeaveBalance.objects.select_for_update().filter(
+        year=year, balance__gt=0, leave_type__carry_forward=True
+    ).values_list('employee_id', 'leave_type_id', 'balance', 'leave_type__max_leaves')
+    entries = []
+    for employee_id, leave_type_id, balance, max_leaves in balances:
+        carried = min(balance, max_leaves) if max_leaves else balance
+        lapsed = balance - carried
+        entries.append(LeaveLedgerEntry(
+            employee_id=employee_id, leave_type_id=leave_type_id, year=year, entry_type='CARRY_FORWARD',
+            days=-balance, remarks=f"Carried to {year + 1}" + (f", {lapsed} lapsed" if lapsed else ""),
+        ))
+        entries.append(LeaveLedgerEntry(
+            employee_id=employee_id, leave_type_id=leave_type_id, year=year + 1, entry_type='CARRY_FORWARD',
+            days=carried, remarks=f"Carried from {year}",
+        ))
+    post_leave_entries(entries)
+    return len(entries) // 2
+
+
+def leave_calendar(start, end, company_id=None, branch_id=None, department=None, statuses=('approved',)):
+    """
+    Who is off on each day from `start` to `end`, from one range-overlap query
+    on leave applications joined to their employees. `department` includes
+    its sub-departments. Returns the per-day absences and the employees they
+    refer to, each listed once.
+    """
+    applications = LeaveApplication.objects.filter(
+        leave_application_status__in=statuses, from_date__lte=end, to_date__gte=start,
+    )
+    if company_id:
+        applications = applications.filter(employee__company_id=company_id)
+    if branch_id:
+        applications = applications.filter(employee__branch_id=branch_id)
+    if department is not None:
+        applications = applications.filter(employee__department__path__startswith=department.path)
+
+    absent = defaultdict(set)
+    employees = {}
+    for employee_id, code, first_name, last_name, department_id, from_date, to_date in applications.values_list(
+        'employee_id', 'employee__employee_id', 'employee__first_name', 'employee__last_name',
+        'employee__department_id', 'from_date', 'to_date',
+    ):
+        employees[employee_id] = {
+            'id': employee_id, 'employee_id': code, 'name': f"{first_name} {last_name}", 'department': department_id,
+        }
+        day = max(from_date, start)
+        while day <= min(to_date, end):
+            absent[day].add(employee_id)
+            day += timedelta(days=1)
+
+    days = []
+    day = start
+    while day <= end:
+        employee_ids = sorted(absent.get(day, ()))
+        days.append({'date': day, 'count': len(employee_ids), 'employees': employee_ids})
+        day += timedelta(days=1)
+    return {'start': start, 'end': end, 'days': days, 'employees': sorted(employees.values(), key=lambda row: row['id'])}
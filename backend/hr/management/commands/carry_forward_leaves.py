@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hr.leave import carry_forward_leaves
+
+
+class Command(BaseCommand):
+    help = "Year-end leave processing: carry positive balances of carry-forward leave types into the next year."
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help="Year to close.")
+
+    def handle(self, *args, **options):
+        carried = carry_forward_leaves(options['year'])
+        self.stdout.write(self.style.SUCCESS(f"{carried} leave balance(s) carried forward to {options['year'] + 1}."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hr.checkins import PAIRING_BATCH_SIZE, pair_checkins
+
+
+class Command(BaseCommand):
+    help = "Derive attendance from unpaired employee check-ins. Meant to run on a schedule after device uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PAIRING_BATCH_SIZE, help="Employee-days paired per transaction.")
+
+    def handle(self, *args, **options):
+        created, updated = pair_checkins(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{created} attendance record(s) created, {updated} updated."))
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.expenses import settle_expense_claims
+
+
+class Command(BaseCommand):
+    help = "Settle all approved expense claims against employee advances and post their journal entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Only settle claims of this company's employees.")
+        parser.add_argument('--posting-date', type=date.fromisoformat, help="Journal entry date (YYYY-MM-DD), defaults to today.")
+
+    def handle(self, *args, **options):
+        try:
+            result = settle_expense_claims(company_id=options['company'], posting_date=options['posting_date'])
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.messages))
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['claims_settled']} claim(s) settled in {result['journal_entries']} journal entr(ies): "
+            f"{result['advance_adjusted']} netted against advances, {result['payable']} payable."
+        ))
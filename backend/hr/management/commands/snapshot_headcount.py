@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from hr.org import month_start, months_between, refresh_headcount_snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly headcount snapshots of the current month and the months before it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=1, help="Number of months to rebuild, ending with the current one.")
+
+    def handle(self, *args, **options):
+        end = month_start(timezone.localdate())
+        start = end
+        for _ in range(max(options['months'], 1) - 1):
+            start = month_start(start - timedelta(days=1))
+        rows = sum(refresh_headcount_snapshot(month) for month in months_between(start, end))
+        self.stdout.write(self.style.SUCCESS(f"{rows} snapshot row(s) written for {start:%Y-%m} to {end:%Y-%m}."))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from backend.utils.tree import rebuild_paths
+
+
+def backfill_department_paths(apps, schema_editor):
+    rebuild_paths(apps.get_model('hr', 'Department'), parent_field='parent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='hr.department'),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_department_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0002_department_depth_department_parent_department_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='leave_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.leavetype'),
+        ),
+        migrations.AddField(
+            model_name='leavetype',
+            name='is_without_pay',
+            field=models.BooleanField(default=False),
+        ),
+    ]
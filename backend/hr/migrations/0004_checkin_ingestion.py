@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_punches(apps, schema_editor):
+    EmployeeCheckin = apps.get_model('hr', 'EmployeeCheckin')
+    keep = EmployeeCheckin.objects.values('employee_id', 'timestamp', 'log_type').annotate(keep_id=Min('id')).values('keep_id')
+    EmployeeCheckin.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0003_attendance_leave_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeecheckin',
+            name='attendance',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checkins', to='hr.attendance'),
+        ),
+        migrations.RunPython(remove_duplicate_punches, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='employeecheckin',
+            index=models.Index(fields=['attendance', 'employee'], name='hr_checkin_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='employeecheckin',
+            constraint=models.UniqueConstraint(fields=('employee', 'timestamp', 'log_type'), name='hr_checkin_unique_punch'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:37
+
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def build_leave_ledger(apps, schema_editor):
+    LeaveAllocation = apps.get_model('hr', 'LeaveAllocation')
+    LeaveApplication = apps.get_model('hr', 'LeaveApplication')
+    LeaveLedgerEntry = apps.get_model('hr', 'LeaveLedgerEntry')
+    LeaveBalance = apps.get_model('hr', 'LeaveBalance')
+
+    entries = []
+    for allocation in LeaveAllocation.objects.iterator():
+        entries.append(LeaveLedgerEntry(
+            employee_id=allocation.employee_id, leave_type_id=allocation.leave_type_id, year=allocation.from_date.year,
+            entry_type='ALLOCATION', days=allocation.total_leaves, leave_allocation_id=allocation.pk,
+            remarks=f"Allocation #{allocation.pk}",
+        ))
+    for application in LeaveApplication.objects.filter(leave_application_status='approved').iterator():
+        from_date = application.from_date
+        while from_date <= application.to_date:
+            year_end = min(date(from_date.year, 12, 31), application.to_date)
+            entries.append(LeaveLedgerEntry(
+                employee_id=application.employee_id, leave_type_id=application.leave_type_id, year=from_date.year,
+                entry_type='LEAVE', days=-Decimal((year_end - from_date).days + 1), leave_application_id=application.pk,
+                remarks=f"Leave application #{application.pk}",
+            ))
+            from_date = year_end + timedelta(days=1)
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    balances = defaultdict(lambda: {'allocated': Decimal(0), 'taken': Decimal(0), 'balance': Decimal(0)})
+    for entry in entries:
+        balance = balances[(entry.employee_id, entry.leave_type_id, entry.year)]
+        balance['allocated' if entry.entry_type == 'ALLOCATION' else 'taken'] += abs(entry.days)
+        balance['balance'] += entry.days
+    LeaveBalance.objects.bulk_create([
+        LeaveBalance(employee_id=employee_id, leave_type_id=leave_type_id, year=year, **totals)
+        for (employee_id, leave_type_id, year), totals in balances.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0004_checkin_ingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('allocated', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('carried_forward', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('taken', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hr.employee')),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hr.leavetype')),
+            ],
+            options={
+                'unique_together': {('employee', 'leave_type', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('entry_type', models.CharField(choices=[('ALLOCATION', 'Allocation'), ('LEAVE', 'Leave Taken'), ('CARRY_FORWARD', 'Carry Forward')], max_length=20)),
+                ('days', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('remarks', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hr.employee')),
+                ('leave_allocation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.leaveallocation')),
+                ('leave_application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.leaveapplication')),
+                ('leave_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hr.leavetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'leave_type', 'year'], name='hr_leave_ledger_key_idx')],
+            },
+        ),
+        migrations.RunPython(build_leave_ledger, migrations.RunPython.noop),
+    ]
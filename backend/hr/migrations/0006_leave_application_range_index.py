@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0005_leave_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaveapplication',
+            index=models.Index(fields=['leave_application_status', 'from_date', 'to_date'], name='hr_leave_app_range_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def approve_existing_advances(apps, schema_editor):
+    # Advances recorded before the approval workflow were already paid out
+    EmployeeAdvance = apps.get_model('hr', 'EmployeeAdvance')
+    EmployeeAdvance.objects.update(advance_status='approved')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_item_inventory_item'),
+        ('hr', '0006_leave_application_range_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeeadvance',
+            name='advance_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='employeeadvance',
+            name='claimed_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='expenseclaim',
+            name='advance_adjusted',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='expenseclaim',
+            name='journal_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expense_claims', to='accounting.journalentry'),
+        ),
+        migrations.AddField(
+            model_name='hrsettings',
+            name='employee_advance_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.account'),
+        ),
+        migrations.AddField(
+            model_name='hrsettings',
+            name='expense_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.account'),
+        ),
+        migrations.AddField(
+            model_name='hrsettings',
+            name='expense_payable_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.account'),
+        ),
+        migrations.AlterField(
+            model_name='expenseclaim',
+            name='expense_claim_status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('submitted', 'Submitted'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('settled', 'Settled')], default='draft', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='expenseclaim',
+            index=models.Index(fields=['expense_claim_status', 'employee'], name='hr_claim_status_emp_idx'),
+        ),
+        migrations.RunPython(approve_existing_advances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_item_inventory_item'),
+        ('hr', '0007_expense_settlement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='date_of_leaving',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='HeadcountSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('joiners', models.PositiveIntegerField(default=0)),
+                ('leavers', models.PositiveIntegerField(default=0)),
+                ('branch', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.branch')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounting.company')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.department')),
+                ('designation', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.designation')),
+                ('grade', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='hr.employeegrade')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'company'], name='hr_headcount_month_idx')],
+            },
+        ),
+    ]
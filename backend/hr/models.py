@@ -1,14 +1,17 @@
 # models/setup.py
 from django.db import models
-from accounting.models import Company
+from django.utils import timezone
+from accounting.models import Company, Account, JournalEntry
+from backend.utils.tree import MaterializedPathModel
 
 class Branch(models.Model):
     name = models.CharField(max_length=255)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
 
-class Department(models.Model):
+class Department(MaterializedPathModel):
     name = models.CharField(max_length=255)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
 
 class Designation(models.Model):
     title = models.CharField(max_length=255)
@@ -40,6 +43,7 @@ class Employee(models.Model):
     email = models.EmailField()
     phone = models.CharField(max_length=20)
     date_of_joining = models.DateField()
+    date_of_leaving = models.DateField(blank=True, null=True)
     date_of_birth = models.DateField()
     employment_type = models.CharField(max_length=2, choices=EMPLOYMENT_TYPE_CHOICES)
     employee_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
@@ -50,11 +54,32 @@ class Employee(models.Model):
     designation = models.ForeignKey(Designation, on_delete=models.SET_NULL, null=True)
     grade = models.ForeignKey(EmployeeGrade, on_delete=models.SET_NULL, null=True)
 
+    def save(self, *args, **kwargs):
+        if self.employee_status in ('resigned', 'terminated') and self.date_of_leaving is None:
+            self.date_of_leaving = timezone.localdate()
+        super().save(*args, **kwargs)
+
+class HeadcountSnapshot(models.Model):
+    # Month-end headcount per org dimension combination, grouped by each employee's dimensions when the month was built
+    month = models.DateField()  # First day of the month
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True)
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True)
+    designation = models.ForeignKey(Designation, on_delete=models.SET_NULL, null=True)
+    grade = models.ForeignKey(EmployeeGrade, on_delete=models.SET_NULL, null=True)
+    headcount = models.PositiveIntegerField(default=0)
+    joiners = models.PositiveIntegerField(default=0)
+    leavers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['month', 'company'], name='hr_headcount_month_idx')]
+
 # models/leave.py
 class LeaveType(models.Model):
     name = models.CharField(max_length=255)
     max_leaves = models.DecimalField(max_digits=5, decimal_places=2)
     carry_forward = models.BooleanField(default=False)
+    is_without_pay = models.BooleanField(default=False)  # Leave days of this type are deducted from pay
 
 class LeaveAllocation(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
@@ -79,6 +104,45 @@ class LeaveApplication(models.Model):
     leave_application_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     applied_on = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Range overlap: status equality, then from_date <= end AND to_date >= start
+            models.Index(fields=['leave_application_status', 'from_date', 'to_date'], name='hr_leave_app_range_idx'),
+        ]
+
+class LeaveLedgerEntry(models.Model):
+    ENTRY_TYPES = [
+        ('ALLOCATION', 'Allocation'),
+        ('LEAVE', 'Leave Taken'),
+        ('CARRY_FORWARD', 'Carry Forward'),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    days = models.DecimalField(max_digits=6, decimal_places=2)  # Signed: credits are positive, leave taken negative
+    leave_allocation = models.ForeignKey(LeaveAllocation, on_delete=models.SET_NULL, null=True, blank=True)
+    leave_application = models.ForeignKey(LeaveApplication, on_delete=models.SET_NULL, null=True, blank=True)
+    remarks = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['employee', 'leave_type', 'year'], name='hr_leave_ledger_key_idx')]
+
+class LeaveBalance(models.Model):
+    # Running totals of the ledger per (employee, leave_type, year)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    allocated = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    carried_forward = models.DecimalField(max_digits=6, decimal_places=2, default=0)  # Net: carried in less carried out
+    taken = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('employee', 'leave_type', 'year')
+
 # models/attendance.py
 class Attendance(models.Model):
     STATUS_CHOICES = [
@@ -91,19 +155,44 @@ class Attendance(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     date = models.DateField()
     attendance_status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.SET_NULL, null=True, blank=True)
     remarks = models.TextField(blank=True)
 
+    def save(self, *args, **kwargs):
+        if self.attendance_status == 'on_leave' and self.leave_type_id is None:
+            # Take the leave type from the approved application covering the day
+            self.leave_type_id = LeaveApplication.objects.filter(
+                employee_id=self.employee_id, leave_application_status='approved',
+                from_date__lte=self.date, to_date__gte=self.date,
+            ).values_list('leave_type_id', flat=True).first()
+        super().save(*args, **kwargs)
+
 class EmployeeCheckin(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     timestamp = models.DateTimeField()
     log_type = models.CharField(max_length=10, choices=[('in', 'IN'), ('out', 'OUT')])
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, blank=True, related_name='checkins')  # Set once paired
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'timestamp', 'log_type'], name='hr_checkin_unique_punch'),
+        ]
+        indexes = [models.Index(fields=['attendance', 'employee'], name='hr_checkin_pending_idx')]
 
 # models/expense.py
 class EmployeeAdvance(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+    ]
+
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     purpose = models.TextField()
     date = models.DateField()
+    advance_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    claimed_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Settled against expense claims
 
 class ExpenseClaim(models.Model):
     STATUS_CHOICES = [
@@ -111,6 +200,7 @@ class ExpenseClaim(models.Model):
         ('submitted', 'Submitted'),
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
+        ('settled', 'Settled'),
     ]
 
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
@@ -119,9 +209,18 @@ class ExpenseClaim(models.Model):
     purpose = models.TextField()
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     expense_claim_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    advance_adjusted = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Part of the amount netted against advances
+    journal_entry = models.ForeignKey(JournalEntry, on_delete=models.SET_NULL, null=True, blank=True, related_name='expense_claims')
+
+    class Meta:
+        indexes = [models.Index(fields=['expense_claim_status', 'employee'], name='hr_claim_status_emp_idx')]
 
 # models/hr_settings.py
 class HRSettings(models.Model):
     default_working_hours = models.PositiveIntegerField(default=8)
     attendance_required = models.BooleanField(default=True)
     leave_auto_approval = models.BooleanField(default=False)
+    # Accounts used when settling expense claims
+    expense_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    employee_advance_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    expense_payable_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
@@ -0,0 +1,221 @@
+import calendar
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from backend.utils.versioning import bump_version, current_version
+from .models import Department, Employee, HeadcountSnapshot
+
+DEPARTMENT_TREE_VERSION_KEY = 'hr:department-tree-version'
+DIMENSIONS = ('company', 'branch', 'department', 'designation', 'grade')
+# Field holding the display name of each dimension
+DIMENSION_LABELS = {
+    'company': 'company__name',
+    'branch': 'branch__name',
+    'department': 'department__name',
+    'designation': 'designation__title',
+    'grade': 'grade__name',
+}
+MAX_MONTHS = 60
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(month):
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def months_between(first, last):
+    """First days of every month from `first` to `last`, inclusive."""
+    month, last = month_start(first), month_start(last)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = month_end(month) + timedelta(days=1)
+    return months
+
+
+def headcount_filter(on_date):
+    """Employees on the rolls at the end of `on_date`."""
+    return Q(date_of_joining__lte=on_date) & (
+        Q(date_of_leaving__gt=on_date)
+        # Leavers recorded before date_of_leaving existed have no date; they are simply gone
+        | Q(date_of_leaving__isnull=True, employee_status__in=('active', 'inactive'))
+    )
+
+
+_pending = threading.local()
+
+
+def schedule_headcount_refresh(months):
+    """
+    Refresh the snapshots of `months` once the current transaction commits.
+    Months are collected per transaction, so saving many employees refreshes
+    each month only once. Future months are skipped.
+    """
+    current = month_start(timezone.localdate())
+    months = {month_start(month) for month in months if month and month_start(month) <= current}
+    if not months:
+        return
+    # Every save registers a callback, so months saved after a savepoint
+    # rolled back still get one; the first callback to run refreshes all
+    # pending months and the rest find none. Django drops the callbacks of a
+    # rolled back transaction but not this set, so a set without a queued
+    # callback is left over from one and is discarded.
+    pending = getattr(_pending, 'months', None)
+    if pending is None or not _headcount_refresh_queued():
+        pending = _pending.months = set()
+    pending.update(months)
+    transaction.on_commit(_flush_headcount_refresh)
+
+
+def _headcount_refresh_queued():
+    return any(callback is _flush_headcount_refresh for _, callback, _ in transaction.get_connection().run_on_commit)
+
+
+def _flush_headcount_refresh():
+    months = getattr(_pending, 'months', None) or set()
+    _pending.months = None
+    for month in sorted(months):
+        refresh_headcount_snapshot(month)
+
+
+@transaction.atomic
+def refresh_headcount_snapshot(month):
+    """Recompute one month's snapshot from Employee with one grouped query. Returns the rows written."""
+    month = month_start(month)
+    end = month_end(month)
+    rows = Employee.objects.filter(
+        Q(date_of_joining__lte=end), Q(date_of_leaving__isnull=True) | Q(date_of_leaving__gte=month)
+    ).values(*(f"{dimension}_id" for dimension in DIMENSIONS)).annotate(
+        headcount=Count('id', filter=headcount_filter(end)),
+        joiners=Count('id', filter=Q(date_of_joining__range=(month, end))),
+        leavers=Count('id', filter=Q(date_of_leaving__range=(month, end))),
+    ).order_by()
+    HeadcountSnapshot.objects.filter(month=month).delete()
+    return len(HeadcountSnapshot.objects.bulk_create(
+        [HeadcountSnapshot(month=month, **row) for row in rows if row['headcount'] or row['joiners'] or row['leavers']],
+        batch_size=1000,
+    ))
+
+
+def ensure_snapshots(months):
+    """Build the snapshots of any month in `months` that has none yet."""
+    existing = set(HeadcountSnapshot.objects.filter(month__in=months).values_list('month', flat=True).distinct())
+    for month in months:
+        if month not in existing:
+            refresh_headcount_snapshot(month)
+
+
+def _rate(leavers, opening, closing):
+    average = Decimal(opening + closing) / 2
+    if not average:
+        return Decimal(0)
+    return (Decimal(leavers) * 100 / average).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def headcount_analytics(start, end, group_by=None, company_id=None, branch_id=None, department=None):
+    """
+    Month-end headcount, joiners, leavers and attrition (leavers over the
+    average of opening and closing headcount, in percent) for every month
+    from `start` to `end`, optionally grouped by one org dimension.
+    Reads the snapshot table, building months that are missing. A snapshot
+    groups employees by the branch, department and so on they had when it
+    was built; it is rebuilt with their current ones when someone joining or
+    leaving in that month changes, or by the snapshot_headcount command.
+    Months after the current one have no data and are left out.
+    """
+    months = months_between(start, min(end, timezone.localdate()))
+    if not months:
+        return []
+    previous = month_start(months[0] - timedelta(days=1))
+    ensure_snapshots([previous] + months)
+
+    snapshots = HeadcountSnapshot.objects.filter(month__in=[previous] + months)
+    if company_id:
+        snapshots = snapshots.filter(company_id=company_id)
+    if branch_id:
+        snapshots = snapshots.filter(branch_id=branch_id)
+    if department is not None:
+        snapshots = snapshots.filter(department__path__startswith=department.path)
+    fields = ['month'] + ([f"{group_by}_id", DIMENSION_LABELS[group_by]] if group_by else [])
+    totals = {}
+    for row in snapshots.values(*fields).annotate(
+        total_headcount=Sum('headcount'), total_joiners=Sum('joiners'), total_leavers=Sum('leavers'),
+    ).order_by():
+        key = (row[f"{group_by}_id"], row[DIMENSION_LABELS[group_by]]) if group_by else (None, None)
+        totals[(key, row['month'])] = row
+
+    groups = sorted({key for key, _ in totals}, key=lambda key: (key[1] is None, key[1] or '', key[0] or 0))
+    results = []
+    for group_id, label in groups or [(None, None)]:
+        opening = (totals.get(((group_id, label), previous)) or {}).get('total_headcount') or 0
+        for month in months:
+            row = totals.get(((group_id, label), month)) or {}
+            closing = row.get('total_headcount') or 0
+            leavers = row.get('total_leavers') or 0
+            results.append({
+                'month': month,
+                'group_id': group_id,
+                'group': label,
+                'opening_headcount': opening,
+                'headcount': closing,
+                'joiners': row.get('total_joiners') or 0,
+                'leavers': leavers,
+                'attrition_rate': _rate(leavers, opening, closing),
+            })
+            opening = closing
+    return results
+
+
+def invalidate_department_tree(**kwargs):
+    bump_version(DEPARTMENT_TREE_VERSION_KEY)
+
+
+def department_tree(company_id=None):
+    """
+    Departments as a nested tree with the current headcount of each
+    department and of its whole subtree. Built from two queries and cached
+    until a department or employee changes.
+    """
+    version = current_version(DEPARTMENT_TREE_VERSION_KEY)
+    key = f"hr:department-tree:{company_id or 'all'}:{version}"
+    tree = cache.get(key)
+    if tree is None:
+        tree = _build_department_tree(company_id)
+        cache.set(key, tree, timeout=None)
+    return tree
+
+
+def _build_department_tree(company_id):
+    departments = Department.objects.order_by('path')
+    employees = Employee.objects.filter(headcount_filter(timezone.localdate()), department__isnull=False)
+    if company_id:
+        departments = departments.filter(company_id=company_id)
+        employees = employees.filter(company_id=company_id)
+    counts = dict(employees.values('department_id').annotate(count=Count('id')).values_list('department_id', 'count').order_by())
+
+    nodes = {}
+    roots = []
+    children = defaultdict(list)
+    # Ordered by path, so parents come before their children
+    for department_id, name, parent_id, company in departments.values_list('id', 'name', 'parent_id', 'company_id'):
+        node = {'id': department_id, 'name': name, 'company': company, 'headcount': counts.get(department_id, 0), 'total_headcount': 0, 'children': children[department_id]}
+        nodes[department_id] = node
+        (children[parent_id] if parent_id in nodes else roots).append(node)
+
+    def total(node):
+        node['total_headcount'] = node['headcount'] + sum(total(child) for child in node['children'])
+        return node['total_headcount']
+
+    for root in roots:
+        total(root)
+    return roots
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Company, Branch, Department, Designation, EmployeeGrade, EmployeeAdvance, ExpenseClaim,Employee,HRSettings,Attendance, EmployeeCheckin,LeaveType, LeaveAllocation, LeaveApplication
+from .models import Company, Branch, Department, Designation, EmployeeGrade, EmployeeAdvance, ExpenseClaim,Employee,HRSettings,Attendance, EmployeeCheckin,LeaveType, LeaveAllocation, LeaveApplication, LeaveBalance, LeaveLedgerEntry
+from .checkins import MAX_PUNCHES
 from accounting.serializers import CompanySerializer
+from backend.utils.tree import validate_tree_parent
 
 
 class BranchSerializer(serializers.ModelSerializer):
@@ -13,6 +15,9 @@ class DepartmentSerializer(serializers.ModelSerializer):
         model = Department
         fields = '__all__'
 
+    def validate_parent(self, value):
+        return validate_tree_parent(self.instance, value)
+
 class DesignationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Designation
@@ -60,6 +65,7 @@ class EmployeeAdvanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmployeeAdvance
         fields = '__all__'
+        read_only_fields = ['advance_status', 'claimed_amount']  # Status changes go through the approve action
 
 class ExpenseClaimSerializer(serializers.ModelSerializer):
     employee = EmployeeSerializer(read_only=True)
@@ -71,6 +77,7 @@ class ExpenseClaimSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExpenseClaim
         fields = '__all__'
+        read_only_fields = ['expense_claim_status', 'advance_adjusted', 'journal_entry']  # Status changes go through submit/approve/settle
 
 class AttendanceSerializer(serializers.ModelSerializer):
     employee = EmployeeSerializer(read_only=True)
@@ -113,4 +120,95 @@ class LeaveApplicationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LeaveApplication
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+class CheckinIngestSerializer(serializers.Serializer):
+    punches = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_PUNCHES,
+        help_text="Punches as {employee_id: employee code, timestamp: ISO 8601, log_type: 'in' or 'out'}"
+    )
+
+class CheckinIngestErrorSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    error = serializers.CharField()
+
+class CheckinIngestResultSerializer(serializers.Serializer):
+    received = serializers.IntegerField()
+    attempted = serializers.IntegerField(help_text="New punches sent to the database; ones another gateway stored at the same moment are skipped there")
+    duplicates = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+    errors = CheckinIngestErrorSerializer(many=True)
+
+class LeaveBalanceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LeaveBalance
+        fields = ['id', 'employee', 'leave_type', 'year', 'allocated', 'carried_forward', 'taken', 'balance']
+
+class LeaveLedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = '__all__'
+
+class LeaveCarryForwardSerializer(serializers.Serializer):
+    year = serializers.IntegerField(min_value=1900, max_value=9998, help_text="Year to close; balances move into the next year")
+
+class LeaveCarryForwardResultSerializer(serializers.Serializer):
+    year = serializers.IntegerField()
+    balances_carried = serializers.IntegerField()
+
+class LeaveCalendarDaySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    count = serializers.IntegerField()
+    employees = serializers.ListField(child=serializers.IntegerField(), help_text="IDs of the employees off that day")
+
+class LeaveCalendarEmployeeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    employee_id = serializers.CharField()
+    name = serializers.CharField()
+    department = serializers.IntegerField(allow_null=True)
+
+class LeaveCalendarSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    days = LeaveCalendarDaySerializer(many=True)
+    employees = LeaveCalendarEmployeeSerializer(many=True)
+
+class BulkSubmitSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+
+class BulkApprovalSerializer(BulkSubmitSerializer):
+    approve = serializers.BooleanField(default=True, help_text="False rejects them instead")
+
+class BulkApprovalResultSerializer(serializers.Serializer):
+    updated = serializers.IntegerField()
+
+class ExpenseSettlementSerializer(serializers.Serializer):
+    employee_ids = serializers.ListField(child=serializers.IntegerField(), required=False, help_text="Defaults to every employee with approved claims")
+    company_id = serializers.IntegerField(required=False)
+    posting_date = serializers.DateField(required=False, help_text="Defaults to today")
+
+class ExpenseSettlementResultSerializer(serializers.Serializer):
+    claims_settled = serializers.IntegerField()
+    journal_entries = serializers.IntegerField()
+    advance_adjusted = serializers.DecimalField(max_digits=15, decimal_places=2)
+    payable = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+class HeadcountAnalyticsSerializer(serializers.Serializer):
+    month = serializers.DateField()
+    group_id = serializers.IntegerField(allow_null=True)
+    group = serializers.CharField(allow_null=True)
+    opening_headcount = serializers.IntegerField()
+    headcount = serializers.IntegerField(help_text="Headcount at month end")
+    joiners = serializers.IntegerField()
+    leavers = serializers.IntegerField()
+    attrition_rate = serializers.DecimalField(max_digits=7, decimal_places=2, help_text="Leavers over average headcount, in percent")
+
+class DepartmentTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    company = serializers.IntegerField()
+    headcount = serializers.IntegerField(help_text="Employees in the department itself")
+    total_headcount = serializers.IntegerField(help_text="Employees in the department and its sub-departments")
+    children = serializers.SerializerMethodField()
+
+    def get_children(self, obj) -> list:
+        return DepartmentTreeSerializer(obj['children'], many=True).data
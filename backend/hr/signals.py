@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .leave import allocation_entries, application_entries, post_leave_entries
+from .models import Department, Employee, LeaveAllocation, LeaveApplication
+from .org import invalidate_department_tree, schedule_headcount_refresh
+
+# Sent after attendance is written in bulk (bypassing model signals), with
+# employee_ids, start_date and end_date bounding the rows that changed
+attendance_changed = Signal()
+
+ALLOCATION_FIELDS = ('employee_id', 'leave_type_id', 'from_date', 'total_leaves')
+APPLICATION_FIELDS = ('employee_id', 'leave_type_id', 'from_date', 'to_date', 'leave_application_status')
+
+
+def _deleted_directly(sender, origin):
+    # Rows removed by a cascade (e.g. deleting the employee) take their ledger with them
+    return isinstance(origin, sender) or getattr(origin, 'model', None) is sender
+
+
+def _previous(model, instance, fields):
+    if not instance.pk:
+        return None
+    return model.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_save, sender=LeaveAllocation)
+def remember_previous_allocation(sender, instance, **kwargs):
+    instance._previous_allocation = _previous(LeaveAllocation, instance, ALLOCATION_FIELDS)
+
+
+@receiver(post_save, sender=LeaveAllocation)
+def post_allocation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance.refresh_from_db(fields=['from_date', 'total_leaves'])
+    current = tuple(getattr(instance, field) for field in ALLOCATION_FIELDS)
+    previous = getattr(instance, '_previous_allocation', None)
+    if previous == current:
+        return
+    entries = []
+    if previous is not None:
+        entries += allocation_entries(*previous, sign=-1, allocation_id=instance.pk)
+    entries += allocation_entries(*current, allocation_id=instance.pk)
+    with transaction.atomic():
+        post_leave_entries(entries)
+
+
+@receiver(post_delete, sender=LeaveAllocation)
+def withdraw_allocation(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(sender, origin):
+        return
+    entries = allocation_entries(*(getattr(instance, field) for field in ALLOCATION_FIELDS), sign=-1, allocation_id=instance.pk)
+    for entry in entries:
+        entry.leave_allocation_id = None  # The allocation is gone; the remarks keep its number
+    with transaction.atomic():
+        post_leave_entries(entries)
+
+
+@receiver(pre_save, sender=LeaveApplication)
+def remember_previous_application(sender, instance, **kwargs):
+    instance._previous_application = _previous(LeaveApplication, instance, APPLICATION_FIELDS)
+
+
+@receiver(post_save, sender=LeaveApplication)
+def post_application(sender, instance, raw=False, **kwargs):
+    # Only approved applications count against the balance
+    if raw:
+        return
+    instance.refresh_from_db(fields=['from_date', 'to_date'])
+    current = tuple(getattr(instance, field) for field in APPLICATION_FIELDS)
+    previous = getattr(instance, '_previous_application', None)
+    if previous == current:
+        return
+    entries = []
+    if previous is not None and previous[-1] == 'approved':
+        entries += application_entries(*previous[:-1], sign=-1, application_id=instance.pk)
+    if current[-1] == 'approved':
+        entries += application_entries(*current[:-1], application_id=instance.pk)
+    with transaction.atomic():
+        post_leave_entries(entries)
+
+
+@receiver(post_delete, sender=LeaveApplication)
+def reverse_application(sender, instance, origin=None, **kwargs):
+    if instance.leave_application_status != 'approved' or not _deleted_directly(sender, origin):
+        return
+    entries = application_entries(*(getattr(instance, field) for field in APPLICATION_FIELDS[:-1]), sign=-1, application_id=instance.pk)
+    for entry in entries:
+        entry.leave_application_id = None
+    with transaction.atomic():
+        post_leave_entries(entries)
+
+
+EMPLOYEE_ORG_FIELDS = (
+    'employee_status', 'date_of_joining', 'date_of_leaving',
+    'company_id', 'branch_id', 'department_id', 'designation_id', 'grade_id',
+)
+
+
+@receiver(pre_save, sender=Employee)
+def remember_previous_employee(sender, instance, **kwargs):
+    instance._previous_org = _previous(Employee, instance, EMPLOYEE_ORG_FIELDS)
+
+
+@receiver(post_save, sender=Employee)
+def refresh_headcount(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    instance.refresh_from_db(fields=['date_of_joining', 'date_of_leaving'])
+    current = tuple(getattr(instance, field) for field in EMPLOYEE_ORG_FIELDS)
+    previous = getattr(instance, '_previous_org', None)
+    if previous == current:
+        return
+    # The current month, plus any month whose joiners or leavers changed
+    months = {timezone.localdate(), instance.date_of_joining, instance.date_of_leaving}
+    if previous is not None:
+        months.update(previous[1:3])
+    schedule_headcount_refresh(months)
+    invalidate_department_tree()
+
+
+@receiver(post_delete, sender=Employee)
+def remove_from_headcount(sender, instance, **kwargs):
+    schedule_headcount_refresh({timezone.localdate(), instance.date_of_joining, instance.date_of_leaving})
+    invalidate_department_tree()
+
+
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_departments(sender, **kwargs):
+    invalidate_department_tree()
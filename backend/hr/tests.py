@@ -1,3 +1,319 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounting.models import Account, Company, JournalEntryLine
+from . import org
+from .checkins import pair_checkins
+from .expenses import allocate_advances, approve_expense_claims, settle_expense_claims
+from .leave import carry_forward_leaves
+from .models import (
+    Attendance, Department, Employee, EmployeeAdvance, EmployeeCheckin, ExpenseClaim, HRSettings, LeaveAllocation,
+    LeaveApplication, LeaveBalance, LeaveType,
+)
+
+
+class HRTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.company = Company.objects.create(
+            name='Company', fiscal_year_start=date(2026, 1, 1), fiscal_year_end=date(2026, 12, 31), currency='USD',
+        )
+        self.department = Department.objects.create(name='Operations', company=self.company)
+        self.sub_department = Department.objects.create(name='Warehouse', company=self.company, parent=self.department)
+
+    def create_employee(self, code, department=None, **extra):
+        fields = {
+            'employee_id': code, 'first_name': 'Test', 'last_name': code, 'email': f'{code}@example.com', 'phone': '1',
+            'date_of_joining': date(2024, 1, 1), 'date_of_birth': date(1990, 1, 1), 'employment_type': 'FT',
+            'company': self.company, 'department': department or self.department,
+        }
+        fields.update(extra)
+        return Employee.objects.create(**fields)
+
+
+class HeadcountAnalyticsTests(HRTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_employee('E1')
+        self.create_employee('E2', self.sub_department, date_of_joining=date(2025, 3, 10))
+        self.create_employee('E3', date_of_leaving=date(2025, 3, 20), employee_status='resigned')
+
+    def analytics(self, query):
+        return self.client.get(f'/api/v1/hr/employees/analytics/?{query}')
+
+    def test_monthly_headcount_joiners_and_leavers(self):
+        response = self.analytics('start=2025-02&end=2025-04')
+        self.assertEqual(response.status_code, 200, response.content)
+        rows = {row['month']: row for row in response.json()['data']}
+        march = rows['2025-03-01']
+        self.assertEqual((march['opening_headcount'], march['headcount'], march['joiners'], march['leavers']), (2, 2, 1, 1))
+        self.assertEqual(march['attrition_rate'], '50.00')
+
+    def test_group_by_department(self):
+        response = self.analytics('start=2025-04&end=2025-04&group_by=department')
+        headcounts = {row['group']: row['headcount'] for row in response.json()['data']}
+        self.assertEqual(headcounts, {'Operations': 1, 'Warehouse': 1})
+
+    def test_bad_parameters_are_rejected(self):
+        for query in ('group_by=nope', 'start=2025-13', 'start=2025-05&end=2025-01', 'start=2030-01&end=2030-02', 'company=x'):
+            self.assertEqual(self.analytics(query).status_code, 400, query)
+
+    def test_department_tree_counts_subtrees(self):
+        response = self.client.get('/api/v1/hr/departments/tree/')
+        root, = response.json()['data']
+        self.assertEqual((root['headcount'], root['total_headcount']), (1, 2))
+        self.assertEqual(root['children'][0]['headcount'], 1)
+
+
+class HeadcountRefreshTests(TestCase):
+    def test_rolled_back_months_are_not_refreshed_later(self):
+        with mock.patch.object(org, 'refresh_headcount_snapshot') as refresh:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                org.schedule_headcount_refresh([date(2025, 1, 1)])
+                raise RuntimeError
+            with self.captureOnCommitCallbacks(execute=True):
+                org.schedule_headcount_refresh([date(2025, 2, 1)])
+        self.assertEqual([call.args[0] for call in refresh.call_args_list], [date(2025, 2, 1)])
+
+
+class DepartmentTreeTests(HRTestCase):
+    def test_department_cannot_move_under_its_own_subtree(self):
+        for parent in (self.department, self.sub_department):
+            response = self.client.patch(f"/api/v1/hr/departments/{self.department.pk}/", {'parent': parent.pk}, format='json')
+            self.assertEqual(response.status_code, 400, response.content)
+        self.department.refresh_from_db()
+        self.assertIsNone(self.department.parent_id)
+
+    def test_moving_a_department_moves_its_subtree(self):
+        head_office = Department.objects.create(name='Head office', company=self.company)
+        response = self.client.patch(f"/api/v1/hr/departments/{self.department.pk}/", {'parent': head_office.pk}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.sub_department.refresh_from_db()
+        self.assertEqual(self.sub_department.depth, 2)
+        self.assertTrue(self.sub_department.path.startswith(head_office.path))
+
+
+class CheckinTests(HRTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_employee('E1')
+        self.second = self.create_employee('E2')
+
+    def ingest(self, punches):
+        response = self.client.post('/api/v1/hr/employee-checkins/ingest/', {'punches': punches}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['data']
+
+    def test_ingest_drops_duplicates_and_reports_bad_punches(self):
+        result = self.ingest([
+            {'employee_id': 'E1', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'},
+            {'employee_id': 'E1', 'timestamp': '2026-03-02T16:30:00', 'log_type': 'OUT'},
+            {'employee_id': 'E1', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'},
+            {'employee_id': 'X9', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'},
+            {'employee_id': 'E1', 'timestamp': 'yesterday', 'log_type': 'in'},
+        ])
+        self.assertEqual((result['attempted'], result['duplicates'], result['rejected']), (2, 1, 2))
+        self.assertEqual([error['index'] for error in result['errors']], [3, 4])
+        self.assertEqual(self.ingest([{'employee_id': 'E1', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'}])['duplicates'], 1)
+
+    def test_pairing_derives_attendance_and_late_punches_correct_it(self):
+        self.ingest([
+            {'employee_id': 'E1', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'},
+            {'employee_id': 'E1', 'timestamp': '2026-03-02T16:30:00', 'log_type': 'out'},
+            {'employee_id': 'E2', 'timestamp': '2026-03-02T09:00:00', 'log_type': 'in'},
+            {'employee_id': 'E2', 'timestamp': '2026-03-02T13:30:00', 'log_type': 'out'},
+        ])
+        self.assertEqual(pair_checkins(), (2, 0))
+        statuses = dict(Attendance.objects.values_list('employee__employee_id', 'attendance_status'))
+        self.assertEqual(statuses, {'E1': 'present', 'E2': 'half_day'})
+        self.assertFalse(EmployeeCheckin.objects.filter(attendance__isnull=True).exists())
+
+        self.ingest([
+            {'employee_id': 'E2', 'timestamp': '2026-03-02T14:00:00', 'log_type': 'in'},
+            {'employee_id': 'E2', 'timestamp': '2026-03-02T18:00:00', 'log_type': 'out'},
+        ])
+        self.assertEqual(pair_checkins(), (0, 1))
+        self.assertEqual(Attendance.objects.get(employee=self.second).attendance_status, 'present')
+        self.assertEqual(pair_checkins(), (0, 0))
+
+    def test_pairing_is_not_run_by_web_requests(self):
+        self.ingest([{'employee_id': 'E1', 'timestamp': '2026-03-02T08:00:00', 'log_type': 'in'}])
+        self.assertEqual(self.client.post('/api/v1/hr/employee-checkins/pair/').status_code, 405)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class LeaveLedgerTests(HRTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.create_employee('E1')
+        self.leave_type = LeaveType.objects.create(name='Annual', max_leaves=Decimal('10'), carry_forward=True)
+        LeaveAllocation.objects.create(
+            employee=self.employee, leave_type=self.leave_type, total_leaves=Decimal('20'),
+            from_date=date(2025, 1, 1), to_date=date(2025, 12, 31),
+        )
+
+    def balance(self, year):
+        row = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type, year=year)
+        return row.allocated, row.carried_forward, row.taken, row.balance
+
+    def apply(self, from_date, to_date, leave_application_status='approved'):
+        return LeaveApplication.objects.create(
+            employee=self.employee, leave_type=self.leave_type, from_date=from_date, to_date=to_date,
+            reason='Holiday', leave_application_status=leave_application_status,
+        )
+
+    def test_approved_leave_is_split_at_the_year_end(self):
+        self.apply(date(2025, 12, 30), date(2026, 1, 2))
+        self.assertEqual(self.balance(2025), (Decimal('20'), Decimal('0'), Decimal('2'), Decimal('18')))
+        self.assertEqual(self.balance(2026), (Decimal('0'), Decimal('0'), Decimal('2'), Decimal('-2')))
+
+    def test_cancelling_restores_the_days(self):
+        application = self.apply(date(2025, 3, 2), date(2025, 3, 6))
+        self.assertEqual(self.balance(2025)[3], Decimal('15'))
+        application.leave_application_status = 'cancelled'
+        application.save()
+        self.assertEqual(self.balance(2025), (Decimal('20'), Decimal('0'), Decimal('0'), Decimal('20')))
+
+    def test_pending_leave_is_not_booked(self):
+        self.apply(date(2025, 3, 2), date(2025, 3, 6), 'pending')
+        self.assertEqual(self.balance(2025)[3], Decimal('20'))
+
+    def test_carry_forward_is_capped_and_runs_once(self):
+        self.apply(date(2025, 3, 2), date(2025, 3, 6))
+        self.assertEqual(carry_forward_leaves(2025), 1)
+        self.assertEqual(self.balance(2025), (Decimal('20'), Decimal('-15'), Decimal('5'), Decimal('0')))
+        self.assertEqual(self.balance(2026), (Decimal('0'), Decimal('10'), Decimal('0'), Decimal('10')))
+        self.assertEqual(carry_forward_leaves(2025), 0)
+
+    def test_filters_are_validated(self):
+        response = self.client.get('/api/v1/hr/leave-balances/', {'employee': self.employee.pk, 'year': 2025})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['data']), 1)
+        for url in ('/api/v1/hr/leave-balances/', '/api/v1/hr/leave-ledger/'):
+            for params in ({'year': 'abc'}, {'employee': 'x'}):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class LeaveCalendarTests(HRTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.create_employee('E1')
+        self.colleague = self.create_employee('E2', self.sub_department)
+        self.outsider = self.create_employee('E3', Department.objects.create(name='Sales', company=self.company))
+        leave_type = LeaveType.objects.create(name='Annual', max_leaves=Decimal('10'))
+        for employee, from_date, leave_application_status in (
+            (self.employee, date(2025, 2, 27), 'approved'),
+            (self.colleague, date(2025, 3, 3), 'pending'),
+            (self.outsider, date(2025, 3, 3), 'approved'),
+        ):
+            LeaveApplication.objects.create(
+                employee=employee, leave_type=leave_type, from_date=from_date, to_date=date(2025, 3, 3),
+                reason='Holiday', leave_application_status=leave_application_status,
+            )
+
+    def calendar(self, **params):
+        response = self.client.get('/api/v1/hr/leave-applications/calendar/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_department_calendar_includes_sub_departments(self):
+        data = self.calendar(month='2025-03', department=self.department.pk)
+        self.assertEqual(len(data['days']), 31)
+        self.assertEqual([day['count'] for day in data['days'][:4]], [1, 1, 1, 0])
+        self.assertEqual([employee['employee_id'] for employee in data['employees']], ['E1'])
+
+        data = self.calendar(month='2025-03', department=self.department.pk, include_pending='true')
+        self.assertEqual(data['days'][2]['employees'], [self.employee.pk, self.colleague.pk])
+
+    def test_range_is_clipped_and_validated(self):
+        data = self.calendar(start='2025-03-03', end='2025-03-03')
+        self.assertEqual(data['days'][0]['employees'], [self.employee.pk, self.outsider.pk])
+        for params in ({'month': '2025-13'}, {'start': '2025-03-05', 'end': '2025-03-01'}, {'department': 'x'}):
+            response = self.client.get('/api/v1/hr/leave-applications/calendar/', params)
+            self.assertEqual(response.status_code, 400, response.content)
+
+
+class ExpenseClaimTests(HRTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.create_employee('E1')
+        self.accounts = [
+            Account.objects.create(company=self.company, code=code, name=code, account_type=account_type)
+            for code, account_type in (('6100', 'Expense'), ('1400', 'Asset'), ('2100', 'Liability'))
+        ]
+        expense, advance, payable = self.accounts
+        HRSettings.objects.create(expense_account=expense, employee_advance_account=advance, expense_payable_account=payable)
+
+    def claim(self, amount, expense_claim_status='approved', **extra):
+        return ExpenseClaim.objects.create(
+            employee=self.employee, expense_date=date(2026, 3, 2), purpose='Travel', amount=Decimal(amount),
+            expense_claim_status=expense_claim_status, **extra,
+        )
+
+    def test_approval_is_all_or_nothing(self):
+        submitted, draft = self.claim('10', 'submitted'), self.claim('20', 'draft')
+        with self.assertRaises(ValidationError):
+            approve_expense_claims([submitted.pk, draft.pk])
+        self.assertEqual(approve_expense_claims([submitted.pk]), 1)
+        self.assertEqual(ExpenseClaim.objects.get(pk=submitted.pk).expense_claim_status, 'approved')
+
+    def test_claims_draw_on_their_own_advance_first(self):
+        adjusted, drawn = allocate_advances([(1, Decimal('100'), 20), (2, Decimal('80'), None)], {10: Decimal('50'), 20: Decimal('60')})
+        self.assertEqual(adjusted, {1: Decimal('100'), 2: Decimal('10')})
+        self.assertEqual(drawn, {20: Decimal('60'), 10: Decimal('50')})
+
+    def test_settlement_nets_advances_in_one_journal_entry(self):
+        advance = EmployeeAdvance.objects.create(
+            employee=self.employee, amount=Decimal('150'), purpose='Trip', date=date(2026, 3, 1), advance_status='approved',
+        )
+        claims = [self.claim('100', advance=advance), self.claim('80')]
+        result = settle_expense_claims()
+        self.assertEqual(
+            (result['claims_settled'], result['journal_entries'], result['advance_adjusted'], result['payable']),
+            (2, 1, Decimal('150'), Decimal('30')),
+        )
+        lines = {line.account_id: (line.debit, line.credit) for line in JournalEntryLine.objects.all()}
+        expense, advance_account, payable = self.accounts
+        self.assertEqual(lines, {
+            expense.pk: (Decimal('180'), Decimal('0')),
+            advance_account.pk: (Decimal('0'), Decimal('150')),
+            payable.pk: (Decimal('0'), Decimal('30')),
+        })
+        advance.refresh_from_db()
+        self.assertEqual(advance.claimed_amount, Decimal('150'))
+        self.assertEqual(
+            sorted(ExpenseClaim.objects.filter(pk__in=[claim.pk for claim in claims]).values_list('expense_claim_status', 'advance_adjusted')),
+            [('settled', Decimal('50')), ('settled', Decimal('100'))],
+        )
+        self.assertEqual(settle_expense_claims()['claims_settled'], 0)
+
+    def test_status_only_changes_through_the_workflow(self):
+        claim = self.claim('10', 'draft')
+        response = self.client.patch(f"/api/v1/hr/expense-claims/{claim.pk}/", {'expense_claim_status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        claim.refresh_from_db()
+        self.assertEqual(claim.expense_claim_status, 'draft')
+
+        response = self.client.post('/api/v1/hr/expense-claims/submit/', {'ids': [claim.pk]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        approve_expense_claims([claim.pk])
+        settle_expense_claims()
+        self.client.patch(f"/api/v1/hr/expense-claims/{claim.pk}/", {'expense_claim_status': 'approved'}, format='json')
+        self.assertEqual(settle_expense_claims()['claims_settled'], 0)
+        self.assertEqual(JournalEntryLine.objects.filter(account=self.accounts[0]).count(), 1)
 
-# Create your tests here.
+    def test_claims_of_another_company_are_not_posted_to_these_accounts(self):
+        other = Company.objects.create(
+            name='Other', fiscal_year_start=date(2026, 1, 1), fiscal_year_end=date(2026, 12, 31), currency='USD',
+        )
+        Employee.objects.filter(pk=self.employee.pk).update(company=other)
+        self.claim('10')
+        with self.assertRaises(ValidationError):
+            settle_expense_claims()
+        self.assertEqual(settle_expense_claims(company_id=self.company.pk)['claims_settled'], 0)
@@ -4,7 +4,8 @@ from .views import (
     CompanyViewSet, BranchViewSet, DepartmentViewSet, DesignationViewSet,
     EmployeeGradeViewSet, EmployeeViewSet, HRSettingsViewSet, EmployeeAdvanceViewSet,
     ExpenseClaimViewSet, AttendanceViewSet, EmployeeCheckinViewSet,
-    LeaveTypeViewSet, LeaveAllocationViewSet, LeaveApplicationViewSet
+    LeaveTypeViewSet, LeaveAllocationViewSet, LeaveApplicationViewSet,
+    LeaveBalanceViewSet, LeaveLedgerEntryViewSet
 )
 
 router = DefaultRouter()
@@ -22,6 +23,8 @@ router.register(r'employee-checkins', EmployeeCheckinViewSet, basename='employee
 router.register(r'leave-types', LeaveTypeViewSet, basename='leavetype')
 router.register(r'leave-allocations', LeaveAllocationViewSet, basename='leaveallocation')
 router.register(r'leave-applications', LeaveApplicationViewSet, basename='leaveapplication')
+router.register(r'leave-balances', LeaveBalanceViewSet, basename='leavebalance')
+router.register(r'leave-ledger', LeaveLedgerEntryViewSet, basename='leaveledgerentry')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,12 +1,17 @@
-from rest_framework import viewsets, status, pagination
+import calendar
+from datetime import date, timedelta
+
+from django.core.exceptions import ValidationError
+from rest_framework import viewsets, status, pagination, decorators, exceptions
 
 from drf_spectacular.openapi import AutoSchema
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 
 from .models import (
     Company, Branch, Department, Designation, EmployeeGrade,
     Employee, HRSettings, EmployeeAdvance, ExpenseClaim,
-    Attendance, EmployeeCheckin, LeaveType, LeaveAllocation, LeaveApplication
+    Attendance, EmployeeCheckin, LeaveType, LeaveAllocation, LeaveApplication,
+    LeaveBalance, LeaveLedgerEntry
 )
 
 from .serializers import (
@@ -14,9 +19,21 @@ from .serializers import (
     DesignationSerializer, EmployeeGradeSerializer, EmployeeSerializer,
     HRSettingsSerializer, EmployeeAdvanceSerializer, ExpenseClaimSerializer,
     AttendanceSerializer, EmployeeCheckinSerializer, LeaveTypeSerializer,
-    LeaveAllocationSerializer, LeaveApplicationSerializer
+    LeaveAllocationSerializer, LeaveApplicationSerializer,
+    CheckinIngestSerializer, CheckinIngestResultSerializer,
+    LeaveBalanceSerializer, LeaveLedgerEntrySerializer, LeaveCarryForwardSerializer, LeaveCarryForwardResultSerializer,
+    LeaveCalendarSerializer, BulkSubmitSerializer, BulkApprovalSerializer, BulkApprovalResultSerializer,
+    ExpenseSettlementSerializer, ExpenseSettlementResultSerializer,
+    HeadcountAnalyticsSerializer, DepartmentTreeSerializer
 )
+from .checkins import ingest_checkins
+from .expenses import approve_employee_advances, approve_expense_claims, settle_expense_claims, submit_expense_claims
+from .leave import carry_forward_leaves, leave_calendar
+from .org import DIMENSIONS, MAX_MONTHS, department_tree, headcount_analytics, months_between
 from backend.utils.response import Response
+from backend.utils.tree import filter_by_tree
+
+MAX_CALENDAR_DAYS = 92
 
 
 # Custom schema class (can be enhanced later)
@@ -89,6 +106,25 @@ class DepartmentViewSet(CustomResponseModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
 
+    def get_queryset(self):
+        # ?descendants_of=<id> / ?ancestors_of=<id>
+        return filter_by_tree(super().get_queryset(), self.request.GET, '', Department, '')
+
+    @extend_schema(
+        summary="Department tree",
+        description="All departments as a nested tree with the current headcount of each department and of its sub-departments. Cached until a department or employee changes.",
+        parameters=[
+            OpenApiParameter(name='company', description='Filter by company ID', required=False, type=int),
+        ],
+        responses=DepartmentTreeSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='tree')
+    def tree(self, request):
+        company = request.query_params.get('company')
+        if company and not company.isdigit():
+            raise exceptions.ValidationError({'company': "Must be an integer ID."})
+        return Response(data=DepartmentTreeSerializer(department_tree(int(company) if company else None), many=True).data)
+
 @extend_schema(
     summary="Manage designations",
     description="Create, update, list and delete employee designations.",
@@ -116,6 +152,56 @@ class EmployeeViewSet(CustomResponseModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
 
+    def _month(self, params, param, default):
+        if not params.get(param):
+            return default
+        try:
+            year, month = (int(part) for part in params[param].split('-'))
+            return date(year, month, 1)
+        except ValueError:
+            raise exceptions.ValidationError({param: "Use the YYYY-MM format."})
+
+    @extend_schema(
+        summary="Headcount analytics",
+        description="Month-end headcount, joiners, leavers and attrition rate per month, optionally grouped by company, branch, department, designation or grade. Served from monthly headcount snapshots.",
+        parameters=[
+            OpenApiParameter(name='start', description='First month (YYYY-MM), defaults to 11 months before end', required=False, type=str),
+            OpenApiParameter(name='end', description='Last month (YYYY-MM), defaults to this month', required=False, type=str),
+            OpenApiParameter(name='group_by', description='One of: ' + ', '.join(DIMENSIONS), required=False, type=str),
+            OpenApiParameter(name='company', description='Filter by company ID', required=False, type=int),
+            OpenApiParameter(name='branch', description='Filter by branch ID', required=False, type=int),
+            OpenApiParameter(name='department', description='Filter by department ID, including sub-departments', required=False, type=int),
+        ],
+        responses=HeadcountAnalyticsSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='analytics')
+    def analytics(self, request):
+        params = request.query_params
+        end = self._month(params, 'end', date.today().replace(day=1))
+        start = self._month(params, 'start', date(end.year, 1, 1) if end.month == 12 else date(end.year - 1, end.month + 1, 1))
+        if start > end:
+            raise exceptions.ValidationError({'start': "Must not be after end."})
+        if start > date.today().replace(day=1):
+            raise exceptions.ValidationError({'start': "Must not be after the current month."})
+        if len(months_between(start, end)) > MAX_MONTHS:
+            raise exceptions.ValidationError({'end': f"The range can span at most {MAX_MONTHS} months."})
+        group_by = params.get('group_by') or None
+        if group_by and group_by not in DIMENSIONS:
+            raise exceptions.ValidationError({'group_by': f"Must be one of: {', '.join(DIMENSIONS)}."})
+        for param in ('company', 'branch', 'department'):
+            if params.get(param) and not params[param].isdigit():
+                raise exceptions.ValidationError({param: "Must be an integer ID."})
+        department = None
+        if params.get('department'):
+            department = Department.objects.filter(pk=params['department']).first()
+            if department is None:
+                raise exceptions.ValidationError({'department': "Department not found."})
+        rows = headcount_analytics(
+            start, end, group_by=group_by, company_id=params.get('company'),
+            branch_id=params.get('branch'), department=department,
+        )
+        return Response(data=HeadcountAnalyticsSerializer(rows, many=True).data)
+
 @extend_schema(
     summary="Manage HR settings",
     description="Configure human resource related settings.",
@@ -134,6 +220,22 @@ class EmployeeAdvanceViewSet(CustomResponseModelViewSet):
     queryset = EmployeeAdvance.objects.all()
     serializer_class = EmployeeAdvanceSerializer
 
+    @extend_schema(
+        summary="Approve advances in bulk",
+        description="Approves (or with approve=false rejects) pending employee advances in one update. Nothing changes if any of them is not pending.",
+        request=BulkApprovalSerializer,
+        responses=BulkApprovalResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='approve')
+    def approve(self, request):
+        serializer = BulkApprovalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            updated = approve_employee_advances(serializer.validated_data['ids'], serializer.validated_data['approve'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'updated': updated}, message=f"{updated} advance(s) updated")
+
 @extend_schema(
     summary="Manage expense claims",
     description="Handle employee expense claims submission and approval.",
@@ -143,6 +245,58 @@ class ExpenseClaimViewSet(CustomResponseModelViewSet):
     queryset = ExpenseClaim.objects.all()
     serializer_class = ExpenseClaimSerializer
 
+    @extend_schema(
+        summary="Submit expense claims",
+        description="Submits draft expense claims for approval in one update. Nothing changes if any of them is not a draft.",
+        request=BulkSubmitSerializer,
+        responses=BulkApprovalResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='submit')
+    def submit(self, request):
+        serializer = BulkSubmitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            updated = submit_expense_claims(serializer.validated_data['ids'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'updated': updated}, message=f"{updated} expense claim(s) submitted")
+
+    @extend_schema(
+        summary="Approve expense claims in bulk",
+        description="Approves (or with approve=false rejects) submitted expense claims in one update. Nothing changes if any of them is not submitted.",
+        request=BulkApprovalSerializer,
+        responses=BulkApprovalResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='approve')
+    def approve(self, request):
+        serializer = BulkApprovalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            updated = approve_expense_claims(serializer.validated_data['ids'], serializer.validated_data['approve'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'updated': updated}, message=f"{updated} expense claim(s) updated")
+
+    @extend_schema(
+        summary="Settle approved expense claims",
+        description="Month-end job: nets every approved claim against the employee's outstanding advances and posts one journal entry per employee (expense debit; advance and payable credits), all in bulk.",
+        request=ExpenseSettlementSerializer,
+        responses=ExpenseSettlementResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='settle')
+    def settle(self, request):
+        serializer = ExpenseSettlementSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = settle_expense_claims(**serializer.validated_data)
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            data=ExpenseSettlementResultSerializer(result).data,
+            message=f"{result['claims_settled']} claim(s) settled in {result['journal_entries']} journal entr(ies)",
+            code=status.HTTP_201_CREATED
+        )
+
 @extend_schema(
     summary="Manage attendance",
     description="Track and manage employee attendance records.",
@@ -161,6 +315,23 @@ class EmployeeCheckinViewSet(CustomResponseModelViewSet):
     queryset = EmployeeCheckin.objects.all()
     serializer_class = EmployeeCheckinSerializer
 
+    @extend_schema(
+        summary="Ingest device punches",
+        description="Bulk endpoint for biometric device gateways: accepts up to 50,000 punches keyed by employee code, drops duplicates and bulk creates the rest. Invalid punches are reported by index without failing the batch. Attendance is derived later by the scheduled pair_checkins command.",
+        request=CheckinIngestSerializer,
+        responses=CheckinIngestResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='ingest')
+    def ingest(self, request):
+        serializer = CheckinIngestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = ingest_checkins(serializer.validated_data['punches'])
+        return Response(
+            data=CheckinIngestResultSerializer(result).data,
+            message=f"{result['attempted']} new punch(es) stored, {result['duplicates']} duplicate(s), {result['rejected']} rejected",
+            code=status.HTTP_201_CREATED
+        )
+
 @extend_schema(
     summary="Manage leave types",
     description="Create and manage types of leaves available.",
@@ -170,6 +341,23 @@ class LeaveTypeViewSet(CustomResponseModelViewSet):
     queryset = LeaveType.objects.all()
     serializer_class = LeaveTypeSerializer
 
+    @extend_schema(
+        summary="Carry leave balances forward",
+        description="Year-end processing in bulk: closes the year's positive balances of every leave type with carry forward enabled and credits them to the next year, capped at the type's maximum leaves. Running it again for the same year does nothing.",
+        request=LeaveCarryForwardSerializer,
+        responses=LeaveCarryForwardResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='carry-forward')
+    def carry_forward(self, request):
+        serializer = LeaveCarryForwardSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        year = serializer.validated_data['year']
+        carried = carry_forward_leaves(year)
+        return Response(
+            data=LeaveCarryForwardResultSerializer({'year': year, 'balances_carried': carried}).data,
+            message=f"{carried} leave balance(s) carried forward to {year + 1}"
+        )
+
 @extend_schema(
     summary="Manage leave allocations",
     description="Allocate leaves to employees and manage quotas.",
@@ -187,3 +375,95 @@ class LeaveAllocationViewSet(CustomResponseModelViewSet):
 class LeaveApplicationViewSet(CustomResponseModelViewSet):
     queryset = LeaveApplication.objects.all()
     serializer_class = LeaveApplicationSerializer
+
+    def _calendar_range(self, params):
+        if params.get('month'):
+            try:
+                year, month = (int(part) for part in params['month'].split('-'))
+                return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+            except ValueError:
+                raise exceptions.ValidationError({'month': "Use the YYYY-MM format."})
+        try:
+            start = date.fromisoformat(params['start']) if params.get('start') else date.today().replace(day=1)
+            end = date.fromisoformat(params['end']) if params.get('end') else start + timedelta(days=30)
+        except ValueError:
+            raise exceptions.ValidationError({'start': "Use the YYYY-MM-DD format for start and end."})
+        if start > end:
+            raise exceptions.ValidationError({'start': "Must not be after end."})
+        if (end - start).days > MAX_CALENDAR_DAYS:
+            raise exceptions.ValidationError({'end': f"The range can span at most {MAX_CALENDAR_DAYS} days."})
+        return start, end
+
+    @extend_schema(
+        summary="Leave calendar",
+        description="Who is off on each day of a month or date range for a company, branch or department (including its sub-departments): per-day absence counts and employee IDs, with each employee listed once. Approved leave only unless include_pending is set.",
+        parameters=[
+            OpenApiParameter(name='month', description='Month as YYYY-MM; overrides start and end', required=False, type=str),
+            OpenApiParameter(name='start', description='Start date (YYYY-MM-DD), defaults to the first of this month', required=False, type=str),
+            OpenApiParameter(name='end', description='End date (YYYY-MM-DD), defaults to 30 days after start', required=False, type=str),
+            OpenApiParameter(name='company', description='Filter by company ID', required=False, type=int),
+            OpenApiParameter(name='branch', description='Filter by branch ID', required=False, type=int),
+            OpenApiParameter(name='department', description='Filter by department ID, including sub-departments', required=False, type=int),
+            OpenApiParameter(name='include_pending', description='Also show pending applications', required=False, type=bool),
+        ],
+        responses=LeaveCalendarSerializer
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='calendar')
+    def calendar(self, request):
+        params = request.query_params
+        start, end = self._calendar_range(params)
+        for param in ('company', 'branch', 'department'):
+            if params.get(param) and not params[param].isdigit():
+                raise exceptions.ValidationError({param: "Must be an integer ID."})
+        department = None
+        if params.get('department'):
+            department = Department.objects.filter(pk=params['department']).first()
+            if department is None:
+                raise exceptions.ValidationError({'department': "Department not found."})
+        statuses = ('approved', 'pending') if params.get('include_pending') in ('1', 'true', 'True') else ('approved',)
+        data = leave_calendar(
+            start, end, company_id=params.get('company'), branch_id=params.get('branch'),
+            department=department, statuses=statuses,
+        )
+        return Response(data=LeaveCalendarSerializer(data).data)
+
+
+@extend_schema(
+    summary="Leave balances",
+    description="Allocated, carried forward, taken and remaining leave per employee, leave type and year, kept current from the leave ledger.",
+    tags=["Leave Balance"],
+    parameters=[
+        OpenApiParameter(name='employee', description='Filter by employee ID', required=False, type=int),
+        OpenApiParameter(name='leave_type', description='Filter by leave type ID', required=False, type=int),
+        OpenApiParameter(name='year', description='Filter by year', required=False, type=int),
+    ]
+)
+class LeaveBalanceViewSet(CustomResponseModelViewSet):
+    queryset = LeaveBalance.objects.order_by('employee_id', 'leave_type_id', 'year')
+    serializer_class = LeaveBalanceSerializer
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for param, field in (('employee', 'employee_id'), ('leave_type', 'leave_type_id'), ('year', 'year')):
+            if params.get(param):
+                if not params[param].isdigit():
+                    raise exceptions.ValidationError({param: "Must be an integer." if param == 'year' else "Must be an integer ID."})
+                queryset = queryset.filter(**{field: int(params[param])})
+        return queryset
+
+
+@extend_schema(
+    summary="Leave ledger",
+    description="Every allocation, leave taken, reversal and carry forward that makes up the leave balances.",
+    tags=["Leave Balance"],
+    parameters=[
+        OpenApiParameter(name='employee', description='Filter by employee ID', required=False, type=int),
+        OpenApiParameter(name='leave_type', description='Filter by leave type ID', required=False, type=int),
+        OpenApiParameter(name='year', description='Filter by year', required=False, type=int),
+    ]
+)
+class LeaveLedgerEntryViewSet(LeaveBalanceViewSet):
+    queryset = LeaveLedgerEntry.objects.order_by('-created_at', '-id')
+    serializer_class = LeaveLedgerEntrySerializer
@@ -0,0 +1,164 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Item, Warehouse, StockOpeningBalance, StockLedgerEntry
+from .services import apply_balance_deltas
+
+OPENING_BALANCE_COLUMNS = ('sku', 'warehouse', 'quantity', 'posting_date', 'remarks')
+OPENING_BALANCE_REFERENCE = 'Opening Balance'
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_rows(fileobj, filename=''):
+    """
+    Stream (row_number, row dict) pairs from an uploaded CSV or XLSX file.
+    The first row holds the column names. XLSX support needs openpyxl.
+    """
+    if filename.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValidationError("XLSX import requires the 'openpyxl' package; upload a CSV file instead.")
+        sheet = load_workbook(fileobj, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(column or '').strip().lower() for column in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, dict(zip(header, values))
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='') if not isinstance(fileobj, io.TextIOBase) else fileobj
+    reader = csv.DictReader(text)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+
+def _parse_date(value):
+    if value in (None, ''):
+        return timezone.localdate()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip())
+
+
+class OpeningBalanceImport:
+    """
+    Load StockOpeningBalance rows in chunked transactions.
+
+    SKUs and warehouse codes are resolved through in-memory maps built once
+    per import. Each valid chunk bulk creates its openings and IN ledger
+    entries and moves StockBalance in one transaction; invalid rows are
+    reported with their row number and never abort the rest of the file.
+    """
+
+    def __init__(self, chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.item_ids = dict(Item.objects.values_list('sku', 'pk'))
+        self.warehouse_ids = dict(Warehouse.objects.values_list('code', 'pk'))
+        self.seen = set()
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def validate(self, row_number, row):
+        sku = str(row.get('sku') or '').strip()
+        code = str(row.get('warehouse') or '').strip()
+        item_id = self.item_ids.get(sku)
+        if item_id is None:
+            raise ValueError(f"Unknown SKU '{sku}'.")
+        warehouse_id = self.warehouse_ids.get(code)
+        if warehouse_id is None:
+            raise ValueError(f"Unknown warehouse code '{code}'.")
+        try:
+            quantity = Decimal(str(row.get('quantity')).strip())
+        except (InvalidOperation, TypeError):
+            raise ValueError(f"Invalid quantity '{row.get('quantity')}'.")
+        if not quantity.is_finite() or quantity < 0:
+            raise ValueError("Quantity must be zero or positive.")
+        try:
+            posting_date = _parse_date(row.get('posting_date'))
+        except ValueError:
+            raise ValueError(f"Invalid posting date '{row.get('posting_date')}', expected YYYY-MM-DD.")
+        if (item_id, warehouse_id) in self.seen:
+            raise ValueError(f"Duplicate opening balance for {sku} @ {code} in this file.")
+        self.seen.add((item_id, warehouse_id))
+        return StockOpeningBalance(
+            item_id=item_id, warehouse_id=warehouse_id, quantity=quantity,
+            posting_date=posting_date, remarks=row.get('remarks') or None,
+        )
+
+    def run(self, rows):
+        chunk = []
+        for row_number, row in rows:
+            try:
+                chunk.append((row_number, self.validate(row_number, row)))
+            except ValueError as exc:
+                self.add_error(row_number, str(exc))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+    def flush(self, chunk):
+        keys = {(opening.item_id, opening.warehouse_id) for _, opening in chunk}
+        existing = set(
+            StockOpeningBalance.objects.filter(
+                item_id__in={item_id for item_id, _ in keys},
+                warehouse_id__in={warehouse_id for _, warehouse_id in keys},
+            ).values_list('item_id', 'warehouse_id')
+        )
+        openings = []
+        for row_number, opening in chunk:
+            if (opening.item_id, opening.warehouse_id) in existing:
+                self.add_error(row_number, "An opening balance already exists for this item and warehouse.")
+            else:
+                openings.append((row_number, opening))
+        if not openings:
+            return
+
+        ledger_rows = []
+        deltas = defaultdict(int)
+        for _, opening in openings:
+            ledger_rows.append(StockLedgerEntry(
+                item_id=opening.item_id,
+                warehouse_id=opening.warehouse_id,
+                transaction_type='IN',
+                quantity=opening.quantity,
+                transaction_date=timezone.make_aware(datetime.combine(opening.posting_date, time.min)),
+                reference_doc=OPENING_BALANCE_REFERENCE,
+                remarks=opening.remarks,
+            ))
+            deltas[(opening.item_id, opening.warehouse_id)] += opening.quantity
+
+        try:
+            with transaction.atomic():
+                StockOpeningBalance.objects.bulk_create([opening for _, opening in openings])
+                StockLedgerEntry.objects.bulk_create(ledger_rows)
+                apply_balance_deltas(deltas)
+        except (DatabaseError, ValidationError) as exc:
+            message = ' '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+            for row_number, _ in openings:
+                self.add_error(row_number, f"Chunk rolled back: {message}")
+            return
+        self.created += len(openings)
+
+
+def import_opening_balances(fileobj, filename='', chunk_size=2000):
+    """Import opening balances from a CSV/XLSX file object and return a summary with per-row errors."""
+    return OpeningBalanceImport(chunk_size=chunk_size).run(read_rows(fileobj, filename))
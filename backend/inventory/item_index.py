@@ -0,0 +1,59 @@
+import threading
+
+from django.db.models.signals import post_save, post_delete
+
+from backend.utils.versioning import bump_version, current_version
+
+ITEM_INDEX_VERSION_KEY = 'inventory:item-index-version'
+
+
+class ItemIndex:
+    """
+    In-memory id mapping between inventory.Item, the canonical item registry,
+    and the per-module item tables that point at it via `inventory_item`
+    (manufacturing.Item, accounting.Item).
+
+    Each mapping is loaded with one query on first use and dropped whenever
+    any registered item table is written; the version stamp lives in the
+    database cache (settings.CACHES) so invalidations reach every worker
+    process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._maps = {}
+
+    def _current(self):
+        version = current_version(ITEM_INDEX_VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                self._maps = {}
+                self._version = version
+        return self._maps
+
+    def _get(self, key, loader):
+        maps = self._current()
+        if key not in maps:
+            maps[key] = loader()
+        return maps[key]
+
+    def to_inventory(self, model):
+        """{model pk: inventory item id} for a registered item model; unlinked rows are left out."""
+        return self._get(model._meta.label_lower, lambda: dict(
+            model.objects.filter(inventory_item__isnull=False).values_list('pk', 'inventory_item_id')
+        ))
+
+
+item_index = ItemIndex()
+
+
+def invalidate_item_index(**kwargs):
+    bump_version(ITEM_INDEX_VERSION_KEY)
+
+
+def register_item_model(model):
+    """Drop the cached mappings whenever rows of `model` are saved or deleted. Call from AppConfig.ready()."""
+    uid = f"item-index-{model._meta.label_lower}"
+    post_save.connect(invalidate_item_index, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(invalidate_item_index, sender=model, weak=False, dispatch_uid=uid)
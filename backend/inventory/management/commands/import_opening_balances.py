@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ValidationError
+
+from inventory.importers import import_opening_balances
+
+
+class Command(BaseCommand):
+    help = "Import stock opening balances from a CSV or XLSX file (columns: sku, warehouse, quantity, posting_date, remarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the CSV or XLSX file.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows written per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                result = import_opening_balances(fileobj, options['path'], chunk_size=options['chunk_size'])
+        except (OSError, ValidationError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} opening balance(s), {result['error_count']} row(s) rejected."
+        ))
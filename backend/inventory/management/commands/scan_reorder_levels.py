@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services import refresh_item_stock_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute per item stock totals and flag items below their reorder level. Meant to run on a schedule (e.g. nightly cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Number of items aggregated per query.")
+
+    def handle(self, *args, **options):
+        below = refresh_item_stock_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reorder scan complete: {below} item(s) below reorder level."))
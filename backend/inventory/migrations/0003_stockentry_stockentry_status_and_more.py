@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_rename_serialnumber_inventoryserialnumber'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockentry',
+            name='stockentry_status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('SUBMITTED', 'Submitted'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='stockentryitem',
+            name='from_warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stockentryitem_from', to='inventory.warehouse'),
+        ),
+        migrations.AddField(
+            model_name='stockentryitem',
+            name='to_warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stockentryitem_to', to='inventory.warehouse'),
+        ),
+        migrations.AddField(
+            model_name='stockledgerentry',
+            name='stock_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='inventory.stockentry'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_stock_summaries(apps, schema_editor):
+    Item = apps.get_model('inventory', 'Item')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    ItemStockSummary = apps.get_model('inventory', 'ItemStockSummary')
+
+    totals = dict(StockBalance.objects.values('item_id').annotate(total=Sum('quantity')).values_list('item_id', 'total'))
+    summaries = []
+    for item_id, reorder_level in Item.objects.values_list('id', 'reorder_level').iterator():
+        total = totals.get(item_id) or 0
+        shortage = max(reorder_level - total, 0)
+        summaries.append(ItemStockSummary(
+            item_id=item_id, total_quantity=total, shortage=shortage, below_reorder_level=shortage > 0
+        ))
+    ItemStockSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockentry_stockentry_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemStockSummary',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='inventory.item')),
+                ('total_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('shortage', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('below_reorder_level', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['below_reorder_level', '-shortage'], name='inv_summary_shortage_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_summaries, migrations.RunPython.noop),
+    ]
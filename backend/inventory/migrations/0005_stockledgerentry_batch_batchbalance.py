@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_itemstocksummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockledgerentry',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.batch'),
+        ),
+        migrations.CreateModel(
+            name='BatchBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=12)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='inventory.batch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.item')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'warehouse', 'expiry_date'], name='inv_batchbal_fefo_idx'), models.Index(fields=['expiry_date'], name='inv_batchbal_expiry_idx')],
+                'unique_together': {('batch', 'warehouse')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+from backend.utils.tree import rebuild_paths
+
+
+def backfill_item_group_paths(apps, schema_editor):
+    rebuild_paths(apps.get_model('inventory', 'ItemGroup'), parent_field='parent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stockledgerentry_batch_batchbalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemgroup',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='itemgroup',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_item_group_paths, migrations.RunPython.noop),
+    ]
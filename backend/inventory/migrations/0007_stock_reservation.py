@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_itemgroup_depth_itemgroup_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockbalance',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+    ]
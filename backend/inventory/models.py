@@ -1,9 +1,11 @@
 from django.db import models
 from django.utils import timezone
 
+from backend.utils.tree import MaterializedPathModel
+
 # 1. Item and related master data
 
-class ItemGroup(models.Model):
+class ItemGroup(MaterializedPathModel):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='children')
@@ -68,6 +70,8 @@ class StockLedgerEntry(models.Model):
     transaction_date = models.DateTimeField(default=timezone.now)
     reference_doc = models.CharField(max_length=255, blank=True, null=True)  # e.g. Purchase Order #, Delivery Note #
     remarks = models.TextField(blank=True, null=True)
+    stock_entry = models.ForeignKey('StockEntry', on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_entries')
+    batch = models.ForeignKey('Batch', on_delete=models.PROTECT, null=True, blank=True)
 
     def __str__(self):
         return f"{self.transaction_type} {self.quantity} {self.item} @ {self.warehouse} on {self.transaction_date}"
@@ -82,6 +86,11 @@ class StockEntry(models.Model):
         ('REPACK', 'Repackaging'),
         ('ADJUSTMENT', 'Stock Adjustment'),
     ]
+    STATUS_CHOICES = [
+        ('DRAFT', 'Draft'),
+        ('SUBMITTED', 'Submitted'),
+        ('CANCELLED', 'Cancelled'),
+    ]
 
     entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
     posting_date = models.DateField(default=timezone.now)
@@ -90,6 +99,7 @@ class StockEntry(models.Model):
     to_warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, related_name='stockentry_to')
     reference_doc = models.CharField(max_length=255, blank=True, null=True)
     remarks = models.TextField(blank=True, null=True)
+    stockentry_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -102,6 +112,7 @@ class StockBalance(models.Model):
     item = models.ForeignKey(Item, on_delete=models.PROTECT)
     warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT)
     quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    reserved_quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)  # held for submitted sales orders
 
     class Meta:
         unique_together = ('item', 'warehouse')
@@ -109,6 +120,23 @@ class StockBalance(models.Model):
     def __str__(self):
         return f"{self.item} - {self.quantity} @ {self.warehouse}"
 
+# 5b. Item Stock Summary (per item totals across warehouses, drives reorder alerts)
+
+class ItemStockSummary(models.Model):
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='stock_summary')
+    total_quantity = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    shortage = models.DecimalField(max_digits=14, decimal_places=3, default=0)  # reorder_level - total_quantity, when positive
+    below_reorder_level = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['below_reorder_level', '-shortage'], name='inv_summary_shortage_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item} - {self.total_quantity} in stock"
+
 # 6. Stock Opening Balance (initial stock setting)
 
 class StockOpeningBalance(models.Model):
@@ -133,6 +161,28 @@ class Batch(models.Model):
     def __str__(self):
         return f"Batch {self.batch_number} - {self.item.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the denormalized expiry on balances in step for FEFO lookups
+        BatchBalance.objects.filter(batch=self).exclude(expiry_date=self.expiry_date).update(expiry_date=self.expiry_date)
+
+class BatchBalance(models.Model):
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='balances')
+    item = models.ForeignKey('Item', on_delete=models.PROTECT)
+    warehouse = models.ForeignKey('Warehouse', on_delete=models.PROTECT)
+    expiry_date = models.DateField(blank=True, null=True)  # copied from batch so FEFO picks are a single index range scan
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+
+    class Meta:
+        unique_together = ('batch', 'warehouse')
+        indexes = [
+            models.Index(fields=['item', 'warehouse', 'expiry_date'], name='inv_batchbal_fefo_idx'),
+            models.Index(fields=['expiry_date'], name='inv_batchbal_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.batch.batch_number} - {self.quantity} @ {self.warehouse}"
+
 class InventorySerialNumber(models.Model):
     serial_number = models.CharField(max_length=100, unique=True)
     item = models.ForeignKey('Item', on_delete=models.CASCADE)
@@ -155,6 +205,9 @@ class StockEntryItem(models.Model):
     item = models.ForeignKey('Item', on_delete=models.PROTECT)
     quantity = models.DecimalField(max_digits=12, decimal_places=3)
     uom = models.ForeignKey('UnitOfMeasure', on_delete=models.PROTECT)
+    # Line level warehouses override the entry's; REPACK lines use them to mark consumed/produced items
+    from_warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, related_name='stockentryitem_from')
+    to_warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, related_name='stockentryitem_to')
 
     # New fields linking Batch and Serial Numbers
     batch = models.ForeignKey(Batch, on_delete=models.SET_NULL, null=True, blank=True)
@@ -166,7 +219,10 @@ class StockEntryItem(models.Model):
     def clean(self):
         # Optionally add validation: If serial_numbers are provided,
         # quantity must equal the number of serial_numbers
-        if self.serial_numbers.exists() and self.quantity != self.serial_numbers.count():
+        if self.pk is None:
+            return
+        serial_count = self.serial_numbers.count()
+        if serial_count and self.quantity != serial_count:
             from django.core.exceptions import ValidationError
             raise ValidationError("Quantity must match the number of serial numbers assigned.")
         
\ No newline at end of file
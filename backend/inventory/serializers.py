@@ -2,15 +2,19 @@ from rest_framework import serializers
 from .models import (
     ItemGroup, Brand, UnitOfMeasure, Item, Warehouse,
     StockLedgerEntry, StockEntry, StockBalance, StockOpeningBalance,
-    Batch, InventorySerialNumber, StockEntryItem
+    Batch, InventorySerialNumber, StockEntryItem, ItemStockSummary, BatchBalance
 )
+from backend.utils.tree import validate_tree_parent
 
 # Simple serializers for master data
 
 class ItemGroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = ItemGroup
-        fields = ['id', 'name', 'description', 'parent']
+        fields = ['id', 'name', 'description', 'parent', 'path', 'depth']
+
+    def validate_parent(self, value):
+        return validate_tree_parent(self.instance, value)
 
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
@@ -44,13 +48,6 @@ class StockLedgerEntrySerializer(serializers.ModelSerializer):
         model = StockLedgerEntry
         fields = ['id', 'item', 'warehouse', 'transaction_type', 'quantity', 'transaction_date', 'reference_doc', 'remarks']
 
-class StockEntrySerializer(serializers.ModelSerializer):
-    from_warehouse = WarehouseSerializer(read_only=True)
-    to_warehouse = WarehouseSerializer(read_only=True)
-
-    class Meta:
-        model = StockEntry
-        fields = ['id', 'entry_type', 'posting_date', 'posting_time', 'from_warehouse', 'to_warehouse', 'reference_doc', 'remarks', 'created_at']
 
 class StockBalanceSerializer(serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
@@ -58,7 +55,45 @@ class StockBalanceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StockBalance
-        fields = ['id', 'item', 'warehouse', 'quantity']
+        fields = ['id', 'item', 'warehouse', 'quantity', 'reserved_quantity']
+        read_only_fields = ['reserved_quantity']
+
+class StockMatrixSerializer(serializers.Serializer):
+    item_ids = serializers.ListField(child=serializers.IntegerField())
+    warehouse_ids = serializers.ListField(child=serializers.IntegerField())
+    quantities = serializers.ListField(
+        child=serializers.ListField(child=serializers.DecimalField(max_digits=14, decimal_places=3)),
+        help_text="One column per warehouse, each aligned with item_ids."
+    )
+
+class PaginatedStockMatrixSerializer(serializers.Serializer):
+    total_count = serializers.IntegerField()
+    next_page = serializers.CharField(allow_null=True)
+    prev_page = serializers.CharField(allow_null=True)
+    data = StockMatrixSerializer()
+
+class ItemShortageSerializer(serializers.ModelSerializer):
+    item_id = serializers.IntegerField(read_only=True)
+    sku = serializers.CharField(source='item.sku', read_only=True)
+    name = serializers.CharField(source='item.name', read_only=True)
+    reorder_level = serializers.DecimalField(source='item.reorder_level', max_digits=12, decimal_places=3, read_only=True)
+
+    class Meta:
+        model = ItemStockSummary
+        fields = ['item_id', 'sku', 'name', 'reorder_level', 'total_quantity', 'shortage', 'updated_at']
+
+class OpeningBalanceImportSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text="CSV or XLSX with columns sku, warehouse, quantity, posting_date, remarks")
+    chunk_size = serializers.IntegerField(min_value=1, max_value=10000, default=2000)
+
+class OpeningBalanceImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    error = serializers.CharField()
+
+class OpeningBalanceImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    error_count = serializers.IntegerField()
+    errors = OpeningBalanceImportErrorSerializer(many=True)
 
 class StockOpeningBalanceSerializer(serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
@@ -77,6 +112,27 @@ class BatchSerializer(serializers.ModelSerializer):
         model = Batch
         fields = ['id', 'batch_number', 'item', 'manufacture_date', 'expiry_date', 'description']
 
+class BatchBalanceSerializer(serializers.ModelSerializer):
+    batch_number = serializers.CharField(source='batch.batch_number', read_only=True)
+
+    class Meta:
+        model = BatchBalance
+        fields = ['id', 'batch', 'batch_number', 'item', 'warehouse', 'expiry_date', 'quantity']
+
+class FEFOPickSerializer(serializers.Serializer):
+    batch_id = serializers.IntegerField()
+    batch_number = serializers.CharField()
+    warehouse_id = serializers.IntegerField()
+    expiry_date = serializers.DateField(allow_null=True)
+    available_quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+    pick_quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+
+class FEFOPickListSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    requested_quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+    shortfall = serializers.DecimalField(max_digits=12, decimal_places=3)
+    picks = FEFOPickSerializer(many=True)
+
 # Serial Number serializer
 
 class InventorySerialNumberSerializer(serializers.ModelSerializer):
@@ -87,6 +143,29 @@ class InventorySerialNumberSerializer(serializers.ModelSerializer):
         model = InventorySerialNumber
         fields = ['id', 'serial_number', 'item', 'batch', 'status', 'warranty_expiry_date', 'description']
 
+class SerialNumberBulkSerializer(serializers.Serializer):
+    item_id = serializers.PrimaryKeyRelatedField(queryset=Item.objects.all())
+    batch_id = serializers.PrimaryKeyRelatedField(queryset=Batch.objects.all(), allow_null=True, required=False)
+    warranty_expiry_date = serializers.DateField(allow_null=True, required=False)
+    stock_entry_item_id = serializers.PrimaryKeyRelatedField(queryset=StockEntryItem.objects.all(), allow_null=True, required=False)
+
+class SerialNumberRangeSerializer(SerialNumberBulkSerializer):
+    prefix = serializers.CharField(max_length=80, allow_blank=True, default='')
+    start = serializers.IntegerField(min_value=0)
+    end = serializers.IntegerField(min_value=0)
+    padding = serializers.IntegerField(min_value=0, max_value=20, default=0)
+
+class SerialNumberImportSerializer(SerialNumberBulkSerializer):
+    serial_numbers = serializers.ListField(child=serializers.CharField(max_length=100), allow_empty=False)
+
+class SerialNumberLinkSerializer(serializers.Serializer):
+    serial_numbers = serializers.ListField(child=serializers.CharField(max_length=100), allow_empty=False)
+
+class SerialNumberLookupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InventorySerialNumber
+        fields = ['id', 'serial_number', 'item', 'batch', 'status', 'warranty_expiry_date']
+
 # StockEntryItem serializer
 
 class StockEntryItemSerializer(serializers.ModelSerializer):
@@ -103,10 +182,17 @@ class StockEntryItemSerializer(serializers.ModelSerializer):
         model = StockEntryItem
         fields = [
             'id', 'stock_entry', 'item', 'batch', 'serial_numbers',
-            'quantity', 'uom',
+            'quantity', 'uom', 'from_warehouse', 'to_warehouse',
             'item_id', 'batch_id', 'serial_numbers_ids'
         ]
 
+    def validate(self, attrs):
+        # Submitted entries are posted to the ledger; their lines are fixed until cancelled
+        entries = {attrs.get('stock_entry'), getattr(self.instance, 'stock_entry', None)} - {None}
+        if any(entry.stockentry_status != 'DRAFT' for entry in entries):
+            raise serializers.ValidationError("Lines can only be changed while the stock entry is a draft.")
+        return attrs
+
     def create(self, validated_data):
         serial_numbers = validated_data.pop('serial_numbers', [])
         stock_entry_item = StockEntryItem.objects.create(**validated_data)
@@ -122,3 +208,27 @@ class StockEntryItemSerializer(serializers.ModelSerializer):
         if serial_numbers is not None:
             instance.serial_numbers.set(serial_numbers)
         return instance
+
+# StockEntry serializer (declared after StockEntryItemSerializer so items can be nested)
+
+class StockEntrySerializer(serializers.ModelSerializer):
+    from_warehouse = WarehouseSerializer(read_only=True)
+    to_warehouse = WarehouseSerializer(read_only=True)
+    items = StockEntryItemSerializer(many=True, read_only=True)
+
+    from_warehouse_id = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all(), source='from_warehouse', write_only=True, allow_null=True, required=False)
+    to_warehouse_id = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all(), source='to_warehouse', write_only=True, allow_null=True, required=False)
+
+    class Meta:
+        model = StockEntry
+        fields = [
+            'id', 'entry_type', 'posting_date', 'posting_time', 'from_warehouse', 'to_warehouse',
+            'reference_doc', 'remarks', 'stockentry_status', 'created_at', 'items',
+            'from_warehouse_id', 'to_warehouse_id'
+        ]
+        read_only_fields = ['stockentry_status']
+
+    def validate(self, attrs):
+        if self.instance is not None and self.instance.stockentry_status != 'DRAFT':
+            raise serializers.ValidationError("Only draft stock entries can be changed; cancel a submitted entry instead.")
+        return attrs
@@ -0,0 +1,580 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import (
+    Item, StockBalance, StockEntry, StockEntryItem, StockLedgerEntry, InventorySerialNumber, ItemStockSummary,
+    Batch, BatchBalance
+)
+
+# Serial number status applied to the entry's serials on submit / cancel
+SUBMIT_SERIAL_STATUS = {'RECEIPT': 'AVAILABLE', 'ISSUE': 'SOLD'}
+CANCEL_SERIAL_STATUS = {'RECEIPT': 'RETURNED', 'ISSUE': 'AVAILABLE'}
+
+BALANCE_LOCK_CHUNK_SIZE = 500  # (item, warehouse) pairs per SELECT ... FOR UPDATE
+
+
+def _pairs_filter(keys):
+    """Q matching exactly the given (item_id, warehouse_id) pairs, not their cross product."""
+    match = Q()
+    for item_id, warehouse_id in keys:
+        match |= Q(item_id=item_id, warehouse_id=warehouse_id)
+    return match
+
+
+def apply_balance_deltas(deltas, allow_negative=False):
+    """
+    Apply quantity changes to StockBalance rows in bulk.
+
+    `deltas` maps (item_id, warehouse_id) to the signed quantity change.
+    Missing balances are first inserted empty with one conflict-ignoring
+    bulk_create, so concurrent postings cannot collide on them; then the
+    requested balances, and only those, are locked with SELECT ... FOR
+    UPDATE and written back with one bulk_update.
+    Must be called inside a transaction.
+    """
+    deltas = {key: qty for key, qty in deltas.items() if qty}
+    if not deltas:
+        return
+
+    keys = list(deltas)
+    StockBalance.objects.bulk_create(
+        [StockBalance(item_id=item_id, warehouse_id=warehouse_id, quantity=0) for item_id, warehouse_id in keys],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    balances = {}
+    for offset in range(0, len(keys), BALANCE_LOCK_CHUNK_SIZE):
+        for balance in StockBalance.objects.select_for_update().filter(_pairs_filter(keys[offset:offset + BALANCE_LOCK_CHUNK_SIZE])):
+            balances[(balance.item_id, balance.warehouse_id)] = balance
+
+    errors = []
+    for (item_id, warehouse_id), qty in deltas.items():
+        balance = balances[(item_id, warehouse_id)]
+        balance.quantity += qty
+        if balance.quantity < 0 and not allow_negative:
+            errors.append(f"Insufficient stock for item {item_id} in warehouse {warehouse_id}.")
+        elif qty < 0 and balance.quantity < balance.reserved_quantity and not allow_negative:
+            # Stock held for sales orders cannot be issued elsewhere
+            errors.append(f"Insufficient unreserved stock for item {item_id} in warehouse {warehouse_id}.")
+
+    if errors:
+        raise ValidationError(errors)
+
+    StockBalance.objects.bulk_update(list(balances.values()), ['quantity'], batch_size=1000)
+
+    item_deltas = defaultdict(int)
+    for (item_id, _), qty in deltas.items():
+        item_deltas[item_id] += qty
+    apply_item_summary_deltas(item_deltas)
+
+
+RESERVATION_CHUNK_SIZE = 200  # (item, warehouse) pairs per conditional UPDATE
+
+
+def _quantity_case(chunk):
+    """CASE expression giving each (item_id, warehouse_id) row of `chunk` its own quantity."""
+    return Case(
+        *(When(item_id=item_id, warehouse_id=warehouse_id, then=Value(qty)) for (item_id, warehouse_id), qty in chunk),
+        output_field=DecimalField(max_digits=12, decimal_places=3),
+    )
+
+
+def _conditional_balance_update(quantities, condition, **updates):
+    """
+    Apply per-row quantities to StockBalance with one UPDATE per chunk,
+    touching only rows where `condition(qty)` holds. The condition is
+    evaluated by the database against the row being written, so concurrent
+    callers cannot both pass it on stale reads. Returns the keys whose
+    rows did not match (missing or failing the condition).
+    """
+    items = [(key, qty) for key, qty in quantities.items() if qty > 0]
+    failed = []
+    for offset in range(0, len(items), RESERVATION_CHUNK_SIZE):
+        chunk = items[offset:offset + RESERVATION_CHUNK_SIZE]
+        match = Q()
+        for (item_id, warehouse_id), qty in chunk:
+            match |= Q(item_id=item_id, warehouse_id=warehouse_id) & condition(qty)
+        case = _quantity_case(chunk)
+        updated = StockBalance.objects.filter(match).update(**{field: update(case) for field, update in updates.items()})
+        if updated != len(chunk):
+            failed.append(chunk)
+    return failed
+
+
+def _shortages(quantities, label):
+    available = {
+        (item_id, warehouse_id): quantity - reserved
+        for item_id, warehouse_id, quantity, reserved in StockBalance.objects.filter(
+            item_id__in={item_id for item_id, _ in quantities},
+            warehouse_id__in={warehouse_id for _, warehouse_id in quantities},
+        ).values_list('item_id', 'warehouse_id', 'quantity', 'reserved_quantity')
+    }
+    return [
+        f"{label} for item {item_id} in warehouse {warehouse_id}: {qty} needed, {available.get((item_id, warehouse_id), 0)} available."
+        for (item_id, warehouse_id), qty in quantities.items()
+        if qty > available.get((item_id, warehouse_id), 0)
+    ]
+
+
+@transaction.atomic
+def reserve_stock(quantities):
+    """
+    Reserve stock for `quantities` ((item_id, warehouse_id) -> quantity) with
+    conditional bulk UPDATEs that only succeed where the unreserved quantity
+    covers the request. All or nothing: any shortage rolls back every
+    reservation and raises a ValidationError naming the short rows.
+    """
+    savepoint = transaction.savepoint()
+    if _conditional_balance_update(
+        quantities,
+        lambda qty: Q(quantity__gte=F('reserved_quantity') + qty),
+        reserved_quantity=lambda case: F('reserved_quantity') + case,
+    ):
+        transaction.savepoint_rollback(savepoint)
+        raise ValidationError(_shortages(quantities, "Insufficient stock") or ["Insufficient stock."])
+    transaction.savepoint_commit(savepoint)
+
+
+@transaction.atomic
+def release_stock(quantities):
+    """Release reservations made by `reserve_stock`, never taking a reservation below zero."""
+    _conditional_balance_update(
+        quantities,
+        lambda qty: Q(),
+        reserved_quantity=lambda case: Greatest(F('reserved_quantity') - case, Value(0), output_field=DecimalField(max_digits=12, decimal_places=3)),
+    )
+
+
+@transaction.atomic
+def issue_reserved_stock(quantities, reference_doc=None, remarks=None):
+    """
+    Ship reserved stock: lower both quantity and reserved_quantity of every
+    (item_id, warehouse_id) row by its quantity in conditional bulk UPDATEs,
+    then write the OUT ledger rows and item summary deltas. Raises a
+    ValidationError, leaving nothing changed, if any row holds less
+    reserved stock than requested.
+    """
+    savepoint = transaction.savepoint()
+    if _conditional_balance_update(
+        quantities,
+        lambda qty: Q(reserved_quantity__gte=qty, quantity__gte=qty),
+        quantity=lambda case: F('quantity') - case,
+        reserved_quantity=lambda case: F('reserved_quantity') - case,
+    ):
+        transaction.savepoint_rollback(savepoint)
+        raise ValidationError(f"Reserved stock for {reference_doc or 'the delivery'} is no longer available.")
+    transaction.savepoint_commit(savepoint)
+
+    posted_at = timezone.now()
+    StockLedgerEntry.objects.bulk_create([
+        StockLedgerEntry(
+            item_id=item_id, warehouse_id=warehouse_id, transaction_type='OUT', quantity=-qty,
+            transaction_date=posted_at, reference_doc=reference_doc, remarks=remarks,
+        )
+        for (item_id, warehouse_id), qty in quantities.items() if qty > 0
+    ], batch_size=1000)
+    item_deltas = defaultdict(int)
+    for (item_id, _), qty in quantities.items():
+        item_deltas[item_id] -= qty
+    apply_item_summary_deltas(item_deltas)
+
+
+def apply_batch_balance_deltas(deltas):
+    """
+    Apply quantity changes to BatchBalance rows in bulk. `deltas` maps
+    (batch_id, warehouse_id) to the signed change. Must run inside a transaction.
+    """
+    deltas = {key: qty for key, qty in deltas.items() if qty}
+    if not deltas:
+        return
+
+    batch_ids = {batch_id for batch_id, _ in deltas}
+    warehouse_ids = {warehouse_id for _, warehouse_id in deltas}
+    balances = {
+        (balance.batch_id, balance.warehouse_id): balance
+        for balance in BatchBalance.objects.select_for_update().filter(
+            batch_id__in=batch_ids, warehouse_id__in=warehouse_ids
+        )
+    }
+    batches = Batch.objects.only('item_id', 'expiry_date', 'batch_number').in_bulk(batch_ids)
+
+    to_update, to_create, errors = [], [], []
+    for (batch_id, warehouse_id), qty in deltas.items():
+        balance = balances.get((batch_id, warehouse_id))
+        if balance is None:
+            batch = batches[batch_id]
+            balance = BatchBalance(
+                batch_id=batch_id, warehouse_id=warehouse_id, item_id=batch.item_id,
+                expiry_date=batch.expiry_date, quantity=0
+            )
+            to_create.append(balance)
+        else:
+            to_update.append(balance)
+        balance.quantity += qty
+        if balance.quantity < 0:
+            errors.append(f"Insufficient quantity in batch {batches[batch_id].batch_number} in warehouse {warehouse_id}.")
+
+    if errors:
+        raise ValidationError(errors)
+
+    BatchBalance.objects.bulk_update(to_update, ['quantity'])
+    BatchBalance.objects.bulk_create(to_create)
+
+
+def fefo_pick_list(item_id, quantity, warehouse_id=None, on_date=None):
+    """
+    Build a first-expired-first-out pick list for `quantity` of an item.
+
+    Walks BatchBalance along the (item, warehouse, expiry_date) index, skipping
+    expired batches, and stops as soon as the quantity is covered. Batches
+    without an expiry date are picked last. Returns (picks, shortfall).
+    """
+    on_date = on_date or timezone.localdate()
+    balances = BatchBalance.objects.filter(item_id=item_id, quantity__gt=0).exclude(expiry_date__lt=on_date)
+    if warehouse_id is not None:
+        balances = balances.filter(warehouse_id=warehouse_id)
+    balances = balances.select_related('batch').order_by(F('expiry_date').asc(nulls_last=True), 'batch_id', 'warehouse_id')
+
+    picks = []
+    remaining = quantity
+    for balance in balances.iterator(chunk_size=100):
+        if remaining <= 0:
+            break
+        take = min(balance.quantity, remaining)
+        picks.append({
+            'batch_id': balance.batch_id,
+            'batch_number': balance.batch.batch_number,
+            'warehouse_id': balance.warehouse_id,
+            'expiry_date': balance.expiry_date,
+            'available_quantity': balance.quantity,
+            'pick_quantity': take,
+        })
+        remaining -= take
+    return picks, max(remaining, 0)
+
+
+def expiring_batch_balances(days, warehouse_id=None, on_date=None):
+    """Batch balances with stock on hand expiring within `days` days, soonest first."""
+    on_date = on_date or timezone.localdate()
+    balances = BatchBalance.objects.filter(
+        expiry_date__gte=on_date, expiry_date__lte=on_date + timedelta(days=days), quantity__gt=0
+    )
+    if warehouse_id is not None:
+        balances = balances.filter(warehouse_id=warehouse_id)
+    return balances.select_related('batch', 'item', 'warehouse').order_by('expiry_date', 'batch_id', 'warehouse_id')
+
+
+def stock_matrix(item_ids, warehouse_ids):
+    """
+    Pivot StockBalance into a column-oriented matrix: one list per warehouse,
+    each aligned with `item_ids`. Cells without a balance are 0.
+    """
+    row_of = {item_id: row for row, item_id in enumerate(item_ids)}
+    column_of = {warehouse_id: column for column, warehouse_id in enumerate(warehouse_ids)}
+    columns = [[0] * len(item_ids) for _ in warehouse_ids]
+
+    balances = StockBalance.objects.filter(item_id__in=item_ids, warehouse_id__in=warehouse_ids).values_list(
+        'item_id', 'warehouse_id'
+    ).annotate(total=Sum('quantity')).order_by()
+    for item_id, warehouse_id, quantity in balances:
+        columns[column_of[warehouse_id]][row_of[item_id]] = quantity
+    return columns
+
+
+def _set_shortage(summary, reorder_level):
+    summary.shortage = max(reorder_level - summary.total_quantity, 0)
+    summary.below_reorder_level = summary.shortage > 0
+
+
+def apply_item_summary_deltas(item_deltas):
+    """
+    Incrementally move ItemStockSummary totals by `item_deltas` (item_id -> change)
+    and re-evaluate each item against its reorder level.
+    """
+    item_ids = [item_id for item_id, qty in item_deltas.items() if qty]
+    if not item_ids:
+        return
+    reorder_levels = dict(Item.objects.filter(pk__in=item_ids).values_list('pk', 'reorder_level'))
+    summaries = ItemStockSummary.objects.select_for_update().in_bulk(item_ids)
+    missing = [item_id for item_id in item_ids if item_id not in summaries]
+    # Items without a summary yet start from their actual balance rather than the delta alone
+    missing_totals = dict(
+        StockBalance.objects.filter(item_id__in=missing)
+        .values('item_id').annotate(total=Sum('quantity')).values_list('item_id', 'total')
+    ) if missing else {}
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for item_id in item_ids:
+        summary = summaries.get(item_id)
+        if summary is None:
+            summary = ItemStockSummary(item_id=item_id, total_quantity=missing_totals.get(item_id) or 0)
+            to_create.append(summary)
+        else:
+            summary.total_quantity += item_deltas[item_id]
+            to_update.append(summary)
+        summary.updated_at = now
+        _set_shortage(summary, reorder_levels[item_id])
+
+    ItemStockSummary.objects.bulk_update(to_update, ['total_quantity', 'shortage', 'below_reorder_level', 'updated_at'])
+    ItemStockSummary.objects.bulk_create(to_create)
+
+
+def refresh_item_stock_summaries(item_ids=None, chunk_size=5000):
+    """
+    Recompute ItemStockSummary from StockBalance, one grouped query per chunk
+    of items. Used by the scheduled reorder scan and when an item's reorder
+    level changes. Returns the number of items below their reorder level.
+    """
+    items = Item.objects.order_by('pk')
+    if item_ids is not None:
+        items = items.filter(pk__in=item_ids)
+
+    below = 0
+    last_pk = 0
+    while True:
+        chunk = list(items.filter(pk__gt=last_pk).values_list('pk', 'reorder_level')[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        chunk_ids = [pk for pk, _ in chunk]
+        totals = dict(
+            StockBalance.objects.filter(item_id__in=chunk_ids)
+            .values('item_id').annotate(total=Sum('quantity')).values_list('item_id', 'total')
+        )
+        with transaction.atomic():
+            existing = ItemStockSummary.objects.select_for_update().in_bulk(chunk_ids)
+            now = timezone.now()
+            to_update, to_create = [], []
+            for pk, reorder_level in chunk:
+                summary = existing.get(pk)
+                if summary is None:
+                    summary = ItemStockSummary(item_id=pk)
+                    to_create.append(summary)
+                else:
+                    to_update.append(summary)
+                summary.total_quantity = totals.get(pk) or 0
+                summary.updated_at = now
+                _set_shortage(summary, reorder_level)
+                below += summary.below_reorder_level
+            ItemStockSummary.objects.bulk_update(to_update, ['total_quantity', 'shortage', 'below_reorder_level', 'updated_at'])
+            ItemStockSummary.objects.bulk_create(to_create)
+    return below
+
+
+def _posting_datetime(entry):
+    posting = datetime.combine(entry.posting_date, entry.posting_time)
+    return timezone.make_aware(posting) if timezone.is_naive(posting) else posting
+
+
+def _line_movements(entry, line):
+    """Return (transaction_type, warehouse, signed quantity) tuples for one entry line."""
+    source = line.from_warehouse or entry.from_warehouse
+    target = line.to_warehouse or entry.to_warehouse
+
+    if entry.entry_type == 'RECEIPT':
+        if not target:
+            raise ValidationError(f"Line {line.pk}: a target warehouse is required for receipts.")
+        return [('IN', target, line.quantity)]
+    if entry.entry_type == 'ISSUE':
+        if not source:
+            raise ValidationError(f"Line {line.pk}: a source warehouse is required for issues.")
+        return [('OUT', source, -line.quantity)]
+    if entry.entry_type == 'TRANSFER':
+        if not source or not target:
+            raise ValidationError(f"Line {line.pk}: source and target warehouses are required for transfers.")
+        return [('TRANSFER', source, -line.quantity), ('TRANSFER', target, line.quantity)]
+    if entry.entry_type == 'REPACK':
+        # Consumed lines carry a line level source warehouse, produced lines a target one.
+        if bool(line.from_warehouse) == bool(line.to_warehouse):
+            raise ValidationError(f"Line {line.pk}: repack lines need exactly one of from_warehouse or to_warehouse.")
+        if line.from_warehouse:
+            return [('OUT', line.from_warehouse, -line.quantity)]
+        return [('IN', line.to_warehouse, line.quantity)]
+    # ADJUSTMENT: quantity is a signed correction
+    warehouse = target or source
+    if not warehouse:
+        raise ValidationError(f"Line {line.pk}: a warehouse is required for adjustments.")
+    return [('ADJUSTMENT', warehouse, line.quantity)]
+
+
+def _locked_entry(entry):
+    return StockEntry.objects.select_for_update().select_related('from_warehouse', 'to_warehouse').get(pk=entry.pk)
+
+
+@transaction.atomic
+def submit_stock_entry(entry):
+    """
+    Post a draft stock entry: explode its lines into StockLedgerEntry rows,
+    move StockBalance for every affected warehouse and update serial statuses.
+    """
+    entry = _locked_entry(entry)
+    if entry.stockentry_status != 'DRAFT':
+        raise ValidationError(f"Only draft stock entries can be submitted (current status: {entry.stockentry_status}).")
+
+    lines = list(
+        StockEntryItem.objects.filter(stock_entry=entry)
+        .select_related('from_warehouse', 'to_warehouse')
+    )
+    if not lines:
+        raise ValidationError("Stock entry has no items.")
+
+    posted_at = _posting_datetime(entry)
+    ledger_rows = []
+    deltas = defaultdict(int)
+    batch_deltas = defaultdict(int)
+    for line in lines:
+        for transaction_type, warehouse, qty in _line_movements(entry, line):
+            ledger_rows.append(StockLedgerEntry(
+                item_id=line.item_id,
+                warehouse=warehouse,
+                transaction_type=transaction_type,
+                quantity=qty,
+                transaction_date=posted_at,
+                reference_doc=entry.reference_doc,
+                remarks=entry.remarks,
+                stock_entry=entry,
+                batch_id=line.batch_id,
+            ))
+            deltas[(line.item_id, warehouse.pk)] += qty
+            if line.batch_id:
+                batch_deltas[(line.batch_id, warehouse.pk)] += qty
+
+    apply_balance_deltas(deltas)
+    apply_batch_balance_deltas(batch_deltas)
+    StockLedgerEntry.objects.bulk_create(ledger_rows)
+    _set_serial_status(entry, SUBMIT_SERIAL_STATUS)
+
+    entry.stockentry_status = 'SUBMITTED'
+    entry.save(update_fields=['stockentry_status'])
+    return entry
+
+
+@transaction.atomic
+def cancel_stock_entry(entry):
+    """
+    Cancel a submitted stock entry by posting reversing ledger rows for
+    everything it posted and rolling the balances back.
+    """
+    entry = _locked_entry(entry)
+    if entry.stockentry_status != 'SUBMITTED':
+        raise ValidationError(f"Only submitted stock entries can be cancelled (current status: {entry.stockentry_status}).")
+
+    posted_at = timezone.now()
+    reversals = []
+    deltas = defaultdict(int)
+    batch_deltas = defaultdict(int)
+    for ledger in StockLedgerEntry.objects.filter(stock_entry=entry):
+        reversals.append(StockLedgerEntry(
+            item_id=ledger.item_id,
+            warehouse_id=ledger.warehouse_id,
+            transaction_type=ledger.transaction_type,
+            quantity=-ledger.quantity,
+            transaction_date=posted_at,
+            reference_doc=ledger.reference_doc,
+            remarks=f"Cancellation of stock entry {entry.pk}",
+            stock_entry=entry,
+            batch_id=ledger.batch_id,
+        ))
+        deltas[(ledger.item_id, ledger.warehouse_id)] -= ledger.quantity
+        if ledger.batch_id:
+            batch_deltas[(ledger.batch_id, ledger.warehouse_id)] -= ledger.quantity
+
+    apply_balance_deltas(deltas)
+    apply_batch_balance_deltas(batch_deltas)
+    StockLedgerEntry.objects.bulk_create(reversals)
+    _set_serial_status(entry, CANCEL_SERIAL_STATUS)
+
+    entry.stockentry_status = 'CANCELLED'
+    entry.save(update_fields=['stockentry_status'])
+    return entry
+
+
+def _set_serial_status(entry, status_map):
+    new_status = status_map.get(entry.entry_type)
+    if new_status is None:
+        return
+    InventorySerialNumber.objects.filter(stockentryitem__stock_entry=entry).update(status=new_status)
+
+
+# Serial numbers
+
+SERIAL_CHUNK_SIZE = 5000
+MAX_SERIALS_PER_REQUEST = 100000
+
+
+def serial_number_range(prefix, start, end, padding=0):
+    """Expand prefix + start..end (inclusive) into serial numbers, zero padded to `padding` digits."""
+    if end < start:
+        raise ValidationError("Range end must not be before range start.")
+    if end - start + 1 > MAX_SERIALS_PER_REQUEST:
+        raise ValidationError(f"At most {MAX_SERIALS_PER_REQUEST} serial numbers can be registered per request.")
+    return [f"{prefix}{number:0{padding}d}" for number in range(start, end + 1)]
+
+
+@transaction.atomic
+def register_serial_numbers(item, serial_numbers, batch=None, warranty_expiry_date=None, stock_entry_item=None):
+    """
+    Create InventorySerialNumber rows in chunks of SERIAL_CHUNK_SIZE.
+
+    Duplicates (within the request or already registered) reject the whole
+    request. When `stock_entry_item` is given the new serials are linked to it
+    in the same transaction. Returns the number of serials created.
+    """
+    if len(serial_numbers) > MAX_SERIALS_PER_REQUEST:
+        raise ValidationError(f"At most {MAX_SERIALS_PER_REQUEST} serial numbers can be registered per request.")
+    if len(set(serial_numbers)) != len(serial_numbers):
+        raise ValidationError("Serial numbers in the request must be unique.")
+    if stock_entry_item is not None and stock_entry_item.item_id != item.pk:
+        raise ValidationError("Serial numbers must belong to the stock entry item's item.")
+
+    existing = []
+    for offset in range(0, len(serial_numbers), SERIAL_CHUNK_SIZE):
+        chunk = serial_numbers[offset:offset + SERIAL_CHUNK_SIZE]
+        existing.extend(InventorySerialNumber.objects.filter(serial_number__in=chunk).values_list('serial_number', flat=True))
+    if existing:
+        raise ValidationError(f"{len(existing)} serial number(s) already exist, e.g. {', '.join(sorted(existing)[:10])}.")
+
+    InventorySerialNumber.objects.bulk_create(
+        (
+            InventorySerialNumber(
+                serial_number=serial_number, item=item, batch=batch, warranty_expiry_date=warranty_expiry_date
+            )
+            for serial_number in serial_numbers
+        ),
+        batch_size=SERIAL_CHUNK_SIZE,
+    )
+    if stock_entry_item is not None:
+        link_serial_numbers(stock_entry_item, serial_numbers)
+    return len(serial_numbers)
+
+
+@transaction.atomic
+def link_serial_numbers(stock_entry_item, serial_numbers):
+    """
+    Attach serial numbers (by value) to a stock entry line by bulk inserting
+    M2M through rows chunk by chunk. Already linked serials are ignored.
+    Returns the number of serials now linked to the line.
+    """
+    if stock_entry_item.stock_entry.stockentry_status != 'DRAFT':
+        raise ValidationError("Serial numbers can only be linked to lines of draft stock entries.")
+    through = StockEntryItem.serial_numbers.through
+    found = 0
+    for offset in range(0, len(serial_numbers), SERIAL_CHUNK_SIZE):
+        chunk = serial_numbers[offset:offset + SERIAL_CHUNK_SIZE]
+        rows = list(InventorySerialNumber.objects.filter(serial_number__in=chunk).values_list('pk', 'item_id'))
+        if any(item_id != stock_entry_item.item_id for _, item_id in rows):
+            raise ValidationError("Serial numbers must belong to the stock entry item's item.")
+        found += len(rows)
+        through.objects.bulk_create(
+            [through(stockentryitem_id=stock_entry_item.pk, inventoryserialnumber_id=pk) for pk, _ in rows],
+            ignore_conflicts=True,
+        )
+    if found != len(set(serial_numbers)):
+        raise ValidationError(f"{len(set(serial_numbers)) - found} serial number(s) are not registered.")
+    return stock_entry_item.serial_numbers.count()
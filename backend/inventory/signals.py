@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Item
+from .services import refresh_item_stock_summaries
+
+
+@receiver(post_save, sender=Item)
+def refresh_reorder_status(sender, instance, **kwargs):
+    # reorder_level may have changed, re-evaluate the item's shortage
+    refresh_item_stock_summaries(item_ids=[instance.pk])
@@ -1,3 +1,255 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .importers import import_opening_balances
+from .models import (
+    Batch, BatchBalance, InventorySerialNumber, Item, ItemGroup, ItemStockSummary, StockBalance, StockEntry, StockEntryItem, StockLedgerEntry, UnitOfMeasure, Warehouse,
+)
+from .services import (
+    apply_balance_deltas, cancel_stock_entry, expiring_batch_balances, fefo_pick_list, refresh_item_stock_summaries,
+    register_serial_numbers, serial_number_range, submit_stock_entry,
+)
+
+
+class InventoryTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.uom = UnitOfMeasure.objects.create(name='Piece', abbreviation='pc')
+        self.main = Warehouse.objects.create(code='MAIN', name='Main')
+        self.store = Warehouse.objects.create(code='STORE', name='Store')
+        self.item = Item.objects.create(sku='SKU1', name='Item 1', unit_of_measure=self.uom)
+        apply_balance_deltas({(self.item.pk, self.main.pk): Decimal('50')})
+
+    def balance(self, warehouse):
+        return StockBalance.objects.get(item=self.item, warehouse=warehouse)
+
+    def create_entry(self, entry_type='TRANSFER', quantity='10'):
+        entry = StockEntry.objects.create(entry_type=entry_type, from_warehouse=self.main, to_warehouse=self.store)
+        StockEntryItem.objects.create(stock_entry=entry, item=self.item, quantity=Decimal(quantity), uom=self.uom)
+        return entry
+
+
+class StockEntryPostingTests(InventoryTestCase):
+    def test_submit_posts_ledger_and_balances(self):
+        submit_stock_entry(self.create_entry())
+        self.assertEqual(self.balance(self.main).quantity, Decimal('40'))
+        self.assertEqual(self.balance(self.store).quantity, Decimal('10'))
+        self.assertEqual(
+            sorted(StockLedgerEntry.objects.filter(stock_entry__isnull=False).values_list('quantity', flat=True)),
+            [Decimal('-10'), Decimal('10')],
+        )
+
+    def test_cancel_reverses_what_was_posted(self):
+        entry = submit_stock_entry(self.create_entry())
+        entry = cancel_stock_entry(entry)
+        self.assertEqual(entry.stockentry_status, 'CANCELLED')
+        self.assertEqual(self.balance(self.main).quantity, Decimal('50'))
+        self.assertEqual(self.balance(self.store).quantity, Decimal('0'))
+        with self.assertRaises(ValidationError):
+            cancel_stock_entry(entry)
+
+    def test_shortage_rejects_the_whole_entry(self):
+        entry = self.create_entry(quantity='60')
+        with self.assertRaises(ValidationError):
+            submit_stock_entry(entry)
+        entry.refresh_from_db()
+        self.assertEqual(entry.stockentry_status, 'DRAFT')
+        self.assertEqual(self.balance(self.main).quantity, Decimal('50'))
+
+
+class BalanceDeltaTests(InventoryTestCase):
+    def test_missing_balances_are_created_and_failures_leave_nothing(self):
+        other = Item.objects.create(sku='SKU2', name='Item 2', unit_of_measure=self.uom)
+        apply_balance_deltas({(self.item.pk, self.main.pk): Decimal('-5'), (other.pk, self.store.pk): Decimal('4')})
+        self.assertEqual(self.balance(self.main).quantity, Decimal('45'))
+        self.assertEqual(StockBalance.objects.get(item=other, warehouse=self.store).quantity, Decimal('4'))
+        # Only the requested pairs get rows, not the item x warehouse cross product
+        self.assertFalse(StockBalance.objects.filter(item=other, warehouse=self.main).exists())
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            apply_balance_deltas({(self.item.pk, self.store.pk): Decimal('1'), (other.pk, self.main.pk): Decimal('-1')})
+        self.assertFalse(StockBalance.objects.filter(item=self.item, warehouse=self.store).exists())
+
+
+class SubmittedStockEntryTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entry = submit_stock_entry(self.create_entry())
+        self.line = self.entry.items.get()
+
+    def test_submitted_entry_cannot_be_changed_or_deleted(self):
+        response = self.client.patch(f"/api/v1/inventory/stock-entries/{self.entry.pk}/", {'remarks': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.delete(f"/api/v1/inventory/stock-entries/{self.entry.pk}/")
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertTrue(StockEntry.objects.filter(pk=self.entry.pk).exists())
+
+    def test_lines_of_submitted_entry_are_fixed(self):
+        response = self.client.patch(f"/api/v1/inventory/stock-entry-items/{self.line.pk}/", {'quantity': '1'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.delete(f"/api/v1/inventory/stock-entry-items/{self.line.pk}/")
+        self.assertEqual(response.status_code, 400, response.content)
+        self.line.refresh_from_db()
+        self.assertEqual(self.line.quantity, Decimal('10'))
+
+    def test_draft_entry_can_be_deleted(self):
+        draft = self.create_entry()
+        response = self.client.delete(f"/api/v1/inventory/stock-entries/{draft.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(StockEntry.objects.filter(pk=draft.pk).exists())
+
+
+class ItemGroupTreeTests(InventoryTestCase):
+    def test_group_cannot_move_under_its_own_subtree(self):
+        root = ItemGroup.objects.create(name='Root')
+        child = ItemGroup.objects.create(name='Child', parent=root)
+        response = self.client.patch(f"/api/v1/inventory/item-groups/{root.pk}/", {'parent': child.pk}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.patch(f"/api/v1/inventory/item-groups/{child.pk}/", {'parent': None}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['data']['depth'], 0)
+
+
+class ReorderLevelTests(InventoryTestCase):
+    def summary(self):
+        return ItemStockSummary.objects.get(item=self.item)
+
+    def test_summary_follows_stock_and_reorder_level(self):
+        self.assertEqual((self.summary().total_quantity, self.summary().below_reorder_level), (Decimal('50'), False))
+        self.item.reorder_level = Decimal('60')
+        self.item.save()
+        self.assertEqual((self.summary().shortage, self.summary().below_reorder_level), (Decimal('10'), True))
+
+        submit_stock_entry(self.create_entry('RECEIPT', '25'))
+        summary = self.summary()
+        self.assertEqual((summary.total_quantity, summary.shortage, summary.below_reorder_level), (Decimal('75'), Decimal('0'), False))
+
+    def test_scan_repairs_drifted_summaries(self):
+        Item.objects.create(sku='SKU2', name='Item 2', reorder_level=Decimal('5'))
+        StockBalance.objects.filter(item=self.item).update(quantity=Decimal('3'))  # Bypasses the incremental summary
+        Item.objects.filter(pk=self.item.pk).update(reorder_level=Decimal('4'))
+        self.assertEqual(refresh_item_stock_summaries(chunk_size=1), 2)
+        self.assertEqual(self.summary().total_quantity, Decimal('3'))
+
+
+class BatchTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.receipt = StockEntry.objects.create(entry_type='RECEIPT', to_warehouse=self.main)
+        self.batches = {}
+        for number, expiry_date, quantity in (
+            ('EXPIRED', date(2026, 3, 1), '5'), ('LATE', date(2026, 6, 1), '10'), ('SOON', date(2026, 4, 1), '10'), ('OPEN', None, '20'),
+        ):
+            batch = Batch.objects.create(batch_number=number, item=self.item, expiry_date=expiry_date)
+            StockEntryItem.objects.create(stock_entry=self.receipt, item=self.item, quantity=Decimal(quantity), uom=self.uom, batch=batch)
+            self.batches[number] = batch
+        submit_stock_entry(self.receipt)
+
+    def test_fefo_skips_expired_batches_and_picks_open_ended_ones_last(self):
+        picks, shortfall = fefo_pick_list(self.item.pk, Decimal('25'), on_date=date(2026, 3, 15))
+        self.assertEqual(
+            [(pick['batch_number'], pick['pick_quantity']) for pick in picks],
+            [('SOON', Decimal('10')), ('LATE', Decimal('10')), ('OPEN', Decimal('5'))],
+        )
+        self.assertEqual(shortfall, 0)
+        self.assertEqual(fefo_pick_list(self.item.pk, Decimal('50'), on_date=date(2026, 3, 15))[1], Decimal('10'))
+
+    def test_expiry_report_and_batch_changes(self):
+        expiring = expiring_batch_balances(30, on_date=date(2026, 3, 15))
+        self.assertEqual([balance.batch.batch_number for balance in expiring], ['SOON'])
+        batch = self.batches['LATE']
+        batch.expiry_date = date(2026, 3, 20)
+        batch.save()
+        self.assertEqual([balance.batch.batch_number for balance in expiring_batch_balances(30, on_date=date(2026, 3, 15))], ['LATE', 'SOON'])
+
+    def test_cancel_empties_the_batches(self):
+        cancel_stock_entry(self.receipt)
+        self.assertFalse(BatchBalance.objects.filter(quantity__gt=0).exists())
+        self.assertEqual(fefo_pick_list(self.item.pk, Decimal('1'), on_date=date(2026, 3, 15)), ([], Decimal('1')))
+
+
+class SerialNumberTests(InventoryTestCase):
+    def test_range_is_padded_and_bounded(self):
+        self.assertEqual(serial_number_range('SN-', 8, 10, padding=3), ['SN-008', 'SN-009', 'SN-010'])
+        with self.assertRaises(ValidationError):
+            serial_number_range('SN-', 10, 8)
+
+    def test_duplicates_reject_the_whole_request(self):
+        register_serial_numbers(self.item, ['A1', 'A2'])
+        with self.assertRaises(ValidationError):
+            register_serial_numbers(self.item, ['B1', 'B1'])
+        with self.assertRaises(ValidationError):
+            register_serial_numbers(self.item, ['B1', 'A2'])
+        self.assertEqual(sorted(InventorySerialNumber.objects.values_list('serial_number', flat=True)), ['A1', 'A2'])
+
+    def test_generated_serials_are_linked_and_looked_up(self):
+        line = self.create_entry().items.get()
+        response = self.client.post('/api/v1/inventory/serial-numbers/bulk-generate/', {
+            'item_id': self.item.pk, 'prefix': 'SN', 'start': 1, 'end': 12, 'padding': 2, 'stock_entry_item_id': line.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['data']['created'], 12)
+        self.assertEqual(line.serial_numbers.count(), 12)
+
+        response = self.client.get('/api/v1/inventory/serial-numbers/lookup/', {'q': 'SN0', 'prefix': 'true'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['data']['total_count'], 9)
+
+    def test_serials_of_another_item_are_not_linked(self):
+        other = Item.objects.create(sku='SKU2', name='Item 2', unit_of_measure=self.uom)
+        line = self.create_entry().items.get()
+        with self.assertRaises(ValidationError):
+            register_serial_numbers(other, ['X1'], stock_entry_item=line)
+        self.assertFalse(InventorySerialNumber.objects.exists())
+
+
+class StockMatrixTests(InventoryTestCase):
+    def test_matrix_is_column_oriented_and_zero_filled(self):
+        other = Item.objects.create(sku='SKU2', name='Item 2', unit_of_measure=self.uom)
+        apply_balance_deltas({(other.pk, self.store.pk): Decimal('7')})
+        response = self.client.get('/api/v1/inventory/stock-balances/matrix/', {'warehouses': f'{self.store.pk},{self.main.pk}'})
+        self.assertEqual(response.status_code, 200, response.content)
+        matrix = response.json()['data']['data']
+        self.assertEqual((matrix['item_ids'], matrix['warehouse_ids']), ([self.item.pk, other.pk], [self.main.pk, self.store.pk]))
+        self.assertEqual([[Decimal(str(cell)) for cell in column] for column in matrix['quantities']], [[50, 0], [0, 7]])
+
+    def test_malformed_filters_are_rejected(self):
+        response = self.client.get('/api/v1/inventory/stock-balances/matrix/', {'warehouses': '1,x'})
+        self.assertEqual(response.status_code, 400, response.content)
+
+
+class OpeningBalanceImportTests(InventoryTestCase):
+    def import_csv(self, text, chunk_size=2000):
+        return import_opening_balances(io.BytesIO(text.encode()), 'openings.csv', chunk_size=chunk_size)
+
+    def test_valid_rows_post_while_bad_rows_are_reported(self):
+        Item.objects.create(sku='SKU2', name='Item 2', unit_of_measure=self.uom)
+        result = self.import_csv(
+            "SKU,Warehouse,Quantity,Posting_Date\n"
+            "SKU1,STORE,5,2026-01-01\n"
+            "NOPE,STORE,5,\n"
+            "SKU2,NOPE,5,\n"
+            "SKU2,STORE,-1,\n"
+            "SKU2,STORE,3,01/01/2026\n"
+            "SKU2,MAIN,4,\n"
+            "SKU1,STORE,6,\n",
+            chunk_size=2,
+        )
+        self.assertEqual((result['created'], result['error_count']), (2, 5))
+        self.assertEqual([error['row'] for error in result['errors']], [3, 4, 5, 6, 8])
+        self.assertEqual(self.balance(self.store).quantity, Decimal('5'))
+        self.assertEqual(
+            StockLedgerEntry.objects.get(item=self.item, warehouse=self.store).transaction_date.date(), date(2026, 1, 1),
+        )
 
-# Create your tests here.
+    def test_existing_openings_are_not_posted_twice(self):
+        self.import_csv("sku,warehouse,quantity\nSKU1,STORE,5\n")
+        result = self.import_csv("sku,warehouse,quantity\nSKU1,STORE,5\n")
+        self.assertEqual((result['created'], result['error_count']), (0, 1))
+        self.assertEqual(self.balance(self.store).quantity, Decimal('5'))
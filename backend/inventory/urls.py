@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ItemGroupViewSet, BrandViewSet, UnitOfMeasureViewSet, ItemViewSet, WarehouseViewSet,
     StockLedgerEntryViewSet, StockEntryViewSet, StockBalanceViewSet, StockOpeningBalanceViewSet,
-    BatchViewSet, InventorySerialNumberViewSet, StockEntryItemViewSet
+    BatchViewSet, BatchBalanceViewSet, InventorySerialNumberViewSet, StockEntryItemViewSet
 )
 
 router = DefaultRouter()
@@ -17,6 +17,7 @@ router.register(r'stock-entries', StockEntryViewSet, basename='stockentry')
 router.register(r'stock-balances', StockBalanceViewSet, basename='stockbalance')
 router.register(r'stock-opening-balances', StockOpeningBalanceViewSet, basename='stockopeningbalance')
 router.register(r'batches', BatchViewSet, basename='batch')
+router.register(r'batch-balances', BatchBalanceViewSet, basename='batchbalance')
 router.register(r'serial-numbers', InventorySerialNumberViewSet, basename='serialnumber')
 router.register(r'stock-entry-items', StockEntryItemViewSet, basename='stockentryitem')
 
@@ -1,17 +1,29 @@
-from rest_framework import viewsets, status, pagination
-from drf_spectacular.utils import extend_schema
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from rest_framework import viewsets, status, pagination, decorators, exceptions
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.openapi import AutoSchema
 from .models import (
     ItemGroup, Brand, UnitOfMeasure, Item, Warehouse,
     StockLedgerEntry, StockEntry, StockBalance, StockOpeningBalance,
-    Batch, InventorySerialNumber, StockEntryItem
+    Batch, InventorySerialNumber, StockEntryItem, ItemStockSummary, BatchBalance
 )
 from .serializers import (
     ItemGroupSerializer, BrandSerializer, UnitOfMeasureSerializer, ItemSerializer, WarehouseSerializer,
     StockLedgerEntrySerializer, StockEntrySerializer, StockBalanceSerializer, StockOpeningBalanceSerializer,
-    BatchSerializer, InventorySerialNumberSerializer, StockEntryItemSerializer
+    BatchSerializer, InventorySerialNumberSerializer, StockEntryItemSerializer, ItemShortageSerializer,
+    BatchBalanceSerializer, FEFOPickListSerializer, SerialNumberRangeSerializer, SerialNumberImportSerializer,
+    SerialNumberLinkSerializer, SerialNumberLookupSerializer, PaginatedStockMatrixSerializer,
+    OpeningBalanceImportSerializer, OpeningBalanceImportResultSerializer
+)
+from .services import (
+    submit_stock_entry, cancel_stock_entry, fefo_pick_list, expiring_batch_balances,
+    serial_number_range, register_serial_numbers, link_serial_numbers, stock_matrix
 )
+from .importers import import_opening_balances
 from backend.utils.response import Response
+from backend.utils.tree import filter_by_tree
 
 class CustomSchema(AutoSchema):
     pass
@@ -39,7 +51,7 @@ class CustomResponseModelViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
-        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+        return Response(data=serializer.data, code=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -50,7 +62,7 @@ class CustomResponseModelViewSet(viewsets.ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         self.perform_destroy(self.get_object())
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(code=status.HTTP_204_NO_CONTENT)
 
 
 @extend_schema(
@@ -62,6 +74,10 @@ class ItemGroupViewSet(CustomResponseModelViewSet):
     queryset = ItemGroup.objects.all()
     serializer_class = ItemGroupSerializer
 
+    def get_queryset(self):
+        # ?descendants_of=<id> / ?ancestors_of=<id>
+        return filter_by_tree(super().get_queryset(), self.request.GET, '', ItemGroup, '')
+
 @extend_schema(
     summary="Manage Brands",
     description="Create, retrieve, update, and delete product brands.",
@@ -89,6 +105,35 @@ class ItemViewSet(CustomResponseModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
 
+    def get_queryset(self):
+        # ?item_group_descendants_of=<id> / ?item_group_ancestors_of=<id>
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item_group')
+
+    @extend_schema(
+        summary="Items below reorder level",
+        description="Paginated list of active items whose total stock across warehouses is below their reorder level, largest shortage first.",
+        parameters=[
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Results per page', required=False, type=int),
+        ],
+        responses=ItemShortageSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='shortages')
+    def shortages(self, request):
+        queryset = (
+            ItemStockSummary.objects.filter(below_reorder_level=True, item__is_active=True)
+            .select_related('item')
+            .order_by('-shortage', 'item_id')
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request)
+        return Response(data={
+            'total_count': paginator.page.paginator.count,
+            'next_page': paginator.get_next_link(),
+            'prev_page': paginator.get_previous_link(),
+            'data': ItemShortageSerializer(page, many=True).data
+        })
+
 @extend_schema(
     summary="Manage Warehouses",
     description="Create and manage warehouses where stock is stored.",
@@ -107,15 +152,54 @@ class StockLedgerEntryViewSet(CustomResponseModelViewSet):
     queryset = StockLedgerEntry.objects.all()
     serializer_class = StockLedgerEntrySerializer
 
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item__item_group')
+
 @extend_schema(
     summary="Stock Entries",
     description="Record stock movements such as receipts, issues, transfers, repackaging, and adjustments.",
     tags=["Inventory"]
 )
 class StockEntryViewSet(CustomResponseModelViewSet):
-    queryset = StockEntry.objects.all()
+    queryset = StockEntry.objects.select_related('from_warehouse', 'to_warehouse').prefetch_related(
+        'items__item__item_group', 'items__item__brand', 'items__item__unit_of_measure', 'items__batch', 'items__serial_numbers',
+    )
     serializer_class = StockEntrySerializer
 
+    def perform_destroy(self, instance):
+        # Deleting a submitted entry would orphan its ledger rows; cancelling reverses them
+        if instance.stockentry_status != 'DRAFT':
+            raise exceptions.ValidationError("Only draft stock entries can be deleted; cancel a submitted entry instead.")
+        super().perform_destroy(instance)
+
+    @extend_schema(
+        summary="Submit a stock entry",
+        description="Posts a draft stock entry to the stock ledger and updates balances of the affected warehouses in one transaction.",
+        request=None,
+        responses=StockEntrySerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='submit')
+    def submit(self, request, pk=None):
+        try:
+            entry = submit_stock_entry(self.get_object())
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=self.get_serializer(entry).data, message="Stock entry submitted")
+
+    @extend_schema(
+        summary="Cancel a stock entry",
+        description="Reverses the ledger rows and balances posted by a submitted stock entry.",
+        request=None,
+        responses=StockEntrySerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request, pk=None):
+        try:
+            entry = cancel_stock_entry(self.get_object())
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=self.get_serializer(entry).data, message="Stock entry cancelled")
+
 @extend_schema(
     summary="Stock Balances",
     description="View current stock quantities per item per warehouse (denormalized for quick lookups).",
@@ -125,6 +209,50 @@ class StockBalanceViewSet(CustomResponseModelViewSet):
     queryset = StockBalance.objects.all()
     serializer_class = StockBalanceSerializer
 
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item__item_group')
+
+    @extend_schema(
+        summary="Stock matrix",
+        description="Items x warehouses quantity grid in column-oriented form, paginated on the item axis.",
+        parameters=[
+            OpenApiParameter(name='item_group', description='Item group ID (includes its subgroups)', required=False, type=int),
+            OpenApiParameter(name='brand', description='Brand ID', required=False, type=int),
+            OpenApiParameter(name='warehouses', description='Comma separated warehouse IDs (default: all active warehouses)', required=False, type=str),
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Items per page', required=False, type=int),
+        ],
+        responses=PaginatedStockMatrixSerializer
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='matrix')
+    def matrix(self, request):
+        items = Item.objects.filter(is_active=True)
+        try:
+            if request.GET.get('item_group'):
+                group_path = ItemGroup.objects.filter(pk=int(request.GET['item_group'])).values_list('path', flat=True).first()
+                items = items.filter(item_group__path__startswith=group_path) if group_path else items.none()
+            if request.GET.get('brand'):
+                items = items.filter(brand_id=int(request.GET['brand']))
+            if request.GET.get('warehouses'):
+                warehouse_ids = sorted({int(pk) for pk in request.GET['warehouses'].split(',')})
+            else:
+                warehouse_ids = list(Warehouse.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+        except ValueError:
+            return Response(success=False, message="'item_group', 'brand' and 'warehouses' must be integer IDs.", code=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        item_ids = list(paginator.paginate_queryset(items.order_by('pk').values_list('pk', flat=True), request))
+        return Response(data={
+            'total_count': paginator.page.paginator.count,
+            'next_page': paginator.get_next_link(),
+            'prev_page': paginator.get_previous_link(),
+            'data': {
+                'item_ids': item_ids,
+                'warehouse_ids': warehouse_ids,
+                'quantities': stock_matrix(item_ids, warehouse_ids),
+            }
+        })
+
 @extend_schema(
     summary="Stock Opening Balances",
     description="Set or update initial stock balances for items when starting stock tracking.",
@@ -134,6 +262,27 @@ class StockOpeningBalanceViewSet(CustomResponseModelViewSet):
     queryset = StockOpeningBalance.objects.all()
     serializer_class = StockOpeningBalanceSerializer
 
+    @extend_schema(
+        summary="Import opening balances",
+        description="Streams a CSV/XLSX file of opening balances, posting openings, ledger entries and balances in chunked transactions. Invalid rows are reported without aborting the file.",
+        request={'multipart/form-data': OpeningBalanceImportSerializer},
+        responses=OpeningBalanceImportResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        serializer = OpeningBalanceImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        try:
+            result = import_opening_balances(upload, upload.name, chunk_size=serializer.validated_data['chunk_size'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            data=OpeningBalanceImportResultSerializer(result).data,
+            success=result['error_count'] == 0,
+            message=f"Imported {result['created']} opening balance(s), {result['error_count']} row(s) rejected"
+        )
+
 @extend_schema(
     summary="Batch Management",
     description="Manage batches of items including manufacture and expiry dates.",
@@ -143,6 +292,73 @@ class BatchViewSet(CustomResponseModelViewSet):
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
 
+    @extend_schema(
+        summary="FEFO pick list",
+        description="Returns the first-expired-first-out batches to pick for a requested item quantity. Expired batches are skipped.",
+        parameters=[
+            OpenApiParameter(name='item', description='Item ID', required=True, type=int),
+            OpenApiParameter(name='quantity', description='Quantity to pick', required=True, type=str),
+            OpenApiParameter(name='warehouse', description='Restrict picking to one warehouse', required=False, type=int),
+        ],
+        responses=FEFOPickListSerializer
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='fefo')
+    def fefo(self, request):
+        try:
+            item_id = int(request.GET['item'])
+            quantity = Decimal(request.GET['quantity'])
+            warehouse_id = int(request.GET['warehouse']) if request.GET.get('warehouse') else None
+        except (KeyError, ValueError, InvalidOperation):
+            return Response(success=False, message="'item' and 'quantity' are required and must be numeric.", code=status.HTTP_400_BAD_REQUEST)
+        if quantity <= 0:
+            return Response(success=False, message="'quantity' must be positive.", code=status.HTTP_400_BAD_REQUEST)
+
+        picks, shortfall = fefo_pick_list(item_id, quantity, warehouse_id=warehouse_id)
+        return Response(data=FEFOPickListSerializer({
+            'item': item_id,
+            'requested_quantity': quantity,
+            'shortfall': shortfall,
+            'picks': picks,
+        }).data)
+
+    @extend_schema(
+        summary="Batches expiring soon",
+        description="Paginated batch balances with stock on hand that expire within the given number of days.",
+        parameters=[
+            OpenApiParameter(name='days', description='Look-ahead window in days (default 30)', required=False, type=int),
+            OpenApiParameter(name='warehouse', description='Warehouse ID', required=False, type=int),
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Results per page', required=False, type=int),
+        ],
+        responses=BatchBalanceSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='expiring')
+    def expiring(self, request):
+        try:
+            days = int(request.GET.get('days', 30))
+            warehouse_id = int(request.GET['warehouse']) if request.GET.get('warehouse') else None
+        except ValueError:
+            return Response(success=False, message="'days' and 'warehouse' must be integers.", code=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(expiring_batch_balances(days, warehouse_id=warehouse_id), request)
+        return Response(data={
+            'total_count': paginator.page.paginator.count,
+            'next_page': paginator.get_next_link(),
+            'prev_page': paginator.get_previous_link(),
+            'data': BatchBalanceSerializer(page, many=True).data
+        })
+
+@extend_schema(
+    summary="Batch Balances",
+    description="View stock quantities per batch per warehouse. Balances are maintained by submitting stock entries.",
+    tags=["Inventory"]
+)
+class BatchBalanceViewSet(CustomResponseModelViewSet):
+    queryset = BatchBalance.objects.select_related('batch').order_by('item_id', 'warehouse_id', 'expiry_date')
+    serializer_class = BatchBalanceSerializer
+    http_method_names = ['get', 'head', 'options']
+
 @extend_schema(
     summary="Serial Number Management",
     description="Track serial numbers for items, including status, warranty expiry, and batch association.",
@@ -152,11 +368,100 @@ class InventorySerialNumberViewSet(CustomResponseModelViewSet):
     queryset = InventorySerialNumber.objects.all()
     serializer_class = InventorySerialNumberSerializer
 
+    def _register(self, data, serial_numbers):
+        try:
+            created = register_serial_numbers(
+                data['item_id'], serial_numbers,
+                batch=data.get('batch_id'),
+                warranty_expiry_date=data.get('warranty_expiry_date'),
+                stock_entry_item=data.get('stock_entry_item_id'),
+            )
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'created': created}, message=f"{created} serial number(s) registered", code=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary="Generate a range of serial numbers",
+        description="Registers prefix + start..end serial numbers for an item in one request, optionally linking them to a stock entry item.",
+        request=SerialNumberRangeSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='bulk-generate')
+    def bulk_generate(self, request):
+        serializer = SerialNumberRangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            serial_numbers = serial_number_range(data['prefix'], data['start'], data['end'], data['padding'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return self._register(data, serial_numbers)
+
+    @extend_schema(
+        summary="Import serial numbers",
+        description="Registers an explicit list of serial numbers for an item in one request, optionally linking them to a stock entry item.",
+        request=SerialNumberImportSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='bulk-import')
+    def bulk_import(self, request):
+        serializer = SerialNumberImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._register(serializer.validated_data, serializer.validated_data['serial_numbers'])
+
+    @extend_schema(
+        summary="Look up serial numbers",
+        description="Exact or prefix lookup of serial numbers backed by the unique serial_number index.",
+        parameters=[
+            OpenApiParameter(name='q', description='Serial number or prefix', required=True, type=str),
+            OpenApiParameter(name='prefix', description='Set to true for a prefix search', required=False, type=bool),
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Results per page', required=False, type=int),
+        ],
+        responses=SerialNumberLookupSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='lookup')
+    def lookup(self, request):
+        query = request.GET.get('q', '')
+        if not query:
+            return Response(success=False, message="'q' is required.", code=status.HTTP_400_BAD_REQUEST)
+        if request.GET.get('prefix', '').lower() in ('1', 'true', 'yes'):
+            queryset = InventorySerialNumber.objects.filter(serial_number__startswith=query).order_by('serial_number')
+        else:
+            queryset = InventorySerialNumber.objects.filter(serial_number=query).order_by('serial_number')
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request)
+        return Response(data={
+            'total_count': paginator.page.paginator.count,
+            'next_page': paginator.get_next_link(),
+            'prev_page': paginator.get_previous_link(),
+            'data': SerialNumberLookupSerializer(page, many=True).data
+        })
+
 @extend_schema(
     summary="Stock Entry Items",
     description="Manage individual items within a stock entry, including batch and serial number associations.",
     tags=["Inventory"]
 )
 class StockEntryItemViewSet(CustomResponseModelViewSet):
-    queryset = StockEntryItem.objects.all()
+    queryset = StockEntryItem.objects.select_related('stock_entry')
     serializer_class = StockEntryItemSerializer
+
+    def perform_destroy(self, instance):
+        if instance.stock_entry.stockentry_status != 'DRAFT':
+            raise exceptions.ValidationError("Lines can only be removed while the stock entry is a draft.")
+        super().perform_destroy(instance)
+
+    @extend_schema(
+        summary="Link serial numbers to a stock entry item",
+        description="Attaches registered serial numbers to the line with batched inserts into the link table.",
+        request=SerialNumberLinkSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='link-serials')
+    def link_serials(self, request, pk=None):
+        serializer = SerialNumberLinkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            linked = link_serial_numbers(self.get_object(), serializer.validated_data['serial_numbers'])
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'linked': linked}, message=f"{linked} serial number(s) linked")
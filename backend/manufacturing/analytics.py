@@ -0,0 +1,248 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import JobCard, DowntimeEntry, RoutingOperation, Workstation, WorkstationHourlyUsage, Shift
+
+HOUR = timedelta(hours=1)
+
+
+def floor_hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(moment):
+    floored = floor_hour(moment)
+    return floored if floored == moment else floored + HOUR
+
+
+def merge_intervals(intervals):
+    """Union of (start, end) intervals as a sorted list of disjoint intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def spread_by_hour(start, end, amount=None):
+    """
+    Yield (hour, seconds) for every hour bucket the interval overlaps. With
+    `amount`, yield that amount spread over the buckets in proportion to the
+    overlap instead.
+    """
+    total = (end - start).total_seconds()
+    hour = floor_hour(start)
+    while hour < end:
+        overlap = (min(end, hour + HOUR) - max(start, hour)).total_seconds()
+        yield hour, overlap if amount is None else amount * overlap / total
+        hour += HOUR
+
+
+def _standard_times(pairs):
+    """
+    Routing standard (setup, per unit) minutes for the given (item_id,
+    operation_id) pairs; the latest routing wins. Only routing operations of
+    the pairs' items and operations are read.
+    """
+    if not pairs:
+        return {}
+    rows = RoutingOperation.objects.filter(
+        routing__item_id__in={item_id for item_id, _ in pairs},
+        operation_id__in={operation_id for _, operation_id in pairs},
+    ).values_list('routing__item_id', 'operation_id', 'setup_time', 'time_per_unit').order_by('routing_id')
+    return {
+        (item_id, operation_id): (setup, per_unit)
+        for item_id, operation_id, setup, per_unit in rows if (item_id, operation_id) in pairs
+    }
+
+
+def _operation_spans(work_order_ids):
+    """
+    Total completed job card time per (work_order_id, operation_id), so a
+    card's share of its work order quantity follows its share of that time.
+    """
+    if not work_order_ids:
+        return {}
+    rows = JobCard.objects.filter(
+        work_order_id__in=work_order_ids, jobcard_status='COMPLETED', end_time__gt=F('start_time'),
+    ).values('work_order_id', 'operation_id').annotate(
+        span=Sum(ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField()))
+    )
+    return {(row['work_order_id'], row['operation_id']): row['span'].total_seconds() for row in rows}
+
+
+@transaction.atomic
+def refresh_workstation_usage(start, end, workstation_ids=None):
+    """
+    Rebuild the hourly usage buckets between `start` and `end` (widened to
+    whole hours) from completed job cards and closed downtime entries.
+    Overlapping intervals on one workstation are merged before they are
+    split into buckets, so a bucket never holds more than an hour of busy or
+    downtime. Job cards carry no quantity of their own: when an operation of
+    a work order is split over several cards, each is credited with the part
+    of the work order quantity matching its share of the operation's card
+    time. Returns the number of buckets written.
+    """
+    start, end = floor_hour(start), ceil_hour(end)
+    overlaps = Q(start_time__lt=end, end_time__gt=start)
+    cards = JobCard.objects.filter(overlaps, jobcard_status='COMPLETED')
+    downtime = DowntimeEntry.objects.filter(overlaps)
+    buckets = WorkstationHourlyUsage.objects.filter(hour__gte=start, hour__lt=end)
+    if workstation_ids is not None:
+        cards = cards.filter(workstation_id__in=workstation_ids)
+        downtime = downtime.filter(workstation_id__in=workstation_ids)
+        buckets = buckets.filter(workstation_id__in=workstation_ids)
+
+    busy = defaultdict(list)
+    down = defaultdict(list)
+    usage = defaultdict(lambda: [0.0, 0.0, 0.0])
+    card_rows = list(cards.values_list(
+        'workstation_id', 'start_time', 'end_time', 'operation_id', 'work_order_id', 'work_order__item_id', 'work_order__quantity'
+    ))
+    standards = _standard_times({(item_id, operation_id) for _, _, _, operation_id, _, item_id, _ in card_rows})
+    spans = _operation_spans({work_order_id for _, _, _, _, work_order_id, _, _ in card_rows})
+
+    for workstation_id, card_start, card_end, operation_id, work_order_id, item_id, quantity in card_rows:
+        if card_end <= card_start:
+            continue
+        busy[workstation_id].append((max(card_start, start), min(card_end, end)))
+        setup, per_unit = standards.get((item_id, operation_id), (0, 0))
+        share = (card_end - card_start).total_seconds() / spans[(work_order_id, operation_id)]
+        ideal = (float(setup) + float(per_unit) * quantity * share) * 60
+        if ideal:
+            for hour, seconds in spread_by_hour(card_start, card_end, ideal):
+                if start <= hour < end:
+                    usage[(workstation_id, hour)][2] += seconds
+
+    for workstation_id, down_start, down_end in downtime.values_list('workstation_id', 'start_time', 'end_time'):
+        down[workstation_id].append((max(down_start, start), min(down_end, end)))
+
+    for column, intervals_by_workstation in ((0, busy), (1, down)):
+        for workstation_id, intervals in intervals_by_workstation.items():
+            for interval_start, interval_end in merge_intervals(intervals):
+                for hour, seconds in spread_by_hour(interval_start, interval_end):
+                    usage[(workstation_id, hour)][column] += seconds
+
+    buckets.delete()
+    WorkstationHourlyUsage.objects.bulk_create([
+        WorkstationHourlyUsage(
+            workstation_id=workstation_id, hour=hour,
+            busy_seconds=round(busy_seconds), downtime_seconds=round(downtime_seconds), ideal_seconds=round(ideal_seconds),
+        )
+        for (workstation_id, hour), (busy_seconds, downtime_seconds, ideal_seconds) in usage.items()
+    ], batch_size=1000)
+    return len(usage)
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def usage_metrics(planned_seconds, busy_seconds, downtime_seconds, ideal_seconds):
+    """
+    Availability = (planned - downtime) / planned, utilisation = busy /
+    available time and performance = ideal / busy time. There is no scrap
+    data, so OEE is availability x performance.
+    """
+    available = max(planned_seconds - downtime_seconds, 0)
+    availability = _ratio(available, planned_seconds)
+    performance = _ratio(ideal_seconds, busy_seconds)
+    return {
+        'planned_hours': round(planned_seconds / 3600, 2),
+        'busy_hours': round(busy_seconds / 3600, 2),
+        'downtime_hours': round(downtime_seconds / 3600, 2),
+        'availability': availability,
+        'utilisation': _ratio(busy_seconds, available),
+        'performance': performance,
+        'oee': round(availability * performance, 4) if availability is not None and performance is not None else None,
+    }
+
+
+def planned_seconds(start, end, shifts):
+    """
+    Seconds of [start, end) inside working time: the hour buckets whose
+    (local) start time some shift covers, as shift_oee counts them. Without
+    a shift calendar every hour is working time.
+    """
+    if not shifts:
+        return (end - start).total_seconds()
+    planned = 0
+    hour = start
+    while hour < end:
+        local_time = timezone.localtime(hour).time()
+        if any(shift.covers(local_time) for shift in shifts):
+            planned += 3600
+        hour += HOUR
+    return planned
+
+
+def workstation_oee(start, end, workstation_ids=None):
+    """
+    Metrics per workstation over [start, end) from the hourly buckets, one
+    grouped query. Planned time is the shift calendar's working time.
+    """
+    start, end = floor_hour(start), ceil_hour(end)
+    planned = planned_seconds(start, end, list(Shift.objects.all()))
+    workstations = Workstation.objects.all()
+    if workstation_ids is not None:
+        workstations = workstations.filter(pk__in=workstation_ids)
+    totals = {
+        row['workstation_id']: row for row in WorkstationHourlyUsage.objects.filter(
+            hour__gte=start, hour__lt=end, workstation_id__in=workstations.values('pk')
+        ).values('workstation_id').annotate(
+            busy=Sum('busy_seconds'), downtime=Sum('downtime_seconds'), ideal=Sum('ideal_seconds')
+        )
+    }
+    results = []
+    for workstation_id, name in workstations.values_list('id', 'name').order_by('name'):
+        row = totals.get(workstation_id, {})
+        results.append({
+            'workstation_id': workstation_id,
+            'workstation': name,
+            **usage_metrics(planned, row.get('busy') or 0, row.get('downtime') or 0, row.get('ideal') or 0),
+        })
+    return results
+
+
+def shift_oee(start, end, workstation_ids=None):
+    """
+    Metrics per shift over [start, end). An hour bucket belongs to every
+    shift whose hours cover the bucket's (local) start time.
+    """
+    start, end = floor_hour(start), ceil_hour(end)
+    shifts = list(Shift.objects.order_by('start_time'))
+    workstations = Workstation.objects.all()
+    if workstation_ids is not None:
+        workstations = workstations.filter(pk__in=workstation_ids)
+    workstation_count = workstations.count()
+
+    rows = WorkstationHourlyUsage.objects.filter(
+        hour__gte=start, hour__lt=end, workstation_id__in=workstations.values('pk')
+    ).values('hour').annotate(busy=Sum('busy_seconds'), downtime=Sum('downtime_seconds'), ideal=Sum('ideal_seconds'))
+    by_hour = {row['hour']: row for row in rows}
+
+    totals = {shift.pk: [0, 0, 0, 0] for shift in shifts}
+    hour = start
+    while hour < end:
+        local_time = timezone.localtime(hour).time()
+        row = by_hour.get(hour, {})
+        for shift in shifts:
+            if shift.covers(local_time):
+                shift_totals = totals[shift.pk]
+                shift_totals[0] += 3600 * workstation_count
+                shift_totals[1] += row.get('busy') or 0
+                shift_totals[2] += row.get('downtime') or 0
+                shift_totals[3] += row.get('ideal') or 0
+        hour += HOUR
+
+    return [
+        {'shift_id': shift.pk, 'shift': shift.name, **usage_metrics(*totals[shift.pk])}
+        for shift in shifts
+    ]
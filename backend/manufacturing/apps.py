@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ManufacturingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'manufacturing'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from inventory.item_index import register_item_model
+        register_item_model(self.get_model('Item'))
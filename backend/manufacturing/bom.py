@@ -0,0 +1,178 @@
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from backend.utils.versioning import bump_version, current_version
+from .models import BillOfMaterials, BOMComponent
+
+BOM_CACHE_VERSION_KEY = 'manufacturing:bom-resolver-version'
+
+
+def _active_intervals(boms):
+    """
+    Split an item's BOMs into non-overlapping (start, end, bom_id) segments.
+    Where BOMs overlap, the one with the latest effective_from (then the
+    highest id) is active. Dates are ordinals; open ends use date.min/max.
+    """
+    boundaries = sorted({start for start, _, _ in boms} | {end + 1 for _, end, _ in boms})
+    intervals = []
+    for start, next_start in zip(boundaries, boundaries[1:]):
+        covering = [(bom_start, bom_id) for bom_start, bom_end, bom_id in boms if bom_start <= start <= bom_end]
+        if not covering:
+            continue
+        bom_id = max(covering)[1]
+        if intervals and intervals[-1][2] == bom_id and intervals[-1][1] == start - 1:
+            intervals[-1] = (intervals[-1][0], next_start - 1, bom_id)
+        else:
+            intervals.append((start, next_start - 1, bom_id))
+    return intervals
+
+
+class BOMResolver:
+    """
+    In-memory index of effective-dated BOMs.
+
+    All BOMs and components are loaded with two queries. Each item keeps its
+    sorted active intervals, so "which BOM is active on this date" is a
+    bisect instead of a filtered query. The index is rebuilt lazily after any
+    BOM or component write (see manufacturing.signals); the version stamp
+    lives in the database cache (settings.CACHES) so every worker process
+    sees invalidations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._starts = {}
+        self._intervals = {}
+        self._components = {}
+        self._where_used = {}
+
+    def _load(self):
+        boms = defaultdict(list)
+        for bom_id, item_id, effective_from, effective_to in BillOfMaterials.objects.values_list(
+            'id', 'item_id', 'effective_from', 'effective_to'
+        ):
+            start = (effective_from or date.min).toordinal()
+            end = (effective_to or date.max).toordinal()
+            if start <= end:
+                boms[item_id].append((start, end, bom_id))
+
+        components = defaultdict(list)
+        for bom_id, component_id, quantity in BOMComponent.objects.values_list('bom_id', 'component_id', 'quantity'):
+            components[bom_id].append((component_id, quantity))
+
+        self._intervals = {item_id: _active_intervals(item_boms) for item_id, item_boms in boms.items()}
+        self._starts = {item_id: [start for start, _, _ in intervals] for item_id, intervals in self._intervals.items()}
+        self._components = {bom_id: tuple(rows) for bom_id, rows in components.items()}
+        self._where_used = {}
+
+    def _ensure_loaded(self):
+        version = current_version(BOM_CACHE_VERSION_KEY)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self._load()
+                self._version = version
+
+    def _resolve(self, item_id, ordinal):
+        starts = self._starts.get(item_id)
+        if not starts:
+            return None
+        index = bisect_right(starts, ordinal) - 1
+        if index < 0:
+            return None
+        start, end, bom_id = self._intervals[item_id][index]
+        return bom_id if ordinal <= end else None
+
+    def active_bom_id(self, item_id, on_date=None):
+        """Id of the BOM active for `item_id` on `on_date` (default today), or None."""
+        self._ensure_loaded()
+        return self._resolve(item_id, (on_date or timezone.localdate()).toordinal())
+
+    def components(self, item_id, on_date=None):
+        """[(component_id, quantity), ...] of the active BOM, or None when the item has no active BOM."""
+        bom_id = self.active_bom_id(item_id, on_date)
+        return None if bom_id is None else list(self._components.get(bom_id, ()))
+
+    def as_of(self, on_date=None):
+        """The whole effective BOM graph {item_id: [(component_id, quantity), ...]} on `on_date`."""
+        self._ensure_loaded()
+        ordinal = (on_date or timezone.localdate()).toordinal()
+        graph = {}
+        for item_id in self._starts:
+            bom_id = self._resolve(item_id, ordinal)
+            if bom_id is not None:
+                graph[item_id] = list(self._components.get(bom_id, ()))
+        return graph
+
+    def where_used_index(self, on_date=None):
+        """
+        Reverse dependency index {component_id: [(parent_item_id, quantity), ...]}
+        of the graph as of `on_date`, built once per date and index version.
+        """
+        self._ensure_loaded()
+        on_date = on_date or timezone.localdate()
+        index = self._where_used.get(on_date)
+        if index is None:
+            index = defaultdict(list)
+            for parent_id, components in self.as_of(on_date).items():
+                for component_id, quantity in components:
+                    index[component_id].append((parent_id, quantity))
+            if len(self._where_used) >= 32:
+                self._where_used.clear()
+            self._where_used[on_date] = index
+        return index
+
+    def flatten(self, item_id, quantity=1, on_date=None):
+        """
+        Total quantity of every leaf component (items without an active BOM)
+        needed to make `quantity` of `item_id`, as {component_id: quantity}.
+        """
+        self._ensure_loaded()
+        ordinal = (on_date or timezone.localdate()).toordinal()
+        memo = {}
+
+        def per_unit(node, path):
+            if node in memo:
+                return memo[node]
+            bom_id = self._resolve(node, ordinal)
+            if bom_id is None:
+                return None
+            if node in path:
+                raise ValidationError(f"BOM cycle detected at item {node}.")
+            path.add(node)
+            totals = defaultdict(Decimal)
+            for component_id, component_qty in self._components.get(bom_id, ()):
+                leaves = per_unit(component_id, path)
+                if leaves is None:
+                    totals[component_id] += component_qty
+                else:
+                    for leaf_id, leaf_qty in leaves.items():
+                        totals[leaf_id] += component_qty * leaf_qty
+            path.discard(node)
+            memo[node] = totals
+            return totals
+
+        leaves = per_unit(item_id, set())
+        if leaves is None:
+            return {}
+        return {leaf_id: leaf_qty * Decimal(quantity) for leaf_id, leaf_qty in leaves.items()}
+
+
+_resolver = BOMResolver()
+
+
+def get_bom_resolver():
+    return _resolver
+
+
+def invalidate_bom_cache():
+    """Force every process to reload BOMs on its next lookup. Call after bulk BOM writes that skip signals."""
+    bump_version(BOM_CACHE_VERSION_KEY)
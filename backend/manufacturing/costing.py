@@ -0,0 +1,151 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .bom import get_bom_resolver
+from .models import Item
+from .mrp import low_level_codes
+
+COST_PLACES = Decimal('0.0001')
+
+
+def where_used_ancestors(item_ids, index):
+    """Every item that uses any of `item_ids`, directly or through sub-assemblies."""
+    found = set()
+    stack = list(item_ids)
+    while stack:
+        for parent_id, _ in index.get(stack.pop(), ()):
+            if parent_id not in found:
+                found.add(parent_id)
+                stack.append(parent_id)
+    return found
+
+
+def compute_bom_costs(targets, graph, costs):
+    """
+    Material cost per unit of each manufactured item in `targets`.
+
+    `costs` holds the unit cost of every component outside `targets`
+    (purchase cost for bought items, stored BOM cost for other sub-assemblies).
+    Targets are costed deepest first, so each sub-assembly is costed before
+    the items that use it.
+    """
+    subgraph = {
+        item_id: [(component_id, quantity) for component_id, quantity in graph[item_id] if component_id in targets]
+        for item_id in targets
+    }
+    codes = low_level_codes(subgraph)
+    costs = dict(costs)
+    result = {}
+    for item_id in sorted(targets, key=lambda node: codes[node], reverse=True):
+        total = sum((quantity * costs.get(component_id, 0) for component_id, quantity in graph[item_id]), Decimal(0))
+        costs[item_id] = result[item_id] = total.quantize(COST_PLACES)
+    return result
+
+
+@transaction.atomic
+def roll_up_bom_costs(item_ids=None, on_date=None):
+    """
+    Recompute Item.bom_cost bottom-up from the BOMs active on `on_date`.
+
+    With `item_ids`, only those items and their where-used ancestors are
+    recalculated (e.g. after a purchase cost or BOM change); otherwise every
+    manufactured item is. Items that have lost their BOM are reset to zero.
+    Returns the number of items whose cost changed.
+    """
+    resolver = get_bom_resolver()
+    graph = resolver.as_of(on_date or timezone.localdate())
+
+    if item_ids is None:
+        targets = set(graph)
+        rows = Item.objects.all()
+    else:
+        item_ids = set(item_ids)
+        targets = (item_ids | where_used_ancestors(item_ids, resolver.where_used_index(on_date))) & set(graph)
+        needed = targets | item_ids | {component_id for item_id in targets for component_id, _ in graph[item_id]}
+        rows = Item.objects.filter(pk__in=needed)
+
+    current = {}
+    costs = {}
+    for item_id, purchase_cost, bom_cost in rows.values_list('id', 'purchase_cost', 'bom_cost'):
+        current[item_id] = bom_cost
+        costs[item_id] = bom_cost if item_id in graph else purchase_cost
+
+    new_costs = compute_bom_costs(targets, graph, costs)
+    for item_id in current.keys() - graph.keys():
+        if item_ids is None or item_id in item_ids:
+            new_costs[item_id] = Decimal(0)
+
+    changed = [
+        Item(pk=item_id, bom_cost=cost) for item_id, cost in new_costs.items()
+        if item_id in current and current[item_id] != cost
+    ]
+    Item.objects.bulk_update(changed, ['bom_cost'], batch_size=1000)
+    return len(changed)
+
+
+def cost_breakdown(item_id, on_date=None, max_level=1):
+    """
+    Indented cost breakdown of one unit of `item_id` down to `max_level`
+    levels (None for all), using stored purchase and BOM costs. Returns
+    (rows, total) where each row carries its level, parent, quantity per top
+    level unit, unit cost and extended cost.
+    """
+    resolver = get_bom_resolver()
+    graph = resolver.as_of(on_date or timezone.localdate())
+    lines = []
+
+    def walk(parent_id, multiplier, level, path):
+        for component_id, quantity in graph.get(parent_id, ()):
+            lines.append((level, parent_id, component_id, quantity * multiplier))
+            if component_id in graph and component_id not in path and (max_level is None or level < max_level):
+                walk(component_id, quantity * multiplier, level + 1, path | {component_id})
+
+    walk(item_id, Decimal(1), 1, {item_id})
+    items = Item.objects.in_bulk({component_id for _, _, component_id, _ in lines} | {item_id})
+
+    rows = []
+    for level, parent_id, component_id, quantity in lines:
+        component = items[component_id]
+        from_bom = component_id in graph
+        unit_cost = component.bom_cost if from_bom else component.purchase_cost
+        rows.append({
+            'level': level,
+            'parent_id': parent_id,
+            'item_id': component_id,
+            'sku': component.sku,
+            'name': component.name,
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'extended_cost': (quantity * unit_cost).quantize(COST_PLACES),
+            'cost_source': 'BOM' if from_bom else 'PURCHASE',
+        })
+    total = sum((row['extended_cost'] for row in rows if row['level'] == 1), Decimal(0))
+    return rows, total
+
+
+def where_used(item_id, on_date=None, all_levels=False):
+    """
+    Items whose active BOM uses `item_id`, as (level, parent_item_id,
+    via_item_id, quantity) tuples: directly at level 1, and through
+    sub-assemblies at deeper levels when `all_levels` is set.
+    """
+    index = get_bom_resolver().where_used_index(on_date)
+    results = []
+    seen = {item_id}
+    frontier = [item_id]
+    level = 1
+    while frontier:
+        next_frontier = []
+        for via_id in frontier:
+            for parent_id, quantity in index.get(via_id, ()):
+                results.append((level, parent_id, via_id, quantity))
+                if parent_id not in seen:
+                    seen.add(parent_id)
+                    next_frontier.append(parent_id)
+        if not all_levels:
+            break
+        frontier = next_frontier
+        level += 1
+    return results
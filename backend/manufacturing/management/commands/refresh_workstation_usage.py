@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from manufacturing.analytics import refresh_workstation_usage
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly workstation usage buckets behind the OEE reports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=31, help="Number of days back from now to rebuild.")
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        written = refresh_workstation_usage(end - timedelta(days=options['days']), end)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} hourly usage bucket(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from manufacturing.costing import roll_up_bom_costs
+
+
+class Command(BaseCommand):
+    help = "Recompute the rolled-up material cost of every manufactured item from the BOMs active today."
+
+    def handle(self, *args, **options):
+        changed = roll_up_bom_costs()
+        self.stdout.write(self.style.SUCCESS(f"Updated the BOM cost of {changed} item(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from manufacturing.scheduling import schedule_work_orders
+
+
+class Command(BaseCommand):
+    help = "Finite-capacity schedule of work orders onto workstations (all scheduled work orders unless ids are given)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('work_order_ids', nargs='*', type=int, help="Only reschedule these work orders.")
+
+    def handle(self, *args, **options):
+        created, unscheduled = schedule_work_orders(work_order_ids=options['work_order_ids'] or None)
+        for work_order_id, reason in unscheduled.items():
+            self.stderr.write(f"Work order {work_order_id}: {reason}")
+        self.stdout.write(self.style.SUCCESS(f"Scheduled {created} job card(s), {len(unscheduled)} work order(s) skipped."))
@@ -0,0 +1,46 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.utils.encoders import JSONEncoder
+
+from manufacturing.serializers import SimulationRequestSerializer
+from manufacturing.simulation import MAX_WORKERS, simulate_production_plans
+
+
+class Command(BaseCommand):
+    help = "What-if simulation of production plan scenarios, in parallel worker processes; prints the comparison as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('request', help="JSON file with the same body as the simulate endpoint ('-' reads stdin).")
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'SIMULATION_MAX_WORKERS', MAX_WORKERS),
+            help="Worker processes; capped by the SIMULATION_MAX_WORKERS setting.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['request'] == '-':
+                data = json.load(sys.stdin)
+            else:
+                with open(options['request']) as file:
+                    data = json.load(file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read the request: {exc}")
+
+        serializer = SimulationRequestSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+        try:
+            baseline, scenarios = simulate_production_plans(
+                serializer.validated_data['scenarios'],
+                production_plan_ids=serializer.validated_data.get('production_plan_ids'),
+                run_date=serializer.validated_data.get('run_date'),
+                start=serializer.validated_data.get('start'),
+                max_workers=options['workers'],
+            )
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.messages))
+        self.stdout.write(json.dumps({'baseline': baseline, 'scenarios': scenarios}, cls=JSONEncoder, indent=2))
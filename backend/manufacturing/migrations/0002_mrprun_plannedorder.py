@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MRPRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mrprun_status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed')], default='RUNNING', max_length=20)),
+                ('planned_order_count', models.PositiveIntegerField(default=0)),
+                ('remarks', models.TextField(blank=True, null=True)),
+                ('production_plans', models.ManyToManyField(blank=True, related_name='mrp_runs', to='manufacturing.productionplan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlannedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_type', models.CharField(choices=[('PURCHASE', 'Purchase Order'), ('WORK_ORDER', 'Work Order')], max_length=20)),
+                ('low_level_code', models.PositiveIntegerField(default=0)),
+                ('gross_requirement', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('available_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=14)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=14)),
+                ('required_date', models.DateField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_orders', to='manufacturing.item')),
+                ('mrp_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_orders', to='manufacturing.mrprun')),
+            ],
+            options={
+                'ordering': ['low_level_code', 'item_id'],
+                'indexes': [models.Index(fields=['mrp_run', 'order_type'], name='mfg_planned_run_type_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0002_mrprun_plannedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='bom_cost',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='purchase_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=14),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0003_item_costs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routingoperation',
+            name='setup_time',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='routingoperation',
+            name='time_per_unit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
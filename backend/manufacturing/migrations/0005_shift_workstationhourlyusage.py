@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0004_routing_operation_times'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorkstationHourlyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('busy_seconds', models.PositiveIntegerField(default=0)),
+                ('downtime_seconds', models.PositiveIntegerField(default=0)),
+                ('ideal_seconds', models.PositiveIntegerField(default=0)),
+                ('workstation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_usage', to='manufacturing.workstation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'workstation'], name='mfg_usage_hour_idx')],
+                'unique_together': {('workstation', 'hour')},
+            },
+        ),
+    ]
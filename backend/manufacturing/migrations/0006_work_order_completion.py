@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0005_shift_workstationhourlyusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockentry',
+            name='work_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_entries', to='manufacturing.workorder'),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='produced_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_inventory_items(apps, schema_editor):
+    Item = apps.get_model('manufacturing', 'Item')
+    InventoryItem = apps.get_model('inventory', 'Item')
+
+    inventory_ids = dict(InventoryItem.objects.values_list('sku', 'id'))
+    linked = []
+    for item in Item.objects.filter(inventory_item__isnull=True).only('id', 'sku').iterator():
+        if item.sku in inventory_ids:
+            item.inventory_item_id = inventory_ids[item.sku]
+            linked.append(item)
+    Item.objects.bulk_update(linked, ['inventory_item'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_itemgroup_depth_itemgroup_path'),
+        ('manufacturing', '0006_work_order_completion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='manufacturing_items', to='inventory.item'),
+        ),
+        migrations.RunPython(link_inventory_items, migrations.RunPython.noop),
+    ]
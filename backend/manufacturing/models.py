@@ -4,11 +4,21 @@ class Item(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
     sku = models.CharField(max_length=100, unique=True)
+    # Canonical item in the inventory registry; linked by SKU when left empty
+    inventory_item = models.ForeignKey('inventory.Item', on_delete=models.SET_NULL, null=True, blank=True, related_name='manufacturing_items')
     is_raw_material = models.BooleanField(default=False)  # True if raw material, False if finished good
+    purchase_cost = models.DecimalField(max_digits=14, decimal_places=4, default=0)  # Unit cost when bought in
+    bom_cost = models.DecimalField(max_digits=14, decimal_places=4, default=0, editable=False)  # Rolled-up material cost from the active BOM
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.inventory_item_id is None:
+            from inventory.models import Item as InventoryItem
+            self.inventory_item_id = InventoryItem.objects.filter(sku=self.sku).values_list('pk', flat=True).first()
+        super().save(*args, **kwargs)
+
 class BillOfMaterials(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='boms')
     description = models.TextField(blank=True, null=True)
@@ -61,6 +71,8 @@ class RoutingOperation(models.Model):
     routing = models.ForeignKey(Routing, on_delete=models.CASCADE)
     operation = models.ForeignKey(Operation, on_delete=models.CASCADE)
     sequence = models.PositiveIntegerField()
+    setup_time = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Minutes per job
+    time_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Minutes per unit produced
 
     class Meta:
         unique_together = ('routing', 'operation')
@@ -89,6 +101,7 @@ class WorkOrder(models.Model):
     production_plan = models.ForeignKey(ProductionPlan, on_delete=models.CASCADE, related_name='work_orders')
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    produced_quantity = models.PositiveIntegerField(default=0)
     scheduled_start_date = models.DateField()
     scheduled_end_date = models.DateField()
     status_choices = [
@@ -138,6 +151,70 @@ class StockEntry(models.Model):
     entry_type = models.CharField(max_length=3, choices=entry_type_choices)
     date = models.DateField(auto_now_add=True)
     reference = models.CharField(max_length=255, blank=True, null=True)  # Could link to WorkOrder or JobCard etc.
+    work_order = models.ForeignKey(WorkOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_entries')
 
     def __str__(self):
         return f"{self.entry_type} - {self.quantity} of {self.item.name} on {self.date}"
+
+class MRPRun(models.Model):
+    run_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    production_plans = models.ManyToManyField(ProductionPlan, related_name='mrp_runs', blank=True)
+    status_choices = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+    ]
+    mrprun_status = models.CharField(max_length=20, choices=status_choices, default='RUNNING')
+    planned_order_count = models.PositiveIntegerField(default=0)
+    remarks = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"MRP Run #{self.pk} on {self.run_date}"
+
+class PlannedOrder(models.Model):
+    mrp_run = models.ForeignKey(MRPRun, on_delete=models.CASCADE, related_name='planned_orders')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='planned_orders')
+    order_type_choices = [
+        ('PURCHASE', 'Purchase Order'),
+        ('WORK_ORDER', 'Work Order'),
+    ]
+    order_type = models.CharField(max_length=20, choices=order_type_choices)
+    low_level_code = models.PositiveIntegerField(default=0)
+    gross_requirement = models.DecimalField(max_digits=14, decimal_places=3)
+    available_quantity = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    quantity = models.DecimalField(max_digits=14, decimal_places=3)  # Net requirement to buy or make
+    required_date = models.DateField()
+
+    class Meta:
+        ordering = ['low_level_code', 'item_id']
+        indexes = [models.Index(fields=['mrp_run', 'order_type'], name='mfg_planned_run_type_idx')]
+
+    def __str__(self):
+        return f"{self.get_order_type_display()} for {self.quantity} x {self.item.name}"
+
+class Shift(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()  # May be earlier than start_time for shifts that cross midnight
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time}-{self.end_time})"
+
+    def covers(self, moment):
+        if self.start_time <= self.end_time:
+            return self.start_time <= moment < self.end_time
+        return moment >= self.start_time or moment < self.end_time
+
+class WorkstationHourlyUsage(models.Model):
+    workstation = models.ForeignKey(Workstation, on_delete=models.CASCADE, related_name='hourly_usage')
+    hour = models.DateTimeField()  # Start of the hour bucket
+    busy_seconds = models.PositiveIntegerField(default=0)  # Completed job card time
+    downtime_seconds = models.PositiveIntegerField(default=0)
+    ideal_seconds = models.PositiveIntegerField(default=0)  # Routing standard time of the work done in the hour
+
+    class Meta:
+        unique_together = ('workstation', 'hour')
+        indexes = [models.Index(fields=['hour', 'workstation'], name='mfg_usage_hour_idx')]
+
+    def __str__(self):
+        return f"{self.workstation.name} @ {self.hour}"
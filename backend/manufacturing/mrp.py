@@ -0,0 +1,139 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .bom import get_bom_resolver
+from .models import Item, ProductionPlan, WorkOrder, MRPRun, PlannedOrder
+
+OPEN_PLAN_STATUSES = ('PLANNED', 'IN_PROGRESS')
+OPEN_WORK_ORDER_STATUSES = ('SCHEDULED', 'STARTED')
+
+
+def low_level_codes(graph, item_ids=()):
+    """
+    Return {item_id: low level code}, the deepest level at which each item
+    appears in any BOM (0 for top level items). Items are ordered
+    topologically, so a BOM cycle raises ValidationError.
+    """
+    nodes = set(graph).union(item_ids)
+    indegree = defaultdict(int)
+    for components in graph.values():
+        for component_id, _ in components:
+            nodes.add(component_id)
+            indegree[component_id] += 1
+
+    order = [node for node in nodes if indegree[node] == 0]
+    codes = dict.fromkeys(order, 0)
+    for parent in order:  # `order` grows while it is walked (Kahn's algorithm)
+        for component_id, _ in graph.get(parent, ()):
+            codes[component_id] = max(codes.get(component_id, 0), codes[parent] + 1)
+            indegree[component_id] -= 1
+            if indegree[component_id] == 0:
+                order.append(component_id)
+
+    if len(order) < len(nodes):
+        cyclic = sorted(node for node in nodes if indegree[node] > 0)
+        raise ValidationError(f"BOM cycle detected between items {cyclic[:20]}.")
+    return codes
+
+
+def explode(demands, graph, stock, codes=None):
+    """
+    Explode independent demand through the BOM graph level by level and net
+    it against available stock.
+
+    `demands` maps item_id -> (quantity, required_date) and `stock` maps
+    item_id -> available quantity. Items are processed in low level code
+    order, so all gross requirement for an item is known before it is netted
+    and its own components are exploded. Returns planned order dicts:
+    WORK_ORDER for items that have a BOM, PURCHASE for the rest.
+    """
+    codes = codes if codes is not None else low_level_codes(graph, demands)
+    gross = defaultdict(Decimal)
+    need_dates = {}
+    for item_id, (quantity, required_date) in demands.items():
+        gross[item_id] += Decimal(quantity)
+        need_dates[item_id] = required_date
+
+    planned = []
+    for item_id in sorted(codes, key=lambda node: (codes[node], node)):
+        requirement = gross.get(item_id)
+        if not requirement:
+            continue
+        available = max(Decimal(stock.get(item_id) or 0), Decimal(0))
+        net = requirement - available
+        if net <= 0:
+            continue
+        components = graph.get(item_id)
+        required_date = need_dates[item_id]
+        planned.append({
+            'item_id': item_id,
+            'order_type': 'WORK_ORDER' if components is not None else 'PURCHASE',
+            'low_level_code': codes[item_id],
+            'gross_requirement': requirement,
+            'available_quantity': available,
+            'quantity': net,
+            'required_date': required_date,
+        })
+        for component_id, per_unit in components or ():
+            gross[component_id] += net * per_unit
+            if component_id not in need_dates or required_date < need_dates[component_id]:
+                need_dates[component_id] = required_date
+    return planned
+
+
+def available_stock():
+    """
+    Available quantity per manufacturing item: stock of the linked inventory
+    item plus the part of open work orders still to be produced. Quantities
+    already produced are in stock, so they are not counted again as supply.
+    """
+    stock = defaultdict(Decimal)
+    totals = Item.objects.filter(inventory_item__stock_summary__isnull=False).values_list(
+        'id', 'inventory_item__stock_summary__total_quantity'
+    )
+    for item_id, total in totals:
+        stock[item_id] += total
+    open_orders = (
+        WorkOrder.objects.filter(workorder_status__in=OPEN_WORK_ORDER_STATUSES)
+        .values('item_id').annotate(total=Sum(F('quantity') - F('produced_quantity'))).values_list('item_id', 'total')
+    )
+    for item_id, total in open_orders:
+        stock[item_id] += total
+    return stock
+
+
+@transaction.atomic
+def run_mrp(production_plan_ids=None, run_date=None):
+    """
+    Plan purchase and work orders for open production plans (or the given
+    ones). The BOM graph comes from the shared BOM resolver and stock is
+    loaded once up front, so the explosion itself runs entirely in memory.
+    """
+    run_date = run_date or timezone.localdate()
+    plans = ProductionPlan.objects.filter(productionplan_status__in=OPEN_PLAN_STATUSES)
+    if production_plan_ids:
+        plans = plans.filter(pk__in=production_plan_ids)
+    plans = list(plans.values_list('id', 'item_id', 'quantity', 'planned_start_date'))
+    if not plans:
+        raise ValidationError("No open production plans to run MRP for.")
+
+    demands = {}
+    for _, item_id, quantity, start_date in plans:
+        total, required_date = demands.get(item_id, (0, start_date))
+        demands[item_id] = (total + quantity, min(required_date, start_date))
+
+    graph = get_bom_resolver().as_of(run_date)
+    planned = explode(demands, graph, available_stock())
+
+    run = MRPRun.objects.create(run_date=run_date)
+    run.production_plans.set([plan_id for plan_id, *_ in plans])
+    PlannedOrder.objects.bulk_create([PlannedOrder(mrp_run=run, **order) for order in planned], batch_size=1000)
+    run.planned_order_count = len(planned)
+    run.mrprun_status = 'COMPLETED'
+    run.save(update_fields=['planned_order_count', 'mrprun_status'])
+    return run
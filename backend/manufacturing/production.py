@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from backend.utils.versioning import version_snapshot
+from inventory.item_index import item_index
+from inventory.models import StockLedgerEntry
+from inventory.services import apply_balance_deltas
+from .bom import get_bom_resolver
+from .models import Item, WorkOrder, StockEntry
+
+CLOSED_WORK_ORDER_STATUSES = ('COMPLETED', 'CANCELLED')
+
+
+def backflush_lines(work_order, quantity, resolver, on_date):
+    """
+    Stock movements for producing `quantity` of a work order: (item_id,
+    entry_type, quantity). The item must have a BOM active on `on_date`.
+    """
+    lines = [(work_order.item_id, 'IN', Decimal(quantity))]
+    for component_id, per_unit in resolver.components(work_order.item_id, on_date):
+        lines.append((component_id, 'OUT', per_unit * quantity))
+    return lines
+
+
+def _inventory_item_ids(item_ids):
+    """Map manufacturing item ids to their linked inventory item ids."""
+    links = item_index.to_inventory(Item)
+    unlinked = [item_id for item_id in item_ids if item_id not in links]
+    if unlinked:
+        skus = sorted(Item.objects.filter(pk__in=unlinked).values_list('sku', flat=True))
+        raise ValidationError(f"No inventory item linked for SKU(s): {', '.join(skus[:20])}.")
+    return {item_id: links[item_id] for item_id in item_ids}
+
+
+@transaction.atomic
+def complete_work_orders(completions, source_warehouse_id=None, target_warehouse_id=None):
+    """
+    Record production of `completions` ({work_order_id: quantity}) in one
+    transaction.
+
+    Each completion produces the finished item (IN) and backflushes its
+    components (OUT) from the BOM active today, times the quantity produced;
+    work orders whose item has no active BOM are rejected.
+    Partial completions move the work order to STARTED until the full
+    quantity has been produced. With both warehouses given the same movements
+    are also posted to inventory: components out of `source_warehouse_id`,
+    finished goods into `target_warehouse_id`. All work orders are validated
+    before anything is written, and every problem is reported together.
+    Returns the updated work orders.
+    """
+    if not completions:
+        raise ValidationError("No work orders to complete.")
+    if (source_warehouse_id is None) != (target_warehouse_id is None):
+        raise ValidationError("Give both a source and a target warehouse to post to inventory, or neither.")
+
+    with version_snapshot():
+        return _complete_work_orders(completions, source_warehouse_id, target_warehouse_id)
+
+
+def _complete_work_orders(completions, source_warehouse_id, target_warehouse_id):
+    work_orders = WorkOrder.objects.select_for_update().in_bulk(list(completions))
+    resolver = get_bom_resolver()
+    today = timezone.localdate()
+    errors = []
+    for work_order_id, quantity in completions.items():
+        work_order = work_orders.get(work_order_id)
+        if work_order is None:
+            errors.append(f"Work order {work_order_id} does not exist.")
+        elif resolver.active_bom_id(work_order.item_id, today) is None:
+            errors.append(f"Work order {work_order_id}: its item has no active BOM to backflush components from.")
+        elif work_order.workorder_status in CLOSED_WORK_ORDER_STATUSES:
+            errors.append(f"Work order {work_order_id} is {work_order.get_workorder_status_display().lower()}.")
+        elif quantity <= 0:
+            errors.append(f"Work order {work_order_id}: quantity must be positive.")
+        elif work_order.produced_quantity + quantity > work_order.quantity:
+            errors.append(
+                f"Work order {work_order_id}: only {work_order.quantity - work_order.produced_quantity} left to produce."
+            )
+    if errors:
+        raise ValidationError(errors)
+
+    entries = []
+    for work_order_id, quantity in completions.items():
+        work_order = work_orders[work_order_id]
+        for item_id, entry_type, line_quantity in backflush_lines(work_order, quantity, resolver, today):
+            entries.append(StockEntry(
+                item_id=item_id, quantity=line_quantity, entry_type=entry_type,
+                reference=f"Work Order #{work_order_id}", work_order=work_order,
+            ))
+        work_order.produced_quantity += quantity
+        work_order.workorder_status = 'COMPLETED' if work_order.produced_quantity >= work_order.quantity else 'STARTED'
+
+    if source_warehouse_id is not None:
+        _post_to_inventory(entries, source_warehouse_id, target_warehouse_id)
+    StockEntry.objects.bulk_create(entries, batch_size=1000)
+    updated = [work_orders[work_order_id] for work_order_id in completions]
+    WorkOrder.objects.bulk_update(updated, ['produced_quantity', 'workorder_status'], batch_size=1000)
+    return updated
+
+
+def _post_to_inventory(entries, source_warehouse_id, target_warehouse_id):
+    inventory_ids = _inventory_item_ids({entry.item_id for entry in entries})
+    now = timezone.now()
+    ledger_rows = []
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        warehouse_id = target_warehouse_id if entry.entry_type == 'IN' else source_warehouse_id
+        item_id = inventory_ids[entry.item_id]
+        # Ledger quantities are signed, as in inventory.services: OUT rows are negative
+        quantity = entry.quantity if entry.entry_type == 'IN' else -entry.quantity
+        ledger_rows.append(StockLedgerEntry(
+            item_id=item_id, warehouse_id=warehouse_id, transaction_type=entry.entry_type,
+            quantity=quantity, transaction_date=now, reference_doc=entry.reference,
+        ))
+        deltas[(item_id, warehouse_id)] += quantity
+    StockLedgerEntry.objects.bulk_create(ledger_rows, batch_size=1000)
+    apply_balance_deltas(deltas)
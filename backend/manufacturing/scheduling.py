@@ -0,0 +1,219 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Routing, RoutingOperation, Workstation, WorkOrder, JobCard, DowntimeEntry
+
+OPEN_DOWNTIME = timedelta(days=3650)  # Downtime without an end blocks the workstation for the foreseeable future
+MIN_OPERATION_TIME = timedelta(minutes=1)
+
+
+class CapacityCalendar:
+    """
+    Busy intervals of one workstation, kept as sorted, merged, non-overlapping
+    [start, end) blocks in two parallel lists. Finding the earliest free slot
+    is a bisect plus a walk over the gaps; back-to-back bookings merge into
+    one block, so a densely loaded calendar stays short.
+    """
+
+    def __init__(self, blocked=()):
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(blocked):
+            self.reserve(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def earliest_slot(self, ready, duration):
+        """Earliest start at or after `ready` with `duration` of uninterrupted free time."""
+        index = bisect_right(self._starts, ready) - 1
+        candidate = ready
+        if index >= 0 and self._ends[index] > candidate:
+            candidate = self._ends[index]
+        index += 1
+        while index < len(self._starts) and self._starts[index] < candidate + duration:
+            candidate = max(candidate, self._ends[index])
+            index += 1
+        return candidate
+
+    def reserve(self, start, end):
+        """Mark [start, end) as busy, merging it with any overlapping or touching blocks."""
+        if end <= start:
+            return
+        left = bisect_right(self._ends, start - timedelta.resolution)  # first block ending at or after start
+        right = bisect_right(self._starts, end)  # blocks starting after end stay untouched
+        if left < right:
+            start = min(start, self._starts[left])
+            end = max(end, self._ends[right - 1])
+        self._starts[left:right] = [start]
+        self._ends[left:right] = [end]
+
+
+def operation_duration(setup_time, time_per_unit, quantity):
+    minutes = float(setup_time) + float(time_per_unit) * float(quantity)
+    return max(timedelta(minutes=minutes), MIN_OPERATION_TIME)
+
+
+def plan_schedule(orders, routings, workstations, calendars):
+    """
+    Finite-capacity forward scheduling, free of database access.
+
+    `orders` is a priority ordered list of (work_order_id, item_id, quantity,
+    release_time); `routings` maps item_id -> [(operation_id,
+    workstation_type_id, setup_time, time_per_unit), ...] in sequence order;
+    `workstations` maps workstation_type_id -> [workstation_id, ...] and
+    `calendars` maps workstation_id -> CapacityCalendar (updated in place).
+
+    Each operation starts after the previous one of the same work order ends
+    and goes to the workstation of the right type that can finish it first.
+    Returns (job cards as (work_order_id, operation_id, workstation_id,
+    start, end) tuples, {work_order_id: reason} for orders left unscheduled).
+    """
+    cards = []
+    unscheduled = {}
+    for work_order_id, item_id, quantity, release_time in orders:
+        operations = routings.get(item_id)
+        if not operations:
+            unscheduled[work_order_id] = "No routing with operations for this item."
+            continue
+        missing = [operation_id for operation_id, type_id, _, _ in operations if not workstations.get(type_id)]
+        if missing:
+            unscheduled[work_order_id] = f"No workstation available for operation(s) {missing}."
+            continue
+
+        ready = release_time
+        for operation_id, type_id, setup_time, time_per_unit in operations:
+            duration = operation_duration(setup_time, time_per_unit, quantity)
+            start, workstation_id = min(
+                (calendars[workstation_id].earliest_slot(ready, duration), workstation_id)
+                for workstation_id in workstations[type_id]
+            )
+            ready = start + duration
+            calendars[workstation_id].reserve(start, ready)
+            cards.append((work_order_id, operation_id, workstation_id, start, ready))
+    return cards, unscheduled
+
+
+def load_routings(item_ids):
+    """Routing operations per item (latest routing per item wins) with two queries."""
+    routing_ids = {}
+    for routing_id, item_id in Routing.objects.filter(item_id__in=item_ids).values_list('id', 'item_id').order_by('id'):
+        routing_ids[item_id] = routing_id
+    operations = defaultdict(list)
+    rows = RoutingOperation.objects.filter(routing_id__in=routing_ids.values()).values_list(
+        'routing_id', 'operation_id', 'operation__workstation_type_id', 'setup_time', 'time_per_unit'
+    ).order_by('routing_id', 'sequence')
+    for routing_id, operation_id, type_id, setup_time, time_per_unit in rows:
+        operations[routing_id].append((operation_id, type_id, setup_time, time_per_unit))
+    return {item_id: operations.get(routing_id, []) for item_id, routing_id in routing_ids.items()}
+
+
+def load_blocked_intervals(start):
+    """
+    {workstation_id: [(start, end), ...]} of downtime and job cards booked
+    after `start`. Job cards still running have no end time yet; like open
+    downtime they block from their start, until the routing time for their
+    work order quantity has passed, or at least until just after `start` when
+    they are overrunning. Cards with no matching routing operation block for
+    the foreseeable future.
+    """
+    blocked = defaultdict(list)
+    downtime = DowntimeEntry.objects.filter(
+        Q(end_time__isnull=True) | Q(end_time__gt=start)
+    ).values_list('workstation_id', 'start_time', 'end_time')
+    for workstation_id, down_from, down_to in downtime:
+        blocked[workstation_id].append((down_from, down_to or down_from + OPEN_DOWNTIME))
+    booked = JobCard.objects.filter(end_time__gt=start).values_list('workstation_id', 'start_time', 'end_time')
+    for workstation_id, booked_from, booked_to in booked:
+        blocked[workstation_id].append((booked_from, booked_to))
+
+    running = list(JobCard.objects.filter(end_time__isnull=True).exclude(jobcard_status='COMPLETED').values_list(
+        'workstation_id', 'start_time', 'operation_id', 'work_order__item_id', 'work_order__quantity'
+    ))
+    routings = load_routings({row[3] for row in running})
+    for workstation_id, booked_from, operation_id, item_id, quantity in running:
+        times = {operation: (setup_time, time_per_unit) for operation, _, setup_time, time_per_unit in routings.get(item_id, ())}
+        if operation_id in times:
+            estimated = booked_from + operation_duration(*times[operation_id], quantity)
+            booked_to = max(estimated, start + MIN_OPERATION_TIME)
+        else:
+            booked_to = booked_from + OPEN_DOWNTIME
+        blocked[workstation_id].append((booked_from, booked_to))
+    return blocked
+
+
+def load_workstations():
+    """{workstation_type_id: [workstation_id, ...]}."""
+    workstations = defaultdict(list)
+    for workstation_id, type_id in Workstation.objects.values_list('id', 'workstation_type_id').order_by('id'):
+        workstations[type_id].append(workstation_id)
+    return workstations
+
+
+def load_calendars(start):
+    """
+    Capacity calendars for every workstation, blocked by downtime and by the
+    job cards already booked after `start`.
+    """
+    blocked = load_blocked_intervals(start)
+    workstations = load_workstations()
+    calendars = {
+        workstation_id: CapacityCalendar(blocked.get(workstation_id, ()))
+        for workstation_ids in workstations.values() for workstation_id in workstation_ids
+    }
+    return workstations, calendars
+
+
+@transaction.atomic
+def schedule_work_orders(work_order_ids=None, start=None):
+    """
+    (Re)schedule SCHEDULED work orders onto workstations.
+
+    Without `work_order_ids` every scheduled work order is replanned;
+    otherwise only the given ones are, around the job cards already booked
+    for everything else, so one changed order can be rescheduled cheaply.
+    Pending job cards of the replanned orders are replaced and the orders'
+    scheduled dates follow their first and last operation.
+    Returns (job cards created, {work_order_id: reason} for skipped orders).
+    """
+    start = start or timezone.now()
+    work_orders = WorkOrder.objects.select_for_update().filter(workorder_status='SCHEDULED')
+    if work_order_ids is not None:
+        work_orders = work_orders.filter(pk__in=work_order_ids)
+    rows = list(work_orders.values_list(
+        'id', 'item_id', 'quantity', 'production_plan__planned_start_date', 'production_plan__planned_end_date'
+    ))
+    target_ids = [row[0] for row in rows]
+
+    # Earliest due date first; nothing starts before its plan or before `start`
+    orders = []
+    for work_order_id, item_id, quantity, plan_start, plan_end in sorted(rows, key=lambda row: (row[4], row[3], row[0])):
+        release = max(start, timezone.make_aware(datetime.combine(plan_start, time.min)))
+        orders.append((work_order_id, item_id, quantity, release))
+
+    JobCard.objects.filter(work_order_id__in=target_ids, jobcard_status='PENDING').delete()
+    workstations, calendars = load_calendars(start)
+    cards, unscheduled = plan_schedule(orders, load_routings({row[1] for row in rows}), workstations, calendars)
+
+    job_cards = [
+        JobCard(work_order_id=work_order_id, operation_id=operation_id, workstation_id=workstation_id,
+                start_time=card_start, end_time=card_end)
+        for work_order_id, operation_id, workstation_id, card_start, card_end in cards
+    ]
+    JobCard.objects.bulk_create(job_cards, batch_size=1000)
+
+    spans = {}
+    for work_order_id, _, _, card_start, card_end in cards:
+        first, last = spans.get(work_order_id, (card_start, card_end))
+        spans[work_order_id] = (min(first, card_start), max(last, card_end))
+    updated = [
+        WorkOrder(pk=work_order_id, scheduled_start_date=timezone.localdate(first), scheduled_end_date=timezone.localdate(last))
+        for work_order_id, (first, last) in spans.items()
+    ]
+    WorkOrder.objects.bulk_update(updated, ['scheduled_start_date', 'scheduled_end_date'], batch_size=1000)
+    return len(job_cards), unscheduled
@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from inventory.models import Warehouse
+from .simulation import MAX_SCENARIOS
 from .models import (
     Item, BillOfMaterials, BOMComponent, WorkstationType, Workstation,
     Operation, Routing, RoutingOperation, ProductionPlan,
-    WorkOrder, JobCard, DowntimeEntry, StockEntry
+    WorkOrder, JobCard, DowntimeEntry, StockEntry, MRPRun, PlannedOrder, Shift
 )
 
 class ItemSerializer(serializers.ModelSerializer):
@@ -64,7 +66,7 @@ class RoutingOperationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = RoutingOperation
-        fields = ['id', 'operation', 'operation_id', 'sequence']
+        fields = ['id', 'operation', 'operation_id', 'sequence', 'setup_time', 'time_per_unit']
 
 class RoutingSerializer(serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
@@ -99,7 +101,8 @@ class WorkOrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WorkOrder
-        fields = ['id', 'production_plan', 'production_plan_id', 'item', 'item_id', 'quantity', 'scheduled_start_date', 'scheduled_end_date', 'workorder_status']
+        fields = ['id', 'production_plan', 'production_plan_id', 'item', 'item_id', 'quantity', 'produced_quantity', 'scheduled_start_date', 'scheduled_end_date', 'workorder_status']
+        read_only_fields = ['produced_quantity']
 
 class JobCardSerializer(serializers.ModelSerializer):
     work_order = WorkOrderSerializer(read_only=True)
@@ -137,4 +140,175 @@ class StockEntrySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StockEntry
-        fields = ['id', 'item', 'item_id', 'quantity', 'entry_type', 'date', 'reference']
+        fields = ['id', 'item', 'item_id', 'quantity', 'entry_type', 'date', 'reference', 'work_order']
+        read_only_fields = ['work_order']
+
+class PlannedOrderSerializer(serializers.ModelSerializer):
+    item = ItemSerializer(read_only=True)
+
+    class Meta:
+        model = PlannedOrder
+        fields = ['id', 'mrp_run', 'item', 'order_type', 'low_level_code', 'gross_requirement', 'available_quantity', 'quantity', 'required_date']
+
+class MRPRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MRPRun
+        fields = ['id', 'run_date', 'created_at', 'production_plans', 'mrprun_status', 'planned_order_count', 'remarks']
+
+class MRPRunRequestSerializer(serializers.Serializer):
+    production_plan_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="Plans to include; defaults to every planned or in-progress plan"
+    )
+    run_date = serializers.DateField(required=False, help_text="Date used to pick effective BOMs; defaults to today")
+
+class BOMLineSerializer(serializers.Serializer):
+    component_id = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=18, decimal_places=6)
+
+class BOMResolutionSerializer(serializers.Serializer):
+    item_id = serializers.IntegerField()
+    bom_id = serializers.IntegerField(allow_null=True)
+    on_date = serializers.DateField()
+    quantity = serializers.DecimalField(max_digits=18, decimal_places=6)
+    flattened = serializers.BooleanField()
+    components = BOMLineSerializer(many=True)
+
+class WhereUsedSerializer(serializers.Serializer):
+    level = serializers.IntegerField()
+    item_id = serializers.IntegerField()
+    sku = serializers.CharField()
+    name = serializers.CharField()
+    via_item_id = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=3)
+
+class CostBreakdownLineSerializer(serializers.Serializer):
+    level = serializers.IntegerField()
+    parent_id = serializers.IntegerField()
+    item_id = serializers.IntegerField()
+    sku = serializers.CharField()
+    name = serializers.CharField()
+    quantity = serializers.DecimalField(max_digits=18, decimal_places=6)
+    unit_cost = serializers.DecimalField(max_digits=14, decimal_places=4)
+    extended_cost = serializers.DecimalField(max_digits=18, decimal_places=4)
+    cost_source = serializers.CharField()
+
+class CostBreakdownSerializer(serializers.Serializer):
+    item_id = serializers.IntegerField()
+    bom_cost = serializers.DecimalField(max_digits=14, decimal_places=4)
+    total_cost = serializers.DecimalField(max_digits=18, decimal_places=4)
+    lines = CostBreakdownLineSerializer(many=True)
+
+class ScheduleRequestSerializer(serializers.Serializer):
+    work_order_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="Work orders to reschedule around existing bookings; defaults to every scheduled work order"
+    )
+    start = serializers.DateTimeField(required=False, help_text="Nothing is scheduled before this time; defaults to now")
+
+class UnscheduledWorkOrderSerializer(serializers.Serializer):
+    work_order_id = serializers.IntegerField()
+    reason = serializers.CharField()
+
+class ScheduleResultSerializer(serializers.Serializer):
+    job_cards_created = serializers.IntegerField()
+    unscheduled = UnscheduledWorkOrderSerializer(many=True)
+
+class ShiftSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = '__all__'
+
+class UsageMetricsSerializer(serializers.Serializer):
+    planned_hours = serializers.FloatField()
+    busy_hours = serializers.FloatField()
+    downtime_hours = serializers.FloatField()
+    availability = serializers.FloatField(allow_null=True)
+    utilisation = serializers.FloatField(allow_null=True)
+    performance = serializers.FloatField(allow_null=True)
+    oee = serializers.FloatField(allow_null=True)
+
+class WorkstationOEESerializer(UsageMetricsSerializer):
+    workstation_id = serializers.IntegerField()
+    workstation = serializers.CharField()
+
+class ShiftOEESerializer(UsageMetricsSerializer):
+    shift_id = serializers.IntegerField()
+    shift = serializers.CharField()
+
+class CompletionPostingSerializer(serializers.Serializer):
+    source_warehouse_id = serializers.PrimaryKeyRelatedField(
+        queryset=Warehouse.objects.all(), required=False, allow_null=True,
+        help_text="Inventory warehouse the components are consumed from"
+    )
+    target_warehouse_id = serializers.PrimaryKeyRelatedField(
+        queryset=Warehouse.objects.all(), required=False, allow_null=True,
+        help_text="Inventory warehouse the finished goods are received into"
+    )
+
+    def validate(self, attrs):
+        if (attrs.get('source_warehouse_id') is None) != (attrs.get('target_warehouse_id') is None):
+            raise serializers.ValidationError("Give both a source and a target warehouse to post to inventory, or neither.")
+        return attrs
+
+class WorkOrderCompleteSerializer(CompletionPostingSerializer):
+    quantity = serializers.IntegerField(min_value=1)
+
+class WorkOrderCompletionSerializer(serializers.Serializer):
+    work_order_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class WorkOrderBatchCompleteSerializer(CompletionPostingSerializer):
+    completions = WorkOrderCompletionSerializer(many=True, allow_empty=False)
+
+    def validate_completions(self, value):
+        work_order_ids = [completion['work_order_id'] for completion in value]
+        if len(set(work_order_ids)) != len(work_order_ids):
+            raise serializers.ValidationError("Each work order may appear only once.")
+        return value
+
+class ScenarioPlanChangeSerializer(serializers.Serializer):
+    production_plan_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    planned_start_date = serializers.DateField(required=False)
+    planned_end_date = serializers.DateField(required=False)
+    exclude = serializers.BooleanField(default=False, help_text="Leave this plan out of the scenario")
+
+class ScenarioNewPlanSerializer(serializers.Serializer):
+    item_id = serializers.PrimaryKeyRelatedField(queryset=Item.objects.all())
+    quantity = serializers.IntegerField(min_value=1)
+    planned_start_date = serializers.DateField()
+    planned_end_date = serializers.DateField()
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        value['item_id'] = value['item_id'].pk
+        return value
+
+class ScenarioSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100, required=False)
+    plan_changes = ScenarioPlanChangeSerializer(many=True, required=False)
+    additional_plans = ScenarioNewPlanSerializer(many=True, required=False)
+
+class SimulationRequestSerializer(serializers.Serializer):
+    scenarios = ScenarioSerializer(many=True, allow_empty=False)
+    production_plan_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="Plans in the baseline; defaults to every planned or in-progress plan"
+    )
+    run_date = serializers.DateField(required=False, help_text="Date used to pick effective BOMs; defaults to today")
+    start = serializers.DateTimeField(required=False, help_text="Scheduling starts here; defaults to now")
+
+    def validate_scenarios(self, value):
+        if len(value) > MAX_SCENARIOS:
+            raise serializers.ValidationError(f"At most {MAX_SCENARIOS} scenarios per simulation.")
+        return value
+
+class ScenarioResultSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    summary = serializers.JSONField()
+    diff = serializers.JSONField()
+
+class SimulationResultSerializer(serializers.Serializer):
+    baseline = serializers.JSONField()
+    scenarios = ScenarioResultSerializer(many=True)
@@ -0,0 +1,153 @@
+import threading
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .analytics import refresh_workstation_usage
+from .bom import invalidate_bom_cache
+from .costing import roll_up_bom_costs
+from inventory.models import Item as InventoryItem
+from .models import Item, BillOfMaterials, BOMComponent, JobCard, DowntimeEntry
+
+
+@receiver([post_save, post_delete], sender=BillOfMaterials)
+@receiver([post_save, post_delete], sender=BOMComponent)
+def invalidate_bom_resolver(sender, **kwargs):
+    # Invalidate now for lookups inside this transaction and again on commit,
+    # so no other process keeps an index loaded before the write was visible
+    invalidate_bom_cache()
+    transaction.on_commit(invalidate_bom_cache)
+
+
+_pending = threading.local()
+
+
+def _schedule_roll_up(item_ids=(), bom_ids=()):
+    """
+    Roll up the costs of `item_ids` and of the owners of `bom_ids` once the
+    current transaction commits. Rows are collected per transaction, so
+    creating a BOM with many components loads the BOM graph once instead of
+    once per saved row.
+    """
+    # Every call registers a callback, so rows saved after a savepoint rolled
+    # back still get one; the first callback to run rolls up everything
+    # pending and the rest find nothing. Django drops the callbacks of a
+    # rolled back transaction but not this set, so a set without a queued
+    # callback is left over from one and is discarded.
+    pending = getattr(_pending, 'roll_up', None)
+    if pending is None or not _roll_up_queued():
+        pending = _pending.roll_up = {'items': set(), 'boms': set()}
+    pending['items'].update(item_ids)
+    pending['boms'].update(bom_ids)
+    transaction.on_commit(_flush_roll_up)
+
+
+def _roll_up_queued():
+    return any(callback is _flush_roll_up for _, callback, _ in transaction.get_connection().run_on_commit)
+
+
+def _flush_roll_up():
+    pending = getattr(_pending, 'roll_up', None)
+    _pending.roll_up = None
+    if not pending:
+        return
+    item_ids = pending['items'] | set(
+        BillOfMaterials.objects.filter(pk__in=pending['boms']).values_list('item_id', flat=True)
+    )
+    if not item_ids:
+        return
+    try:
+        roll_up_bom_costs(item_ids=item_ids)
+    except ValidationError:
+        pass  # BOM cycle; costs are left as they are until the cycle is fixed
+
+
+@receiver([post_save, post_delete], sender=BillOfMaterials)
+def roll_up_bom_owner_cost(sender, instance, **kwargs):
+    _schedule_roll_up(item_ids=[instance.item_id])
+
+
+@receiver([post_save, post_delete], sender=BOMComponent)
+def roll_up_component_parent_cost(sender, instance, **kwargs):
+    _schedule_roll_up(bom_ids=[instance.bom_id])
+
+
+@receiver(post_save, sender=Item)
+def roll_up_where_used_costs(sender, instance, created, update_fields=None, **kwargs):
+    # Only ancestors of the changed item are recalculated
+    if not created and (update_fields is None or 'purchase_cost' in update_fields):
+        _schedule_roll_up(item_ids=[instance.pk])
+
+
+def _usage_interval(instance):
+    """(workstation_id, start, end) counted in the usage buckets, or None for open or planned intervals."""
+    if instance.end_time is None or (isinstance(instance, JobCard) and instance.jobcard_status != 'COMPLETED'):
+        return None
+    return instance.workstation_id, instance.start_time, instance.end_time
+
+
+def _refresh_usage(*intervals):
+    for interval in intervals:
+        if interval is not None:
+            workstation_id, start, end = interval
+            refresh_workstation_usage(start, end, workstation_ids=[workstation_id])
+
+
+def _sibling_intervals(instance, *operations):
+    """
+    Intervals of the other completed job cards of the given (work_order_id,
+    operation_id) pairs: their share of the work order quantity, and so their
+    ideal time, changes with this card.
+    """
+    if not isinstance(instance, JobCard):
+        return []
+    intervals = []
+    for work_order_id, operation_id in set(operations) - {None}:
+        intervals += JobCard.objects.filter(
+            work_order_id=work_order_id, operation_id=operation_id, jobcard_status='COMPLETED', end_time__isnull=False,
+        ).exclude(pk=instance.pk).values_list('workstation_id', 'start_time', 'end_time')
+    return intervals
+
+
+def _card_operation(instance):
+    return (instance.work_order_id, instance.operation_id) if isinstance(instance, JobCard) else None
+
+
+@receiver(pre_save, sender=JobCard)
+@receiver(pre_save, sender=DowntimeEntry)
+def remember_usage_interval(sender, instance, **kwargs):
+    # The buckets the interval used to cover have to be rebuilt as well
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._previous_usage_interval = _usage_interval(previous) if previous else None
+    instance._previous_operation = _card_operation(previous) if previous else None
+
+
+@receiver(post_save, sender=JobCard)
+@receiver(post_save, sender=DowntimeEntry)
+def refresh_usage_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_usage_interval', None)
+    previous_operation = getattr(instance, '_previous_operation', None)
+    current = _usage_interval(instance)
+    changed = (previous, previous_operation) != (current, _card_operation(instance))
+    _refresh_usage(previous, current if changed else None)
+    if changed:
+        _refresh_usage(*_sibling_intervals(
+            instance, previous_operation if previous else None, _card_operation(instance) if current else None
+        ))
+
+
+@receiver(post_delete, sender=JobCard)
+@receiver(post_delete, sender=DowntimeEntry)
+def refresh_usage_on_delete(sender, instance, **kwargs):
+    _refresh_usage(_usage_interval(instance))
+    if _usage_interval(instance) is not None:
+        _refresh_usage(*_sibling_intervals(instance, _card_operation(instance)))
+
+
+@receiver(post_save, sender=InventoryItem)
+def link_new_inventory_item(sender, instance, created, **kwargs):
+    # Manufacturing items created before their inventory counterpart pick it up by SKU
+    if created:
+        Item.objects.filter(sku=instance.sku, inventory_item__isnull=True).update(inventory_item=instance)
@@ -0,0 +1,171 @@
+from collections import defaultdict
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from backend.utils.pool import process_pool
+from .bom import get_bom_resolver
+from .models import ProductionPlan
+from .mrp import OPEN_PLAN_STATUSES, available_stock, explode, low_level_codes
+from .scheduling import CapacityCalendar, load_blocked_intervals, load_routings, load_workstations, plan_schedule
+
+MAX_SCENARIOS = 20
+MAX_WORKERS = 2  # Default cap on worker processes per simulation, see SIMULATION_MAX_WORKERS
+
+
+def take_snapshot(production_plan_ids=None, run_date=None, start=None):
+    """
+    Everything a simulation needs as plain, picklable data: open production
+    plans, the BOM graph as of `run_date`, available stock, routings and the
+    busy intervals of every workstation from `start` on.
+    """
+    run_date = run_date or timezone.localdate()
+    start = start or timezone.now()
+    plans = ProductionPlan.objects.filter(productionplan_status__in=OPEN_PLAN_STATUSES)
+    if production_plan_ids:
+        plans = plans.filter(pk__in=production_plan_ids)
+    graph = get_bom_resolver().as_of(run_date)
+
+    return {
+        'start': start,
+        'plans': {
+            plan_id: {'item_id': item_id, 'quantity': quantity, 'planned_start_date': plan_start, 'planned_end_date': plan_end}
+            for plan_id, item_id, quantity, plan_start, plan_end in plans.values_list(
+                'id', 'item_id', 'quantity', 'planned_start_date', 'planned_end_date'
+            )
+        },
+        'graph': graph,
+        'stock': dict(available_stock()),
+        'routings': load_routings(set(graph)),  # Only items with a BOM become work orders
+        'workstations': dict(load_workstations()),
+        'blocked': dict(load_blocked_intervals(start)),
+    }
+
+
+def apply_scenario(plans, scenario):
+    """Production plans with the scenario's changes, removals and additions applied."""
+    plans = {plan_id: dict(plan) for plan_id, plan in plans.items()}
+    for change in scenario.get('plan_changes', ()):
+        plan = plans.get(change['production_plan_id'])
+        if plan is None:
+            continue
+        if change.get('exclude'):
+            del plans[change['production_plan_id']]
+            continue
+        for field in ('quantity', 'planned_start_date', 'planned_end_date'):
+            if change.get(field) is not None:
+                plan[field] = change[field]
+    for index, addition in enumerate(scenario.get('additional_plans', ()), start=1):
+        plans[f"new-{index}"] = dict(addition)
+    return plans
+
+
+def simulate(snapshot, scenario):
+    """
+    Run MRP and finite-capacity scheduling for one scenario against a
+    snapshot. Pure: it never touches the database, so it can run in a
+    worker process. Returns a summary of the planned orders and schedule.
+    """
+    demands = {}
+    for plan in apply_scenario(snapshot['plans'], scenario).values():
+        total, required_date = demands.get(plan['item_id'], (0, plan['planned_start_date']))
+        demands[plan['item_id']] = (total + plan['quantity'], min(required_date, plan['planned_start_date']))
+
+    graph = snapshot['graph']
+    planned = explode(demands, graph, snapshot['stock'], low_level_codes(graph, demands))
+
+    purchases = defaultdict(Decimal)
+    work_orders = defaultdict(Decimal)
+    orders = []
+    required = {}
+    for index, order in enumerate(sorted(planned, key=lambda row: (row['required_date'], -row['low_level_code'], row['item_id']))):
+        if order['order_type'] == 'PURCHASE':
+            purchases[order['item_id']] += order['quantity']
+            continue
+        work_orders[order['item_id']] += order['quantity']
+        orders.append((index, order['item_id'], order['quantity'], snapshot['start']))
+        required[index] = order['required_date']
+
+    calendars = {
+        workstation_id: CapacityCalendar(snapshot['blocked'].get(workstation_id, ()))
+        for workstation_ids in snapshot['workstations'].values() for workstation_id in workstation_ids
+    }
+    cards, unscheduled = plan_schedule(orders, snapshot['routings'], snapshot['workstations'], calendars)
+
+    finish = {}
+    load = defaultdict(float)
+    for order_key, _, workstation_id, card_start, card_end in cards:
+        finish[order_key] = max(finish.get(order_key, card_end), card_end)
+        load[workstation_id] += (card_end - card_start).total_seconds() / 3600
+    late = sum(1 for order_key, end in finish.items() if timezone.localdate(end) > required[order_key])
+
+    return {
+        'planned_purchase_orders': sum(1 for order in planned if order['order_type'] == 'PURCHASE'),
+        'planned_work_orders': len(orders),
+        'purchase_quantities': dict(purchases),
+        'work_order_quantities': dict(work_orders),
+        'job_cards': len(cards),
+        'unscheduled_work_orders': len(unscheduled),
+        'late_work_orders': late,
+        'schedule_end': max(finish.values()) if finish else None,
+        'workstation_hours': {workstation_id: round(hours, 2) for workstation_id, hours in load.items()},
+    }
+
+
+def _quantity_diff(baseline, scenario):
+    changes = {}
+    for item_id in baseline.keys() | scenario.keys():
+        before, after = baseline.get(item_id, Decimal(0)), scenario.get(item_id, Decimal(0))
+        if before != after:
+            changes[item_id] = {'baseline': before, 'scenario': after, 'change': after - before}
+    return changes
+
+
+def diff_summaries(baseline, scenario):
+    """What a scenario changes relative to the baseline; unchanged figures are left out."""
+    diff = {
+        'purchase_quantities': _quantity_diff(baseline['purchase_quantities'], scenario['purchase_quantities']),
+        'work_order_quantities': _quantity_diff(baseline['work_order_quantities'], scenario['work_order_quantities']),
+    }
+    for key in ('planned_purchase_orders', 'planned_work_orders', 'job_cards', 'unscheduled_work_orders', 'late_work_orders'):
+        if baseline[key] != scenario[key]:
+            diff[key] = scenario[key] - baseline[key]
+    if baseline['schedule_end'] != scenario['schedule_end']:
+        diff['schedule_end'] = {'baseline': baseline['schedule_end'], 'scenario': scenario['schedule_end']}
+    return diff
+
+
+def run_scenarios(snapshot, scenarios, max_workers=1):
+    """
+    Simulate the baseline (no changes) and every scenario. By default the
+    jobs run one after another in this process, which is what web requests
+    use: a pool per request would fork workers for every caller. With
+    `max_workers` above one (the management command) they run in up to that
+    many worker processes, capped by the SIMULATION_MAX_WORKERS setting.
+    Falls back to running in process when a pool cannot be started.
+    """
+    jobs = [{}] + list(scenarios)
+    max_workers = min(len(jobs), max_workers, getattr(settings, 'SIMULATION_MAX_WORKERS', MAX_WORKERS))
+    results = None
+    if max_workers > 1:
+        try:
+            with process_pool(max_workers) as pool:
+                results = list(pool.map(simulate, [snapshot] * len(jobs), jobs))
+        except (BrokenProcessPool, OSError, NotImplementedError):
+            results = None
+    if results is None:
+        results = [simulate(snapshot, job) for job in jobs]
+
+    baseline = results[0]
+    return baseline, [
+        {'name': scenario.get('name') or f"Scenario {index}", 'summary': summary, 'diff': diff_summaries(baseline, summary)}
+        for index, (scenario, summary) in enumerate(zip(scenarios, results[1:]), start=1)
+    ]
+
+
+def simulate_production_plans(scenarios, production_plan_ids=None, run_date=None, start=None, max_workers=1):
+    """Snapshot the current plans, BOMs, stock and calendars once and compare `scenarios` against the baseline."""
+    snapshot = take_snapshot(production_plan_ids, run_date, start)
+    return run_scenarios(snapshot, scenarios, max_workers)
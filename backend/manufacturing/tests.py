@@ -1,3 +1,343 @@
-from django.test import TestCase
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from backend.utils.versioning import version_snapshot
+from inventory.models import Item as InventoryItem, StockBalance, StockLedgerEntry, Warehouse
+from inventory.services import apply_balance_deltas
+from .models import (
+    BillOfMaterials, BOMComponent, DowntimeEntry, Item, JobCard, MRPRun, Operation, ProductionPlan, Routing, RoutingOperation, WorkOrder,
+    Shift, Workstation, WorkstationHourlyUsage, WorkstationType,
+)
+from . import signals
+from .analytics import workstation_oee
+from .bom import BOMResolver, invalidate_bom_cache
+from .mrp import available_stock, explode, low_level_codes, run_mrp
+from .production import complete_work_orders
+from .scheduling import CapacityCalendar, schedule_work_orders
+from .simulation import simulate_production_plans
+
+
+class ProductionTestCase(TestCase):
+    def setUp(self):
+        self.warehouse = Warehouse.objects.create(code='MAIN', name='Main')
+        InventoryItem.objects.create(sku='FG', name='Finished good')
+        InventoryItem.objects.create(sku='RM', name='Raw material')
+        self.finished = Item.objects.create(name='Finished good', sku='FG')
+        self.raw = Item.objects.create(name='Raw material', sku='RM', is_raw_material=True)
+        bom = BillOfMaterials.objects.create(item=self.finished)
+        BOMComponent.objects.create(bom=bom, component=self.raw, quantity=Decimal('2'))
+        apply_balance_deltas({(self.raw.inventory_item_id, self.warehouse.pk): Decimal('100')})
+        plan = ProductionPlan.objects.create(
+            item=self.finished, quantity=10, planned_start_date=date(2026, 1, 1), planned_end_date=date(2026, 1, 31),
+        )
+        self.work_order = WorkOrder.objects.create(
+            production_plan=plan, item=self.finished, quantity=10,
+            scheduled_start_date=date(2026, 1, 1), scheduled_end_date=date(2026, 1, 31),
+        )
+
+
+class CompleteWorkOrdersTests(ProductionTestCase):
+    def test_ledger_matches_balances(self):
+        complete_work_orders({self.work_order.pk: 4}, self.warehouse.pk, self.warehouse.pk)
+
+        for item, expected in ((self.raw, Decimal('92')), (self.finished, Decimal('4'))):
+            balance = StockBalance.objects.get(item_id=item.inventory_item_id, warehouse=self.warehouse)
+            self.assertEqual(balance.quantity, expected)
+        consumed = StockLedgerEntry.objects.get(item_id=self.raw.inventory_item_id, transaction_type='OUT')
+        self.assertEqual(consumed.quantity, Decimal('-8'))
+
+    def test_partial_completion_keeps_order_open(self):
+        complete_work_orders({self.work_order.pk: 4})
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.produced_quantity, 4)
+        self.assertEqual(self.work_order.workorder_status, 'STARTED')
+
+    def test_items_without_an_active_bom_are_rejected(self):
+        self.finished.boms.update(effective_to=date(2020, 1, 1))
+        invalidate_bom_cache()
+        with self.assertRaises(ValidationError):
+            complete_work_orders({self.work_order.pk: 4})
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.produced_quantity, 0)
+
+    def test_inventory_posting_needs_both_warehouses(self):
+        response = APIClient().post(
+            f"/api/v1/manufacturing/work-orders/{self.work_order.pk}/complete/",
+            {'quantity': 1, 'source_warehouse_id': self.warehouse.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertFalse(StockLedgerEntry.objects.filter(transaction_type='IN').exists())
+
+
+class AvailableStockTests(ProductionTestCase):
+    def test_produced_quantity_is_not_counted_twice(self):
+        complete_work_orders({self.work_order.pk: 4}, self.warehouse.pk, self.warehouse.pk)
+        # 4 produced into stock plus 6 still to come from the open work order
+        self.assertEqual(available_stock()[self.finished.pk], Decimal('10'))
+
+
+class BOMCostRollUpTests(TestCase):
+    def test_bom_cost_is_rolled_up_once_per_transaction(self):
+        finished = Item.objects.create(name='Assembly', sku='ASM')
+        parts = [
+            Item.objects.create(name=f"Part {index}", sku=f"P{index}", is_raw_material=True, purchase_cost=Decimal(index))
+            for index in range(1, 4)
+        ]
+        with mock.patch.object(signals, 'roll_up_bom_costs', wraps=signals.roll_up_bom_costs) as roll_up:
+            with self.captureOnCommitCallbacks(execute=True):
+                bom = BillOfMaterials.objects.create(item=finished)
+                for part in parts:
+                    BOMComponent.objects.create(bom=bom, component=part, quantity=Decimal('2'))
+        self.assertEqual(roll_up.call_count, 1)
+        finished.refresh_from_db()
+        self.assertEqual(finished.bom_cost, Decimal('12'))
+
+    def test_rolled_back_rows_are_not_rolled_up_later(self):
+        with mock.patch.object(signals, 'roll_up_bom_costs') as roll_up:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                signals._schedule_roll_up(item_ids=[1])
+                raise RuntimeError
+            with self.captureOnCommitCallbacks(execute=True):
+                signals._schedule_roll_up(item_ids=[2])
+        roll_up.assert_called_once_with(item_ids={2})
+
+
+class BOMResolverTests(TestCase):
+    def setUp(self):
+        self.finished = Item.objects.create(name='Assembly', sku='ASM')
+        self.old_part = Item.objects.create(name='Old part', sku='OLD', is_raw_material=True)
+        self.new_part = Item.objects.create(name='New part', sku='NEW', is_raw_material=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            old = BillOfMaterials.objects.create(item=self.finished, effective_to=date(2026, 5, 31))
+            BOMComponent.objects.create(bom=old, component=self.old_part, quantity=Decimal('1'))
+            new = BillOfMaterials.objects.create(item=self.finished, effective_from=date(2026, 6, 1))
+            BOMComponent.objects.create(bom=new, component=self.new_part, quantity=Decimal('3'))
+
+    def test_resolves_the_bom_effective_on_a_date(self):
+        resolver = BOMResolver()
+        self.assertEqual(resolver.components(self.finished.pk, date(2026, 5, 31)), [(self.old_part.pk, Decimal('1'))])
+        self.assertEqual(resolver.flatten(self.finished.pk, 2, date(2026, 6, 1)), {self.new_part.pk: Decimal('6')})
+        self.assertIsNone(resolver.components(self.new_part.pk))
+
+    def test_writes_invalidate_other_resolvers(self):
+        # Each resolver stands in for a separate worker process
+        resolver = BOMResolver()
+        self.assertEqual(len(resolver.components(self.finished.pk, date(2026, 6, 1))), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            bom = self.finished.boms.get(effective_from=date(2026, 6, 1))
+            BOMComponent.objects.create(bom=bom, component=self.old_part, quantity=Decimal('1'))
+        self.assertEqual(len(resolver.components(self.finished.pk, date(2026, 6, 1))), 2)
+
+    def test_snapshot_reads_the_version_stamp_once(self):
+        resolver = BOMResolver()
+        with version_snapshot():
+            resolver.components(self.finished.pk)
+            with self.assertNumQueries(0):
+                for on_date in (date(2026, 5, 31), date(2026, 6, 1)):
+                    resolver.components(self.finished.pk, on_date)
+
+
+class InventoryLinkTests(TestCase):
+    def test_new_item_links_to_inventory_item_by_sku(self):
+        inventory_item = InventoryItem.objects.create(sku='LNK', name='Linked')
+        self.assertEqual(Item.objects.create(name='Linked', sku='LNK').inventory_item_id, inventory_item.pk)
+        self.assertIsNone(Item.objects.create(name='Unlinked', sku='NONE').inventory_item_id)
+
+
+class WorkstationUsageTests(ProductionTestCase):
+    def test_ideal_time_comes_from_the_routing_of_the_job(self):
+        workstation_type = WorkstationType.objects.create(name='Press')
+        workstation = Workstation.objects.create(name='Press 1', workstation_type=workstation_type)
+        pressing = Operation.objects.create(name='Pressing', workstation_type=workstation_type)
+        trimming = Operation.objects.create(name='Trimming', workstation_type=workstation_type)
+        routing = Routing.objects.create(item=self.finished)
+        RoutingOperation.objects.create(routing=routing, operation=pressing, sequence=1, setup_time=6, time_per_unit=1)
+        RoutingOperation.objects.create(routing=routing, operation=trimming, sequence=2, setup_time=30, time_per_unit=5)
+
+        JobCard.objects.create(
+            work_order=self.work_order, operation=pressing, workstation=workstation, jobcard_status='COMPLETED',
+            start_time=datetime(2026, 1, 5, 8, tzinfo=dt_timezone.utc), end_time=datetime(2026, 1, 5, 9, tzinfo=dt_timezone.utc),
+        )
+        usage = WorkstationHourlyUsage.objects.get(workstation=workstation)
+        self.assertEqual(usage.busy_seconds, 3600)
+        self.assertEqual(usage.ideal_seconds, (6 + 1 * 10) * 60)
+
+        # A second card for the same operation takes over two thirds of the quantity
+        JobCard.objects.create(
+            work_order=self.work_order, operation=pressing, workstation=workstation, jobcard_status='COMPLETED',
+            start_time=datetime(2026, 1, 5, 9, tzinfo=dt_timezone.utc), end_time=datetime(2026, 1, 5, 11, tzinfo=dt_timezone.utc),
+        )
+        ideal = dict(WorkstationHourlyUsage.objects.filter(workstation=workstation).values_list('hour__hour', 'ideal_seconds'))
+        self.assertEqual(ideal, {8: 560, 9: 380, 10: 380})
+
+    def test_planned_time_follows_the_shift_calendar(self):
+        workstation = Workstation.objects.create(name='Press 1', workstation_type=WorkstationType.objects.create(name='Press'))
+        start, end = datetime(2026, 1, 5, 6, tzinfo=dt_timezone.utc), datetime(2026, 1, 5, 18, tzinfo=dt_timezone.utc)
+        self.assertEqual(workstation_oee(start, end)[0]['planned_hours'], 12)
+        # Hours covered by two shifts count once
+        Shift.objects.create(name='Early', start_time=time(6), end_time=time(14))
+        Shift.objects.create(name='Overlap', start_time=time(12), end_time=time(16))
+        self.assertEqual(workstation_oee(start, end)[0]['planned_hours'], 10)
+
+
+class MRPTests(ProductionTestCase):
+    def test_shared_components_are_netted_at_their_lowest_level(self):
+        # 1 -> 2 x 2 -> 3 x 3, and 1 also uses 3 directly
+        graph = {1: [(2, Decimal('2')), (3, Decimal('1'))], 2: [(3, Decimal('3'))]}
+        self.assertEqual(low_level_codes(graph), {1: 0, 2: 1, 3: 2})
+        planned = explode({1: (10, date(2026, 3, 1))}, graph, {1: 4, 3: 10})
+        self.assertEqual(
+            [(order['item_id'], order['order_type'], order['gross_requirement'], order['quantity']) for order in planned],
+            [(1, 'WORK_ORDER', 10, 6), (2, 'WORK_ORDER', 12, 12), (3, 'PURCHASE', 42, 32)],
+        )
+
+    def test_cycles_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            low_level_codes({1: [(2, 1)], 2: [(1, 1)]})
+
+    def test_run_plans_only_what_stock_and_open_orders_do_not_cover(self):
+        invalidate_bom_cache()
+        ProductionPlan.objects.create(
+            item=self.finished, quantity=70, planned_start_date=date(2026, 2, 1), planned_end_date=date(2026, 2, 28),
+        )
+        run = run_mrp(run_date=date(2026, 1, 1))
+        self.assertEqual((run.mrprun_status, run.production_plans.count()), ('COMPLETED', 2))
+        # 80 demanded, 10 coming from the open work order; 140 raw needed, 100 in stock
+        self.assertEqual(
+            list(run.planned_orders.values_list('item_id', 'quantity', 'required_date')),
+            [(self.finished.pk, Decimal('70'), date(2026, 1, 1)), (self.raw.pk, Decimal('40'), date(2026, 1, 1))],
+        )
+
+        client = APIClient()
+        response = client.get('/api/v1/manufacturing/planned-orders/', {'mrp_run': run.pk})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['data']), 2)
+        self.assertEqual(client.get('/api/v1/manufacturing/planned-orders/', {'mrp_run': 'abc'}).status_code, 400)
+
+
+def at(hour, minute=0):
+    return datetime(2026, 1, 5, hour, minute, tzinfo=dt_timezone.utc)
+
+
+class SchedulingTests(ProductionTestCase):
+    def setUp(self):
+        super().setUp()
+        press = WorkstationType.objects.create(name='Press')
+        self.presses = [Workstation.objects.create(name=f"Press {index}", workstation_type=press) for index in (1, 2)]
+        self.pressing = Operation.objects.create(name='Pressing', workstation_type=press)
+        self.trimming = Operation.objects.create(name='Trimming', workstation_type=press)
+        routing = Routing.objects.create(item=self.finished)
+        RoutingOperation.objects.create(routing=routing, operation=self.pressing, sequence=1, setup_time=6, time_per_unit=1)
+        RoutingOperation.objects.create(routing=routing, operation=self.trimming, sequence=2, setup_time=30, time_per_unit=5)
+        DowntimeEntry.objects.create(workstation=self.presses[0], start_time=at(7), end_time=at(9), reason='Maintenance')
+        plan = ProductionPlan.objects.create(
+            item=self.finished, quantity=10, planned_start_date=date(2026, 1, 1), planned_end_date=date(2026, 2, 28),
+        )
+        self.later_order = WorkOrder.objects.create(
+            production_plan=plan, item=self.finished, quantity=10,
+            scheduled_start_date=date(2026, 1, 1), scheduled_end_date=date(2026, 2, 28),
+        )
+
+    def cards(self, work_order):
+        return list(JobCard.objects.filter(work_order=work_order).order_by('start_time').values_list(
+            'operation_id', 'workstation_id', 'start_time', 'end_time'
+        ))
+
+    def test_calendar_merges_bookings_and_finds_gaps(self):
+        calendar = CapacityCalendar([(at(1), at(2)), (at(5), at(6)), (at(2), at(3))])
+        self.assertEqual(len(calendar), 2)
+        self.assertEqual(calendar.earliest_slot(at(1, 30), timedelta(hours=2)), at(3))
+        self.assertEqual(calendar.earliest_slot(at(1, 30), timedelta(hours=3)), at(6))
+
+    def test_operations_follow_routing_and_capacity(self):
+        created, unscheduled = schedule_work_orders(start=at(8))
+        self.assertEqual((created, unscheduled), (4, {}))
+        first, second = (press.pk for press in self.presses)
+        # Press 1 is down until 9:00, so the earlier due order starts on press 2
+        self.assertEqual(self.cards(self.work_order), [
+            (self.pressing.pk, second, at(8), at(8, 16)), (self.trimming.pk, second, at(8, 16), at(9, 36)),
+        ])
+        self.assertEqual(self.cards(self.later_order), [
+            (self.pressing.pk, first, at(9), at(9, 16)), (self.trimming.pk, first, at(9, 16), at(10, 36)),
+        ])
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.scheduled_start_date, date(2026, 1, 5))
+
+    def test_rescheduling_one_order_keeps_the_others_booked(self):
+        schedule_work_orders(start=at(8))
+        booked = self.cards(self.later_order)
+        WorkOrder.objects.filter(pk=self.work_order.pk).update(quantity=20)
+        schedule_work_orders([self.work_order.pk], start=at(8))
+        self.assertEqual(self.cards(self.later_order), booked)
+        for operation_id, workstation_id, start, end in self.cards(self.work_order):
+            self.assertFalse(any(
+                workstation_id == other and start < other_end and other_start < end for _, other, other_start, other_end in booked
+            ))
+
+    def test_running_job_cards_block_until_their_estimated_end(self):
+        JobCard.objects.create(
+            work_order=self.work_order, operation=self.trimming, workstation=self.presses[1],
+            start_time=at(7, 30), jobcard_status='IN_PROGRESS',
+        )
+        WorkOrder.objects.filter(pk=self.work_order.pk).update(workorder_status='STARTED')
+        schedule_work_orders([self.later_order.pk], start=at(8))
+        # Trimming 10 units takes 80 minutes, so press 2 is busy until 8:50 and press 1 until 9:00
+        self.assertEqual(self.cards(self.later_order)[0], (self.pressing.pk, self.presses[1].pk, at(8, 50), at(9, 6)))
+
+    def test_orders_without_routing_are_reported(self):
+        Routing.objects.all().delete()
+        created, unscheduled = schedule_work_orders(start=at(8))
+        self.assertEqual((created, set(unscheduled)), (0, {self.work_order.pk, self.later_order.pk}))
+
+
+@override_settings(SIMULATION_MAX_WORKERS=1)
+class SimulationTests(ProductionTestCase):
+    def test_scenarios_are_compared_with_the_baseline_without_writing(self):
+        invalidate_bom_cache()
+        plan = self.work_order.production_plan
+        baseline, results = simulate_production_plans([
+            {'name': 'Bigger plan', 'plan_changes': [{'production_plan_id': plan.pk, 'quantity': 60}]},
+            {'additional_plans': [{
+                'item_id': self.finished.pk, 'quantity': 80,
+                'planned_start_date': date(2026, 2, 1), 'planned_end_date': date(2026, 2, 28),
+            }]},
+        ], run_date=date(2026, 1, 1), start=at(8))
+
+        # The open work order already covers the plan
+        self.assertEqual((baseline['planned_work_orders'], baseline['planned_purchase_orders']), (0, 0))
+        bigger, added = results
+        self.assertEqual(bigger['name'], 'Bigger plan')
+        self.assertEqual(bigger['summary']['work_order_quantities'], {self.finished.pk: Decimal('50')})
+        self.assertEqual(bigger['summary']['purchase_quantities'], {})
+        self.assertEqual(added['name'], 'Scenario 2')
+        self.assertEqual(added['diff']['purchase_quantities'], {
+            self.raw.pk: {'baseline': Decimal('0'), 'scenario': Decimal('60'), 'change': Decimal('60')},
+        })
+        # Without a routing the new work order cannot be scheduled
+        self.assertEqual(added['diff']['unscheduled_work_orders'], 1)
+        self.assertFalse(MRPRun.objects.exists())
+        self.assertEqual(JobCard.objects.count(), 0)
+
+    def test_requests_run_in_process(self):
+        with mock.patch('manufacturing.simulation.process_pool') as pool:
+            response = APIClient().post('/api/v1/manufacturing/production-plans/simulate/', {
+                'scenarios': [{'name': 'One'}, {'name': 'Two'}], 'run_date': '2026-01-01',
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([scenario['name'] for scenario in response.json()['data']['scenarios']], ['One', 'Two'])
+        pool.assert_not_called()
+
+    def test_command_prints_the_comparison(self):
+        stdout = io.StringIO()
+        with mock.patch('sys.stdin', io.StringIO(json.dumps({'scenarios': [{'name': 'Same'}], 'run_date': '2026-01-01'}))):
+            call_command('simulate_production_plans', '-', '--workers', '4', stdout=stdout)
+        self.assertEqual(json.loads(stdout.getvalue())['scenarios'][0]['name'], 'Same')
@@ -4,7 +4,8 @@ from .views import (
     ItemViewSet, BillOfMaterialsViewSet, BOMComponentViewSet, WorkstationTypeViewSet,
     WorkstationViewSet, OperationViewSet, RoutingViewSet, RoutingOperationViewSet,
     ProductionPlanViewSet, WorkOrderViewSet, JobCardViewSet,
-    DowntimeEntryViewSet, StockEntryViewSet
+    DowntimeEntryViewSet, StockEntryViewSet, MRPRunViewSet, PlannedOrderViewSet,
+    ShiftViewSet
 )
 
 router = DefaultRouter()
@@ -21,6 +22,9 @@ router.register(r'work-orders', WorkOrderViewSet)
 router.register(r'job-cards', JobCardViewSet)
 router.register(r'downtime-entries', DowntimeEntryViewSet)
 router.register(r'stock-entries', StockEntryViewSet)
+router.register(r'mrp-runs', MRPRunViewSet)
+router.register(r'planned-orders', PlannedOrderViewSet)
+router.register(r'shifts', ShiftViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,18 +1,34 @@
-from rest_framework import viewsets, status, pagination
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework import viewsets, status, pagination, decorators, exceptions
 from drf_spectacular.openapi import AutoSchema
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from .models import (
     Item, BillOfMaterials, BOMComponent, WorkstationType, Workstation,
     Operation, Routing, RoutingOperation, ProductionPlan,
-    WorkOrder, JobCard, DowntimeEntry, StockEntry
+    WorkOrder, JobCard, DowntimeEntry, StockEntry, MRPRun, PlannedOrder, Shift
 )
 from .serializers import (
     ItemSerializer, BillOfMaterialsSerializer, BOMComponentSerializer, WorkstationTypeSerializer,
     WorkstationSerializer, OperationSerializer, RoutingSerializer, RoutingOperationSerializer,
     ProductionPlanSerializer, WorkOrderSerializer, JobCardSerializer, DowntimeEntrySerializer,
-    StockEntrySerializer
+    StockEntrySerializer, MRPRunSerializer, PlannedOrderSerializer, MRPRunRequestSerializer,
+    BOMResolutionSerializer, WhereUsedSerializer, CostBreakdownSerializer,
+    ScheduleRequestSerializer, ScheduleResultSerializer, ShiftSerializer,
+    WorkstationOEESerializer, ShiftOEESerializer, WorkOrderCompleteSerializer, WorkOrderBatchCompleteSerializer,
+    SimulationRequestSerializer, SimulationResultSerializer
 )
+from .analytics import workstation_oee, shift_oee
+from .bom import get_bom_resolver
+from .costing import roll_up_bom_costs, cost_breakdown, where_used
+from .mrp import run_mrp
+from .production import complete_work_orders
+from .scheduling import schedule_work_orders
+from .simulation import simulate_production_plans
 
 
 from backend.utils.response import Response
@@ -72,6 +88,67 @@ class ItemViewSet(CustomResponseModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
 
+    def _on_date(self, request):
+        raw = request.query_params.get('date')
+        try:
+            return date.fromisoformat(raw) if raw else timezone.localdate()
+        except ValueError:
+            raise exceptions.ValidationError({'date': "Use the YYYY-MM-DD format."})
+
+    @extend_schema(
+        summary="Where used",
+        description="Lists the items whose active BOM uses this item, directly or (with levels=all) through sub-assemblies.",
+        parameters=[
+            OpenApiParameter(name='date', description='Effective date (YYYY-MM-DD), defaults to today', required=False, type=str),
+            OpenApiParameter(name='levels', description="'all' for every level, otherwise direct parents only", required=False, type=str),
+        ],
+        responses=WhereUsedSerializer(many=True)
+    )
+    @decorators.action(detail=True, methods=['get'], url_path='where-used')
+    def where_used(self, request, pk=None):
+        item = self.get_object()
+        usages = where_used(item.pk, self._on_date(request), all_levels=request.query_params.get('levels') == 'all')
+        parents = Item.objects.in_bulk({parent_id for _, parent_id, _, _ in usages})
+        data = [
+            {'level': level, 'item_id': parent_id, 'sku': parents[parent_id].sku, 'name': parents[parent_id].name,
+             'via_item_id': via_id, 'quantity': quantity}
+            for level, parent_id, via_id, quantity in usages
+        ]
+        return Response(data=WhereUsedSerializer(data, many=True).data)
+
+    @extend_schema(
+        summary="Cost breakdown",
+        description="Indented material cost breakdown for one unit of the item from its active BOM, using stored purchase and rolled-up BOM costs.",
+        parameters=[
+            OpenApiParameter(name='date', description='Effective date (YYYY-MM-DD), defaults to today', required=False, type=str),
+            OpenApiParameter(name='levels', description="Number of BOM levels to expand, or 'all' (default 1)", required=False, type=str),
+        ],
+        responses=CostBreakdownSerializer
+    )
+    @decorators.action(detail=True, methods=['get'], url_path='cost-breakdown')
+    def cost_breakdown(self, request, pk=None):
+        item = self.get_object()
+        levels = request.query_params.get('levels', '1')
+        if levels != 'all' and not levels.isdigit():
+            raise exceptions.ValidationError({'levels': "Must be a positive integer or 'all'."})
+        lines, total = cost_breakdown(item.pk, self._on_date(request), None if levels == 'all' else max(int(levels), 1))
+        data = {'item_id': item.pk, 'bom_cost': item.bom_cost, 'total_cost': total, 'lines': lines}
+        return Response(data=CostBreakdownSerializer(data).data)
+
+    @extend_schema(
+        summary="Roll up BOM costs",
+        description="Recomputes the rolled-up material cost of every manufactured item bottom-up from the BOMs active today.",
+        request=None,
+        responses={200: None}
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='roll-up-costs')
+    def roll_up_costs(self, request):
+        try:
+            changed = roll_up_bom_costs()
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data={'updated': changed}, message=f"Updated the BOM cost of {changed} item(s)")
+
 @extend_schema(
     summary="Manage Bill of Materials",
     description="Create, update, delete, and list BOMs linking finished goods with their components.",
@@ -81,6 +158,44 @@ class BillOfMaterialsViewSet(CustomResponseModelViewSet):
     queryset = BillOfMaterials.objects.all()
     serializer_class = BillOfMaterialsSerializer
 
+    @extend_schema(
+        summary="Resolve BOM as of date",
+        description="Returns the BOM active for an item on a date and its components, optionally flattened to leaf components, from the cached BOM resolver.",
+        parameters=[
+            OpenApiParameter(name='item', description='Item ID', required=True, type=int),
+            OpenApiParameter(name='date', description='Effective date (YYYY-MM-DD), defaults to today', required=False, type=str),
+            OpenApiParameter(name='quantity', description='Quantity to make, defaults to 1', required=False, type=str),
+            OpenApiParameter(name='flatten', description='Roll up to leaf components (true/false)', required=False, type=bool),
+        ],
+        responses=BOMResolutionSerializer
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='resolve')
+    def resolve(self, request):
+        params = request.query_params
+        try:
+            item_id = int(params.get('item'))
+            on_date = date.fromisoformat(params['date']) if params.get('date') else timezone.localdate()
+            quantity = Decimal(params.get('quantity') or 1)
+        except (TypeError, ValueError, InvalidOperation):
+            return Response(success=False, message="Provide a numeric item, an ISO date and a numeric quantity.", code=status.HTTP_400_BAD_REQUEST)
+        flatten = params.get('flatten', '').lower() in ('1', 'true', 'yes')
+
+        resolver = get_bom_resolver()
+        bom_id = resolver.active_bom_id(item_id, on_date)
+        try:
+            if flatten:
+                lines = resolver.flatten(item_id, quantity, on_date).items()
+            else:
+                lines = [(component_id, per_unit * quantity) for component_id, per_unit in resolver.components(item_id, on_date) or ()]
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+
+        data = {
+            'item_id': item_id, 'bom_id': bom_id, 'on_date': on_date, 'quantity': quantity, 'flattened': flatten,
+            'components': [{'component_id': component_id, 'quantity': qty} for component_id, qty in lines],
+        }
+        return Response(data=BOMResolutionSerializer(data).data)
+
 @extend_schema(
     summary="Manage BOM Components",
     description="Manage components used in each Bill of Materials.",
@@ -108,6 +223,46 @@ class WorkstationViewSet(CustomResponseModelViewSet):
     queryset = Workstation.objects.all()
     serializer_class = WorkstationSerializer
 
+    def _moment(self, raw, param):
+        try:
+            value = datetime.fromisoformat(raw)
+        except ValueError:
+            raise exceptions.ValidationError({param: "Use an ISO date or datetime."})
+        if len(raw) == 10 and param == 'end':
+            value += timedelta(days=1)  # A plain end date includes that whole day
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+    @extend_schema(
+        summary="Workstation OEE",
+        description="Availability, utilisation, performance and OEE per workstation or per shift, aggregated from the pre-computed hourly usage buckets of completed job cards and downtime. Planned time is the working time of the shift calendar, or wall-clock time when no shifts are defined.",
+        parameters=[
+            OpenApiParameter(name='start', description='Start date/datetime (ISO), defaults to 30 days ago', required=False, type=str),
+            OpenApiParameter(name='end', description='End date/datetime (ISO, a date includes the whole day), defaults to now', required=False, type=str),
+            OpenApiParameter(name='workstations', description='Comma-separated workstation IDs', required=False, type=str),
+            OpenApiParameter(name='group_by', description="'workstation' (default) or 'shift'", required=False, type=str),
+        ],
+        responses=WorkstationOEESerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['get'], url_path='oee')
+    def oee(self, request):
+        params = request.query_params
+        end = self._moment(params['end'], 'end') if params.get('end') else timezone.now()
+        start = self._moment(params['start'], 'start') if params.get('start') else end - timedelta(days=30)
+        if start >= end:
+            raise exceptions.ValidationError({'start': "Must be before end."})
+        workstation_ids = None
+        if params.get('workstations'):
+            try:
+                workstation_ids = [int(pk) for pk in params['workstations'].split(',') if pk.strip()]
+            except ValueError:
+                raise exceptions.ValidationError({'workstations': "Must be comma-separated integer IDs."})
+
+        if params.get('group_by') == 'shift':
+            data = ShiftOEESerializer(shift_oee(start, end, workstation_ids), many=True).data
+        else:
+            data = WorkstationOEESerializer(workstation_oee(start, end, workstation_ids), many=True).data
+        return Response(data=data)
+
 @extend_schema(
     summary="Manage Operations",
     description="Create and manage production operations linked to workstation types.",
@@ -144,6 +299,46 @@ class ProductionPlanViewSet(CustomResponseModelViewSet):
     queryset = ProductionPlan.objects.all()
     serializer_class = ProductionPlanSerializer
 
+    @extend_schema(
+        summary="Run MRP",
+        description="Explodes multi-level BOMs for open production plans in low-level-code order, nets requirements against inventory stock and open work orders, and records planned purchase and work orders.",
+        request=MRPRunRequestSerializer,
+        responses=MRPRunSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='run-mrp')
+    def run_mrp(self, request):
+        serializer = MRPRunRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            run = run_mrp(
+                production_plan_ids=serializer.validated_data.get('production_plan_ids'),
+                run_date=serializer.validated_data.get('run_date'),
+            )
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=MRPRunSerializer(run).data, message=f"{run.planned_order_count} planned order(s) created", code=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary="Simulate production plan scenarios",
+        description="What-if comparison: snapshots open plans, BOMs, stock and workstation calendars once, then runs MRP and finite-capacity scheduling for the baseline and each scenario in this process. Nothing is written; each scenario returns its summary and a diff against the baseline. Large comparisons can run in parallel worker processes with the simulate_production_plans management command.",
+        request=SimulationRequestSerializer,
+        responses=SimulationResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='simulate')
+    def simulate(self, request):
+        serializer = SimulationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            baseline, scenarios = simulate_production_plans(
+                serializer.validated_data['scenarios'],
+                production_plan_ids=serializer.validated_data.get('production_plan_ids'),
+                run_date=serializer.validated_data.get('run_date'),
+                start=serializer.validated_data.get('start'),
+            )
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=SimulationResultSerializer({'baseline': baseline, 'scenarios': scenarios}).data)
+
 @extend_schema(
     summary="Manage Work Orders",
     description="Create, update, delete and list work orders associated with production plans.",
@@ -153,6 +348,74 @@ class WorkOrderViewSet(CustomResponseModelViewSet):
     queryset = WorkOrder.objects.all()
     serializer_class = WorkOrderSerializer
 
+    @extend_schema(
+        summary="Schedule work orders",
+        description="Finite-capacity scheduling of scheduled work orders: each routing operation, in sequence, gets a job card on the workstation of the right type that can finish it first, around downtime and existing bookings. Pass work_order_ids to reschedule only those orders.",
+        request=ScheduleRequestSerializer,
+        responses=ScheduleResultSerializer
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='schedule')
+    def schedule(self, request):
+        serializer = ScheduleRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, unscheduled = schedule_work_orders(
+            work_order_ids=serializer.validated_data.get('work_order_ids'),
+            start=serializer.validated_data.get('start'),
+        )
+        data = {
+            'job_cards_created': created,
+            'unscheduled': [{'work_order_id': work_order_id, 'reason': reason} for work_order_id, reason in unscheduled.items()],
+        }
+        return Response(data=ScheduleResultSerializer(data).data, message=f"{created} job card(s) scheduled")
+
+    def _complete(self, completions, validated_data):
+        source = validated_data.get('source_warehouse_id')
+        target = validated_data.get('target_warehouse_id')
+        return complete_work_orders(
+            completions,
+            source_warehouse_id=source.pk if source else None,
+            target_warehouse_id=target.pk if target else None,
+        )
+
+    @extend_schema(
+        summary="Complete work order",
+        description="Records production of a (partial) quantity: receives the finished item and backflushes components from the active BOM as manufacturing stock entries, optionally posting the same movements to inventory warehouses.",
+        request=WorkOrderCompleteSerializer,
+        responses=WorkOrderSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='complete')
+    def complete(self, request, pk=None):
+        work_order = self.get_object()
+        serializer = WorkOrderCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            self._complete({work_order.pk: serializer.validated_data['quantity']}, serializer.validated_data)
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        work_order.refresh_from_db()
+        return Response(data=WorkOrderSerializer(work_order).data, message="Production recorded")
+
+    @extend_schema(
+        summary="Complete work orders in batch",
+        description="Posts completions for many work orders in one transaction (e.g. at shift end). Nothing is posted if any completion is invalid.",
+        request=WorkOrderBatchCompleteSerializer,
+        responses={200: None}
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='complete-batch')
+    def complete_batch(self, request):
+        serializer = WorkOrderBatchCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        completions = {row['work_order_id']: row['quantity'] for row in serializer.validated_data['completions']}
+        try:
+            updated = self._complete(completions, serializer.validated_data)
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        data = [
+            {'work_order_id': work_order.pk, 'produced_quantity': work_order.produced_quantity, 'workorder_status': work_order.workorder_status}
+            for work_order in updated
+        ]
+        return Response(data=data, message=f"Production recorded for {len(updated)} work order(s)")
+
 @extend_schema(
     summary="Manage Job Cards",
     description="Manage job cards for tracking operations performed on work orders.",
@@ -179,3 +442,48 @@ class DowntimeEntryViewSet(CustomResponseModelViewSet):
 class StockEntryViewSet(CustomResponseModelViewSet):
     queryset = StockEntry.objects.all()
     serializer_class = StockEntrySerializer
+
+@extend_schema(
+    summary="MRP Runs",
+    description="List and retrieve MRP runs. Runs are created through the production plan run-mrp action.",
+    tags=["Planning"]
+)
+class MRPRunViewSet(CustomResponseModelViewSet):
+    queryset = MRPRun.objects.prefetch_related('production_plans').order_by('-created_at')
+    serializer_class = MRPRunSerializer
+    http_method_names = ['get', 'head', 'options']
+
+@extend_schema(
+    summary="Planned Orders",
+    description="List planned purchase and work orders produced by MRP runs.",
+    tags=["Planning"],
+    parameters=[
+        OpenApiParameter(name='mrp_run', description='Filter by MRP run ID', required=False, type=int),
+        OpenApiParameter(name='order_type', description='PURCHASE or WORK_ORDER', required=False, type=str),
+    ]
+)
+class PlannedOrderViewSet(CustomResponseModelViewSet):
+    queryset = PlannedOrder.objects.select_related('item')
+    serializer_class = PlannedOrderSerializer
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        mrp_run = self.request.query_params.get('mrp_run')
+        order_type = self.request.query_params.get('order_type')
+        if mrp_run:
+            if not mrp_run.isdigit():
+                raise exceptions.ValidationError({'mrp_run': "Must be an integer ID."})
+            queryset = queryset.filter(mrp_run_id=mrp_run)
+        if order_type:
+            queryset = queryset.filter(order_type=order_type.upper())
+        return queryset
+
+@extend_schema(
+    summary="Manage Shifts",
+    description="Define the working shifts used to group workstation OEE.",
+    tags=["Workstations"]
+)
+class ShiftViewSet(CustomResponseModelViewSet):
+    queryset = Shift.objects.all()
+    serializer_class = ShiftSerializer
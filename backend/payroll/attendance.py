@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from hr.models import Attendance
+from .models import AttendanceSummary, PayrollPeriod
+
+STATUS_FIELDS = {
+    'present': 'present_days',
+    'half_day': 'half_days',
+    'absent': 'absent_days',
+    'on_leave': 'leave_days',
+}
+
+
+def summary_fields(attendance_status, without_pay):
+    """Summary counters one attendance record adds to."""
+    fields = [STATUS_FIELDS[attendance_status]] if attendance_status in STATUS_FIELDS else []
+    if attendance_status == 'on_leave' and without_pay:
+        fields.append('unpaid_leave_days')
+    return fields
+
+
+def record_attendance(employee_id, day, attendance_status, without_pay, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one day of attendance in the summary of
+    every payroll period covering `day`, with in-place F() updates.
+    """
+    fields = summary_fields(attendance_status, without_pay)
+    if not fields:
+        return
+    changes = {field: F(field) + sign for field in fields}
+    for period_id in PayrollPeriod.objects.filter(start_date__lte=day, end_date__gte=day).values_list('id', flat=True):
+        summaries = AttendanceSummary.objects.filter(payroll_period_id=period_id, employee_id=employee_id)
+        if summaries.update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                AttendanceSummary.objects.create(
+                    payroll_period_id=period_id, employee_id=employee_id, **{field: 1 for field in fields}
+                )
+        except IntegrityError:
+            summaries.update(**changes)  # Created concurrently
+
+
+@transaction.atomic
+def rebuild_attendance_summaries(payroll_period, employee_ids=None):
+    """
+    Recount the summaries of a period from daily attendance with one grouped
+    query. Used when a period is created or its dates change, after bulk
+    attendance writes that skip signals, and to repair drift.
+    """
+    attendance = Attendance.objects.filter(date__range=(payroll_period.start_date, payroll_period.end_date))
+    summaries = AttendanceSummary.objects.filter(payroll_period=payroll_period)
+    if employee_ids is not None:
+        attendance = attendance.filter(employee_id__in=employee_ids)
+        summaries = summaries.filter(employee_id__in=employee_ids)
+    counts = attendance.values('employee_id').annotate(
+        present_days=Count('id', filter=Q(attendance_status='present')),
+        half_days=Count('id', filter=Q(attendance_status='half_day')),
+        absent_days=Count('id', filter=Q(attendance_status='absent')),
+        leave_days=Count('id', filter=Q(attendance_status='on_leave')),
+        unpaid_leave_days=Count('id', filter=Q(attendance_status='on_leave', leave_type__is_without_pay=True)),
+    ).order_by()
+    summaries.delete()
+    created = AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(payroll_period=payroll_period, **row) for row in counts], batch_size=1000
+    )
+    return len(created)
+
+
+def working_days(payroll_period):
+    """Calendar days in the period; pay is prorated over all of them."""
+    return Decimal((payroll_period.end_date - payroll_period.start_date).days + 1)
+
+
+def loss_of_pay_days(payroll_period, employee_ids):
+    """{employee_id: days deducted from pay}: absences, unpaid leave and half of each half day."""
+    return {
+        employee_id: absent + unpaid + Decimal(half) / 2
+        for employee_id, absent, unpaid, half in AttendanceSummary.objects.filter(
+            payroll_period=payroll_period, employee_id__in=employee_ids
+        ).values_list('employee_id', 'absent_days', 'unpaid_leave_days', 'half_days')
+    }
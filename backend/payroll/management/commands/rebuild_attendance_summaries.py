@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from payroll.attendance import rebuild_attendance_summaries
+from payroll.models import PayrollPeriod
+
+
+class Command(BaseCommand):
+    help = "Recount payroll attendance summaries from daily attendance (every period unless ids are given)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('payroll_period_ids', nargs='*', type=int, help="Only rebuild these payroll periods.")
+
+    def handle(self, *args, **options):
+        periods = PayrollPeriod.objects.order_by('start_date')
+        if options['payroll_period_ids']:
+            periods = periods.filter(pk__in=options['payroll_period_ids'])
+        for period in periods:
+            count = rebuild_attendance_summaries(period)
+            self.stdout.write(f"{period}: {count} employee summary(ies).")
+        self.stdout.write(self.style.SUCCESS("Attendance summaries rebuilt."))
@@ -0,0 +1,28 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import PayrollPeriod
+from payroll.services import DEFAULT_CHUNK_SIZE, start_payroll_run, execute_payroll_run
+
+
+class Command(BaseCommand):
+    help = "Generate salary slips for a payroll period, resuming its unfinished run if there is one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('payroll_period_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Employees committed per chunk.")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes computing slips.")
+
+    def handle(self, *args, **options):
+        try:
+            period = PayrollPeriod.objects.get(pk=options['payroll_period_id'])
+        except PayrollPeriod.DoesNotExist:
+            raise CommandError(f"Payroll period {options['payroll_period_id']} does not exist.")
+        try:
+            run = start_payroll_run(period)
+            execute_payroll_run(run, chunk_size=options['chunk_size'], workers=options['workers'])
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.messages))
+        self.stdout.write(self.style.SUCCESS(
+            f"Payroll run #{run.pk}: {run.processed_employees} employee(s) processed, {run.slips_created} slip(s) created."
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0002_department_depth_department_parent_department_path'),
+        ('payroll', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salaryslip',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payrollrun_status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('total_employees', models.PositiveIntegerField(default=0)),
+                ('processed_employees', models.PositiveIntegerField(default=0)),
+                ('slips_created', models.PositiveIntegerField(default=0)),
+                ('last_employee_id', models.PositiveBigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('payroll_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_runs', to='payroll.payrollperiod')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='salaryslip',
+            name='payroll_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salary_slips', to='payroll.payrollrun'),
+        ),
+        migrations.AddIndex(
+            model_name='salaryslip',
+            index=models.Index(fields=['payroll_period', 'employee'], name='payroll_slip_period_emp_idx'),
+        ),
+    ]
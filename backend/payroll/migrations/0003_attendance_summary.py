@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_attendance_summaries(apps, schema_editor):
+    PayrollPeriod = apps.get_model('payroll', 'PayrollPeriod')
+    AttendanceSummary = apps.get_model('payroll', 'AttendanceSummary')
+    Attendance = apps.get_model('hr', 'Attendance')
+
+    for period in PayrollPeriod.objects.iterator():
+        counts = Attendance.objects.filter(date__range=(period.start_date, period.end_date)).values('employee_id').annotate(
+            present_days=Count('id', filter=Q(attendance_status='present')),
+            half_days=Count('id', filter=Q(attendance_status='half_day')),
+            absent_days=Count('id', filter=Q(attendance_status='absent')),
+            leave_days=Count('id', filter=Q(attendance_status='on_leave')),
+        ).order_by()
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(payroll_period=period, **row) for row in counts], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0003_attendance_leave_type'),
+        ('payroll', '0002_payroll_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salaryslip',
+            name='payment_days',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='salaryslip',
+            name='working_days',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=5, null=True),
+        ),
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_days', models.IntegerField(default=0)),
+                ('half_days', models.IntegerField(default=0)),
+                ('absent_days', models.IntegerField(default=0)),
+                ('leave_days', models.IntegerField(default=0)),
+                ('unpaid_leave_days', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hr.employee')),
+                ('payroll_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='payroll.payrollperiod')),
+            ],
+            options={
+                'unique_together': {('payroll_period', 'employee')},
+            },
+        ),
+        migrations.RunPython(build_attendance_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0008_headcount_snapshot'),
+        ('payroll', '0003_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='salaryslip',
+            name='payroll_slip_period_emp_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='salaryslip',
+            constraint=models.UniqueConstraint(fields=('payroll_period', 'employee'), name='payroll_slip_period_emp_uniq'),
+        ),
+    ]
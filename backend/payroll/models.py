@@ -53,14 +53,58 @@ class SalarySlip(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     payroll_period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE)
     salary_structure = models.ForeignKey(SalaryStructure, on_delete=models.SET_NULL, null=True)
+    payroll_run = models.ForeignKey('PayrollRun', on_delete=models.SET_NULL, null=True, blank=True, related_name='salary_slips')
     total_earnings = models.DecimalField(max_digits=12, decimal_places=2)
-    total_deductions = models.DecimalField(max_digits=12, decimal_places=2)
+    total_deductions = models.DecimalField(max_digits=12, decimal_places=2)  # Includes income tax
+    tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    working_days = models.DecimalField(max_digits=5, decimal_places=1, blank=True, null=True)
+    payment_days = models.DecimalField(max_digits=5, decimal_places=1, blank=True, null=True)  # Earnings are prorated by payment_days / working_days
     net_salary = models.DecimalField(max_digits=12, decimal_places=2)
     generated_on = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['payroll_period', 'employee'], name='payroll_slip_period_emp_uniq')]
+
     def __str__(self):
         return f"Salary Slip: {self.employee} for {self.payroll_period}"
 
+class PayrollRun(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    payroll_period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='payroll_runs')
+    payrollrun_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    total_employees = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    slips_created = models.PositiveIntegerField(default=0)
+    last_employee_id = models.PositiveBigIntegerField(default=0)  # Resume cursor: employees are processed in id order
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Payroll Run #{self.pk} for {self.payroll_period} ({self.payrollrun_status})"
+
+class AttendanceSummary(models.Model):
+    # Day counts per employee and payroll period, kept current as attendance is recorded
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    payroll_period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='attendance_summaries')
+    present_days = models.IntegerField(default=0)
+    half_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    leave_days = models.IntegerField(default=0)
+    unpaid_leave_days = models.IntegerField(default=0)  # Included in leave_days
+
+    class Meta:
+        unique_together = ('payroll_period', 'employee')
+
+    def __str__(self):
+        return f"Attendance of {self.employee} for {self.payroll_period}"
+
 class PayrollSettings(models.Model):
     tax_slab = models.ForeignKey(IncomeTaxSlab, on_delete=models.SET_NULL, null=True)
     fiscal_year_start = models.DateField()
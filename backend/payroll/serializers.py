@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import (
     SalaryComponent, PayrollPeriod, IncomeTaxSlab, SalaryStructure,
-    SalaryStructureComponent, SalarySlip, PayrollSettings
+    SalaryStructureComponent, SalarySlip, PayrollSettings, PayrollRun, AttendanceSummary
 )
 from hr.serializers import EmployeeSerializer  # Assuming your Employee serializer is here
 
@@ -81,3 +81,41 @@ class PayrollSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = PayrollSettings
         fields = ['id', 'tax_slab', 'tax_slab_id', 'fiscal_year_start', 'fiscal_year_end']
+
+class PayrollRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PayrollRun
+        fields = [
+            'id', 'payroll_period', 'payrollrun_status', 'total_employees', 'processed_employees',
+            'slips_created', 'last_employee_id', 'error_message', 'created_at', 'started_at', 'finished_at'
+        ]
+
+class PayrollRunRequestSerializer(serializers.Serializer):
+    chunk_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=10000, help_text="Employees computed and committed per chunk"
+    )
+    workers = serializers.IntegerField(
+        required=False, min_value=1, max_value=32, help_text="Worker processes computing slips; 1 runs in process"
+    )
+
+class TaxComputationRequestSerializer(serializers.Serializer):
+    payroll_period_id = serializers.PrimaryKeyRelatedField(
+        queryset=PayrollPeriod.objects.all(), source='payroll_period',
+        help_text="Period whose salary structures and length are used"
+    )
+    employee_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=50000,
+        help_text="Employees to compute; defaults to every active employee with a structure in the period"
+    )
+
+class EmployeeTaxSerializer(serializers.Serializer):
+    employee_id = serializers.IntegerField()
+    period_earnings = serializers.DecimalField(max_digits=14, decimal_places=2)
+    annual_income = serializers.DecimalField(max_digits=16, decimal_places=2)
+    annual_tax = serializers.DecimalField(max_digits=16, decimal_places=2)
+    period_tax = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+class AttendanceSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttendanceSummary
+        fields = ['id', 'employee', 'payroll_period', 'present_days', 'half_days', 'absent_days', 'leave_days', 'unpaid_leave_days']
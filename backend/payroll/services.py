@@ -0,0 +1,195 @@
+from collections import defaultdict
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import repeat
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from backend.utils.pool import process_pool
+from .attendance import loss_of_pay_days, working_days
+from .models import PayrollPeriod, SalaryStructure, SalaryStructureComponent, SalarySlip, PayrollRun
+from .tax import CENT, get_tax_table, periods_per_year
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def slip_totals(components, payment_days, working_days):
+    """
+    (earnings, deductions) of a structure from its (component_type, amount)
+    pairs, with earnings prorated by the days paid out of the working days.
+    """
+    earnings = sum((amount for component_type, amount in components if component_type == 'EARNING'), Decimal(0))
+    deductions = sum((amount for component_type, amount in components if component_type == 'DEDUCTION'), Decimal(0))
+    if payment_days < working_days:
+        earnings = (earnings * payment_days / working_days).quantize(CENT, rounding=ROUND_HALF_UP)
+    return earnings, deductions
+
+
+def compute_chunk(rows, tax_table, periods, working_days):
+    """
+    (employee_id, structure_id, payment_days, total_earnings,
+    total_deductions, tax_amount, net_salary) for a chunk of
+    (employee_id, structure_id, components, loss_of_pay_days) rows. Income
+    tax on the period's earnings is computed for the whole chunk at once and
+    counted as a deduction. Pure, so chunks can be computed in worker
+    processes.
+    """
+    payment_days = [max(working_days - loss, Decimal(0)) for _, _, _, loss in rows]
+    totals = [slip_totals(row[2], days, working_days) for row, days in zip(rows, payment_days)]
+    taxes = tax_table.period_tax([earnings for earnings, _ in totals], periods)
+    return [
+        (employee_id, structure_id, days, earnings, deductions + tax, tax, earnings - deductions - tax)
+        for (employee_id, structure_id, _, _), days, (earnings, deductions), tax in zip(rows, payment_days, totals, taxes)
+    ]
+
+
+def active_structures(payroll_period, employee_ids=None):
+    """
+    {employee_id: salary_structure_id} for active employees whose structure is
+    effective at some point in the period; the latest effective one wins.
+    """
+    structures = SalaryStructure.objects.filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gte=payroll_period.start_date),
+        effective_from__lte=payroll_period.end_date,
+        employee__employee_status='active',
+    )
+    if employee_ids is not None:
+        structures = structures.filter(employee_id__in=employee_ids)
+    return dict(structures.order_by('employee_id', 'effective_from', 'id').values_list('employee_id', 'id'))
+
+
+def _chunks(payroll_period, pending, chunk_size):
+    """
+    Yield chunks of (employee_id, structure_id, components, loss_of_pay_days),
+    loading components and attendance summaries with one query each per chunk.
+    """
+    for offset in range(0, len(pending), chunk_size):
+        chunk = pending[offset:offset + chunk_size]
+        loss = loss_of_pay_days(payroll_period, [employee_id for employee_id, _ in chunk])
+        components = defaultdict(list)
+        for structure_id, component_type, amount in SalaryStructureComponent.objects.filter(
+            salary_structure_id__in=[structure_id for _, structure_id in chunk]
+        ).values_list('salary_structure_id', 'salary_component__component_type', 'amount'):
+            components[structure_id].append((component_type, amount))
+        yield [
+            (employee_id, structure_id, components[structure_id], loss.get(employee_id, Decimal(0)))
+            for employee_id, structure_id in chunk
+        ]
+
+
+@transaction.atomic
+def _write_chunk(run, results, working_days):
+    employee_ids = [row[0] for row in results]
+    existing = set(SalarySlip.objects.filter(
+        payroll_period_id=run.payroll_period_id, employee_id__in=employee_ids
+    ).values_list('employee_id', flat=True))
+    slips = [
+        SalarySlip(
+            employee_id=employee_id, payroll_period_id=run.payroll_period_id, salary_structure_id=structure_id,
+            payroll_run=run, working_days=working_days, payment_days=payment_days,
+            total_earnings=earnings, total_deductions=deductions, tax_amount=tax, net_salary=net,
+        )
+        for employee_id, structure_id, payment_days, earnings, deductions, tax, net in results
+        if employee_id not in existing
+    ]
+    SalarySlip.objects.bulk_create(slips, batch_size=1000)
+    run.processed_employees += len(results)
+    run.slips_created += len(slips)
+    run.last_employee_id = max(employee_ids)
+    run.save(update_fields=['processed_employees', 'slips_created', 'last_employee_id'])
+
+
+@transaction.atomic
+def start_payroll_run(payroll_period):
+    """
+    Claim the unfinished run of the period to resume, or a new one, by
+    marking it RUNNING. The period row is locked while the run is picked, so
+    concurrent requests cannot both claim a run; a run that is already
+    RUNNING is refused.
+    """
+    PayrollPeriod.objects.select_for_update().get(pk=payroll_period.pk)
+    run = payroll_period.payroll_runs.exclude(payrollrun_status='COMPLETED').order_by('-created_at').first()
+    if run is not None and run.payrollrun_status == 'RUNNING':
+        raise ValidationError(f"Payroll run #{run.pk} for this period is already running.")
+    run = run or PayrollRun(payroll_period=payroll_period)
+    run.payrollrun_status = 'RUNNING'
+    run.save()
+    return run
+
+
+def execute_payroll_run(run, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Generate salary slips for every active employee with a structure in the
+    run's period, prorating earnings by the period's attendance summaries.
+
+    Employees are processed in id order and each chunk is committed together
+    with the run's progress, so a failed or interrupted run resumes after the
+    last committed employee. Employees that already have a slip for the
+    period are skipped. With `workers` > 1 the slip figures are computed in a
+    process pool while this process does all database work. The run must
+    have been claimed with start_payroll_run.
+    """
+    if run.payrollrun_status != 'RUNNING':
+        raise ValidationError("Start the payroll run with start_payroll_run before executing it.")
+    period = run.payroll_period
+    structures = active_structures(period)
+    pending = [(employee_id, structure_id) for employee_id, structure_id in sorted(structures.items()) if employee_id > run.last_employee_id]
+
+    run.total_employees = run.processed_employees + len(pending)
+    run.started_at = run.started_at or timezone.now()
+    run.error_message = None
+    run.save(update_fields=['total_employees', 'started_at', 'error_message'])
+
+    tax_table = get_tax_table()
+    periods = periods_per_year(period)
+    days = working_days(period)
+    try:
+        results = None
+        if workers > 1 and len(pending) > chunk_size:
+            try:
+                with process_pool(workers) as pool:
+                    chunks = _chunks(period, pending, chunk_size)
+                    for chunk_results in pool.map(compute_chunk, chunks, repeat(tax_table), repeat(periods), repeat(days)):
+                        _write_chunk(run, chunk_results, days)
+                results = True
+            except (BrokenProcessPool, OSError, NotImplementedError):
+                # Fall back to computing in process; chunks already written are skipped
+                pending = [row for row in pending if row[0] > run.last_employee_id]
+        if results is None:
+            for chunk in _chunks(period, pending, chunk_size):
+                _write_chunk(run, compute_chunk(chunk, tax_table, periods, days), days)
+    except Exception as exc:
+        run.payrollrun_status = 'FAILED'
+        run.error_message = str(exc)
+        run.save(update_fields=['payrollrun_status', 'error_message'])
+        raise
+
+    run.payrollrun_status = 'COMPLETED'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['payrollrun_status', 'finished_at'])
+    return run
+
+
+def employee_tax(payroll_period, employee_ids=None):
+    """
+    Income tax for active employees with a salary structure effective in the
+    period, computed in one pass over the slab table on attendance-prorated
+    earnings: rows of (employee_id, period_earnings, annual_income,
+    annual_tax, period_tax).
+    """
+    tax_table = get_tax_table()
+    periods = periods_per_year(payroll_period)
+    days = working_days(payroll_period)
+    structures = sorted(active_structures(payroll_period, employee_ids).items())
+    rows = []
+    for chunk in _chunks(payroll_period, structures, DEFAULT_CHUNK_SIZE):
+        earnings = [slip_totals(components, max(days - loss, Decimal(0)), days)[0] for _, _, components, loss in chunk]
+        annual_incomes = [amount * periods for amount in earnings]
+        rows.extend(zip(
+            [row[0] for row in chunk], earnings, annual_incomes,
+            tax_table.annual_tax(annual_incomes), tax_table.period_tax(earnings, periods),
+        ))
+    return rows
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from hr.models import Attendance, LeaveType
+from hr.signals import attendance_changed
+from .attendance import record_attendance, rebuild_attendance_summaries
+from .models import IncomeTaxSlab, PayrollPeriod
+from .tax import invalidate_tax_table
+
+
+@receiver([post_save, post_delete], sender=IncomeTaxSlab)
+def invalidate_tax_slabs(sender, **kwargs):
+    invalidate_tax_table()
+    transaction.on_commit(invalidate_tax_table)
+
+
+def _without_pay(leave_type_id):
+    return leave_type_id is not None and LeaveType.objects.filter(pk=leave_type_id, is_without_pay=True).exists()
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, **kwargs):
+    instance._previous_attendance = Attendance.objects.filter(pk=instance.pk).values_list(
+        'employee_id', 'date', 'attendance_status', 'leave_type__is_without_pay'
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_attendance', None)
+    if previous is not None:
+        employee_id, day, attendance_status, without_pay = previous
+        record_attendance(employee_id, day, attendance_status, bool(without_pay), sign=-1)
+    record_attendance(instance.employee_id, instance.date, instance.attendance_status, _without_pay(instance.leave_type_id))
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_attendance_from_summary(sender, instance, **kwargs):
+    record_attendance(
+        instance.employee_id, instance.date, instance.attendance_status, _without_pay(instance.leave_type_id), sign=-1
+    )
+
+
+@receiver(pre_save, sender=PayrollPeriod)
+def remember_period_dates(sender, instance, **kwargs):
+    instance._previous_dates = PayrollPeriod.objects.filter(pk=instance.pk).values_list(
+        'start_date', 'end_date'
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=PayrollPeriod)
+def build_period_attendance_summaries(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_dates', None)
+    if created or previous is None or previous != (instance.start_date, instance.end_date):
+        instance.refresh_from_db(fields=['start_date', 'end_date'])
+        rebuild_attendance_summaries(instance)
+
+
+@receiver(attendance_changed)
+def rebuild_changed_attendance_summaries(sender, employee_ids, start_date, end_date, **kwargs):
+    for period in PayrollPeriod.objects.filter(start_date__lte=end_date, end_date__gte=start_date):
+        rebuild_attendance_summaries(period, employee_ids)
@@ -0,0 +1,108 @@
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+from backend.utils.versioning import bump_version, current_version
+from .models import IncomeTaxSlab
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python fallback below
+    np = None
+
+CENT = Decimal('0.01')
+TAX_TABLE_VERSION_KEY = 'payroll:tax-table-version'
+
+
+def _to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _round_div(numerator, denominator):
+    """numerator / denominator rounded half up, for non-negative integers."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+class TaxTable:
+    """
+    The full income tax slab table, loaded once, applied progressively: each
+    slab taxes only the part of an annual income that falls inside it.
+
+    Amounts are handled in integer cents and rates in hundredths of a
+    percent, so the numpy path (vectorised over arrays of incomes) and the
+    pure-Python fallback give exactly the same figures. Instances hold plain
+    data and can be sent to worker processes.
+    """
+
+    def __init__(self, slabs):
+        # slabs: (start_amount, end_amount, tax_percentage) rows
+        slabs = sorted(slabs)
+        self.starts = [_to_cents(start) for start, _, _ in slabs]
+        self.ends = [_to_cents(end) for _, end, _ in slabs]
+        self.rates = [int(Decimal(percentage) * 100) for _, _, percentage in slabs]
+
+    @classmethod
+    def load(cls):
+        return cls(IncomeTaxSlab.objects.values_list('start_amount', 'end_amount', 'tax_percentage'))
+
+    def _annual_cents(self, incomes):
+        """Annual tax in cents for a sequence of annual incomes in cents."""
+        if not self.rates:
+            return [0] * len(incomes)
+        if np is not None and len(incomes) > 1:
+            # Income falling in each slab: one row per income, one column per slab
+            income = np.asarray(incomes, dtype=np.int64)[:, None]
+            taxable = np.clip(np.minimum(income, self.ends) - self.starts, 0, None)
+            weighted = taxable @ np.asarray(self.rates, dtype=np.int64)
+            return ((2 * weighted + 10000) // 20000).tolist()
+        return [
+            _round_div(sum(
+                max(min(income, end) - start, 0) * rate
+                for start, end, rate in zip(self.starts, self.ends, self.rates)
+            ), 10000)
+            for income in incomes
+        ]
+
+    def annual_tax(self, incomes):
+        """Tax on each annual income, as Decimals."""
+        return [(Decimal(cents) / 100).quantize(CENT) for cents in self._annual_cents([_to_cents(income) for income in incomes])]
+
+    def period_tax(self, period_incomes, periods):
+        """
+        Tax for one period on each period income: the income is annualised
+        over `periods`, taxed, and the annual tax spread back over the periods.
+        """
+        annual = self._annual_cents([_to_cents(income) * periods for income in period_incomes])
+        return [(Decimal(_round_div(cents, periods)) / 100).quantize(CENT) for cents in annual]
+
+
+def periods_per_year(payroll_period):
+    """How many periods of this length make a year; slabs are annual, so pay is annualised for tax."""
+    days = (payroll_period.end_date - payroll_period.start_date).days + 1
+    return max(round(365 / days), 1)
+
+
+class _TaxTableCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._table = None
+
+    def get(self):
+        version = current_version(TAX_TABLE_VERSION_KEY)
+        with self._lock:
+            if self._table is None or self._version != version:
+                self._table = TaxTable.load()
+                self._version = version
+            return self._table
+
+
+_tax_tables = _TaxTableCache()
+
+
+def get_tax_table():
+    """The slab table, reloaded only after slabs change."""
+    return _tax_tables.get()
+
+
+def invalidate_tax_table(**kwargs):
+    bump_version(TAX_TABLE_VERSION_KEY)
@@ -1,3 +1,154 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounting.models import Company
+from hr.models import Attendance, Employee
+from . import services, tax
+from .models import (
+    AttendanceSummary, IncomeTaxSlab, PayrollPeriod, SalaryComponent, SalarySlip, SalaryStructure, SalaryStructureComponent,
+)
+from .services import execute_payroll_run, start_payroll_run
+from .tax import TaxTable, get_tax_table
+
+
+class PayrollTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.company = Company.objects.create(
+            name='Company', fiscal_year_start=date(2026, 1, 1), fiscal_year_end=date(2026, 12, 31), currency='USD',
+        )
+        self.period = PayrollPeriod.objects.create(start_date=date(2026, 3, 1), end_date=date(2026, 3, 31))
+        IncomeTaxSlab.objects.bulk_create([
+            IncomeTaxSlab(start_amount=start, end_amount=end, tax_percentage=percentage)
+            for start, end, percentage in ((0, 10000, 0), (10000, 50000, 10), (50000, 10 ** 9, 20))
+        ])
+
+    def create_employee(self, code, **extra):
+        fields = {
+            'employee_id': code, 'first_name': 'Test', 'last_name': code, 'email': f'{code}@example.com', 'phone': '1',
+            'date_of_joining': date(2024, 1, 1), 'date_of_birth': date(1990, 1, 1), 'employment_type': 'FT',
+            'company': self.company,
+        }
+        fields.update(extra)
+        return Employee.objects.create(**fields)
+
+
+class AttendanceSummaryTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = self.create_employee('E1')
+        for day, attendance_status in ((2, 'present'), (3, 'present'), (4, 'half_day'), (5, 'absent')):
+            Attendance.objects.create(employee=self.employee, date=date(2026, 3, day), attendance_status=attendance_status)
+
+    def test_summary_follows_attendance(self):
+        summary = AttendanceSummary.objects.get(employee=self.employee, payroll_period=self.period)
+        self.assertEqual((summary.present_days, summary.half_days, summary.absent_days), (2, 1, 1))
+
+        Attendance.objects.filter(employee=self.employee, date=date(2026, 3, 5)).get().delete()
+        Attendance.objects.get(employee=self.employee, date=date(2026, 3, 4)).save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.present_days, summary.half_days, summary.absent_days), (2, 1, 0))
+
+    def test_filters_by_employee_and_period(self):
+        self.create_employee('E2')
+        response = self.client.get('/api/v1/payroll/attendance-summaries/', {'employee': self.employee.pk, 'payroll_period': self.period.pk})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([row['employee'] for row in response.json()['data']], [self.employee.pk])
+
+    def test_malformed_filters_are_rejected(self):
+        for params in ({'employee': 'abc'}, {'payroll_period': '1;2'}):
+            response = self.client.get('/api/v1/payroll/attendance-summaries/', params)
+            self.assertEqual(response.status_code, 400, response.content)
+
+
+class TaxTableTests(PayrollTestCase):
+    def test_slabs_tax_only_the_income_inside_them(self):
+        table = TaxTable.load()
+        self.assertEqual(table.annual_tax([5000, 30000, 80000]), [Decimal('0.00'), Decimal('2000.00'), Decimal('10000.00')])
+        # 2500 a month is 30000 a year, taxed 2000 a year
+        self.assertEqual(table.period_tax([Decimal('2500')], 12), [Decimal('166.67')])
+
+    @skipUnless(tax.np is not None, "numpy is not installed")
+    def test_numpy_and_python_paths_agree(self):
+        table = TaxTable.load()
+        incomes = [Decimal(income) / 7 for income in range(0, 10 ** 7, 99991)]
+        vectorised = table.annual_tax(incomes)
+        with mock.patch.object(tax, 'np', None):
+            self.assertEqual(table.annual_tax(incomes), vectorised)
+
+    def test_slab_changes_reload_the_table(self):
+        self.assertEqual(get_tax_table().annual_tax([80000]), [Decimal('10000.00')])
+        slab = IncomeTaxSlab.objects.get(tax_percentage=20)
+        slab.tax_percentage = 30
+        slab.save()
+        self.assertEqual(get_tax_table().annual_tax([80000]), [Decimal('13000.00')])
+
+
+class PayrollRunTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        basic = SalaryComponent.objects.create(name='Basic', component_type='EARNING', amount=0)
+        pension = SalaryComponent.objects.create(name='Pension', component_type='DEDUCTION', amount=0)
+        self.employees = [self.create_employee(f'E{index}') for index in range(2)]
+        for employee in self.employees:
+            structure = SalaryStructure.objects.create(employee=employee, effective_from=date(2026, 1, 1))
+            SalaryStructureComponent.objects.bulk_create([
+                SalaryStructureComponent(salary_structure=structure, salary_component=basic, amount=Decimal('3100')),
+                SalaryStructureComponent(salary_structure=structure, salary_component=pension, amount=Decimal('100')),
+            ])
+        Attendance.objects.create(employee=self.employees[0], date=date(2026, 3, 2), attendance_status='absent')
+        Attendance.objects.create(employee=self.employees[0], date=date(2026, 3, 3), attendance_status='half_day')
+
+    def test_slips_are_prorated_and_taxed(self):
+        run = execute_payroll_run(start_payroll_run(self.period))
+        self.assertEqual((run.payrollrun_status, run.slips_created), ('COMPLETED', 2))
+        prorated, full = (SalarySlip.objects.get(employee=employee) for employee in self.employees)
+        # 1.5 days lost out of 31; 2950 a month is taxed as 35400 a year
+        self.assertEqual(
+            (prorated.payment_days, prorated.total_earnings, prorated.tax_amount, prorated.net_salary),
+            (Decimal('29.5'), Decimal('2950.00'), Decimal('211.67'), Decimal('2638.33')),
+        )
+        self.assertEqual((full.total_earnings, full.total_deductions), (Decimal('3100.00'), Decimal('326.67')))
+
+    def test_failed_run_resumes_after_the_last_committed_chunk(self):
+        compute_chunk = services.compute_chunk
+        calls = []
+
+        def fail_second_chunk(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("Worker lost")
+            return compute_chunk(*args)
+
+        run = start_payroll_run(self.period)
+        with mock.patch.object(services, 'compute_chunk', fail_second_chunk), self.assertRaises(RuntimeError):
+            execute_payroll_run(run, chunk_size=1)
+        run.refresh_from_db()
+        self.assertEqual((run.payrollrun_status, run.slips_created), ('FAILED', 1))
+
+        resumed = execute_payroll_run(start_payroll_run(self.period), chunk_size=1)
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual((resumed.payrollrun_status, resumed.slips_created), ('COMPLETED', 2))
+        self.assertEqual(SalarySlip.objects.filter(payroll_period=self.period).count(), 2)
+
+    def test_a_running_run_cannot_be_claimed_twice(self):
+        run = start_payroll_run(self.period)
+        with self.assertRaises(ValidationError):
+            start_payroll_run(self.period)
+        response = self.client.post(f"/api/v1/payroll/payroll-periods/{self.period.pk}/run-payroll/", {}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        execute_payroll_run(run)
+        self.assertEqual(SalarySlip.objects.count(), 2)
 
-# Create your tests here.
+    def test_one_slip_per_employee_and_period(self):
+        execute_payroll_run(start_payroll_run(self.period))
+        slip = SalarySlip.objects.first()
+        slip.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            slip.save()
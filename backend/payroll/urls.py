@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     SalaryComponentViewSet, PayrollPeriodViewSet, IncomeTaxSlabViewSet,
     SalaryStructureViewSet, SalaryStructureComponentViewSet, SalarySlipViewSet,
-    PayrollSettingsViewSet
+    PayrollSettingsViewSet, PayrollRunViewSet, AttendanceSummaryViewSet
 )
 
 router = DefaultRouter()
@@ -15,6 +15,8 @@ router.register(r'salary-structures', SalaryStructureViewSet, basename='salaryst
 router.register(r'salary-structure-components', SalaryStructureComponentViewSet, basename='salarystructurecomponent')
 router.register(r'salary-slips', SalarySlipViewSet, basename='salaryslip')
 router.register(r'payroll-settings', PayrollSettingsViewSet, basename='payrollsettings')
+router.register(r'payroll-runs', PayrollRunViewSet, basename='payrollrun')
+router.register(r'attendance-summaries', AttendanceSummaryViewSet, basename='attendancesummary')
 
 urlpatterns = [
     path('', include(router.urls)),
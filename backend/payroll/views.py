@@ -1,16 +1,19 @@
-from rest_framework import viewsets, status, pagination
-from drf_spectacular.utils import extend_schema
+from django.core.exceptions import ValidationError
+from rest_framework import viewsets, status, pagination, decorators, exceptions
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.openapi import AutoSchema
 from backend.utils.response import Response
 from .models import (
     SalaryComponent, PayrollPeriod, IncomeTaxSlab, SalaryStructure,
-    SalaryStructureComponent, SalarySlip, PayrollSettings
+    SalaryStructureComponent, SalarySlip, PayrollSettings, PayrollRun, AttendanceSummary
 )
 from .serializers import (
     SalaryComponentSerializer, PayrollPeriodSerializer, IncomeTaxSlabSerializer,
     SalaryStructureSerializer, SalaryStructureComponentSerializer,
-    SalarySlipSerializer, PayrollSettingsSerializer
+    SalarySlipSerializer, PayrollSettingsSerializer, PayrollRunSerializer, PayrollRunRequestSerializer,
+    TaxComputationRequestSerializer, EmployeeTaxSerializer, AttendanceSummarySerializer
 )
+from .services import DEFAULT_CHUNK_SIZE, start_payroll_run, execute_payroll_run, employee_tax
 
 class CustomSchema(AutoSchema):
     pass
@@ -71,6 +74,27 @@ class PayrollPeriodViewSet(CustomResponseModelViewSet):
     queryset = PayrollPeriod.objects.all()
     serializer_class = PayrollPeriodSerializer
 
+    @extend_schema(
+        summary="Run payroll for a period",
+        description="Generates salary slips for every active employee with a salary structure effective in the period: earnings, deductions and slab-based income tax are computed server-side and the slips are bulk created in committed chunks. Resumes the period's unfinished run if there is one; employees that already have a slip are skipped.",
+        request=PayrollRunRequestSerializer,
+        responses=PayrollRunSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='run-payroll')
+    def run_payroll(self, request, pk=None):
+        serializer = PayrollRunRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            run = start_payroll_run(self.get_object())
+            execute_payroll_run(
+                run,
+                chunk_size=serializer.validated_data.get('chunk_size', DEFAULT_CHUNK_SIZE),
+                workers=serializer.validated_data.get('workers', 1),
+            )
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=PayrollRunSerializer(run).data, message=f"{run.slips_created} salary slip(s) created", code=status.HTTP_201_CREATED)
+
 
 @extend_schema(
     summary="Manage income tax slabs",
@@ -81,6 +105,24 @@ class IncomeTaxSlabViewSet(CustomResponseModelViewSet):
     queryset = IncomeTaxSlab.objects.all()
     serializer_class = IncomeTaxSlabSerializer
 
+    @extend_schema(
+        summary="Compute income tax for employees",
+        description="Applies the full slab table progressively to the annualised earnings of each employee's salary structure effective in the period, in one batch. This is the same calculation the payroll run uses.",
+        request=TaxComputationRequestSerializer,
+        responses=EmployeeTaxSerializer(many=True)
+    )
+    @decorators.action(detail=False, methods=['post'], url_path='compute')
+    def compute(self, request):
+        serializer = TaxComputationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = employee_tax(serializer.validated_data['payroll_period'], serializer.validated_data.get('employee_ids'))
+        data = EmployeeTaxSerializer([
+            {'employee_id': employee_id, 'period_earnings': earnings, 'annual_income': annual_income,
+             'annual_tax': annual_tax, 'period_tax': period_tax}
+            for employee_id, earnings, annual_income, annual_tax, period_tax in rows
+        ], many=True).data
+        return Response(data=data, message=f"Tax computed for {len(data)} employee(s)")
+
 
 @extend_schema(
     summary="Manage salary structures",
@@ -120,3 +162,39 @@ class SalarySlipViewSet(CustomResponseModelViewSet):
 class PayrollSettingsViewSet(CustomResponseModelViewSet):
     queryset = PayrollSettings.objects.all()
     serializer_class = PayrollSettingsSerializer
+
+
+@extend_schema(
+    summary="Payroll runs",
+    description="Progress and outcome of payroll runs. Running payroll again for the period resumes a failed run after the last committed employee.",
+    tags=["Payroll - Payroll Run"]
+)
+class PayrollRunViewSet(CustomResponseModelViewSet):
+    queryset = PayrollRun.objects.order_by('-created_at')
+    serializer_class = PayrollRunSerializer
+    http_method_names = ['get', 'head', 'options']
+
+
+@extend_schema(
+    summary="Attendance summaries",
+    description="Present, half-day, absent and leave day counts per employee and payroll period, kept current as attendance is recorded and used to prorate pay.",
+    tags=["Payroll - Attendance Summary"],
+    parameters=[
+        OpenApiParameter(name='payroll_period', description='Filter by payroll period ID', required=False, type=int),
+        OpenApiParameter(name='employee', description='Filter by employee ID', required=False, type=int),
+    ]
+)
+class AttendanceSummaryViewSet(CustomResponseModelViewSet):
+    queryset = AttendanceSummary.objects.order_by('payroll_period_id', 'employee_id')
+    serializer_class = AttendanceSummarySerializer
+    http_method_names = ['get', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for param, field in (('payroll_period', 'payroll_period_id'), ('employee', 'employee_id')):
+            if params.get(param):
+                if not params[param].isdigit():
+                    raise exceptions.ValidationError({param: "Must be an integer ID."})
+                queryset = queryset.filter(**{field: int(params[param])})
+        return queryset
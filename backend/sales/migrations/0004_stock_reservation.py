@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_reservation'),
+        ('sales', '0003_alter_quotation_sales_person_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='delivered_qty',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='invoiced_qty',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.warehouse'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_net_amounts(apps, schema_editor):
+    # Existing documents keep their recorded total as the untaxed amount
+    for model_name in ('SalesOrder', 'Quotation', 'SalesInvoice'):
+        apps.get_model('sales', model_name).objects.update(net_amount=models.F('total_amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_item_inventory_item'),
+        ('sales', '0004_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotation',
+            name='net_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='tax_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.taxtemplate'),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='net_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='tax_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.taxtemplate'),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='net_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='tax_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounting.taxtemplate'),
+        ),
+        migrations.AlterField(
+            model_name='quotation',
+            name='quotation_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='salesinvoice',
+            name='invoice_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='salesorder',
+            name='order_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(backfill_net_amounts, migrations.RunPython.noop),
+    ]
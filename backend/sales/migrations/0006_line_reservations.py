@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+def backfill_reservations(apps, schema_editor):
+    # Open orders submitted before this held stock for everything not yet delivered
+    SalesOrderItem = apps.get_model('sales', 'SalesOrderItem')
+    SalesOrderItem.objects.filter(sales_order__status__in=('SUBMITTED', 'PARTIALLY_DELIVERED')).update(
+        reserved_qty=models.F('quantity') - models.F('delivered_qty')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_document_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorderitem',
+            name='reserved_qty',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_reservations, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.utils import timezone
 from crm.models import Customer,SalesPerson
-from inventory.models import Item
+from inventory.models import Item, Warehouse
+from accounting.models import TaxTemplate
 # Customer and related master data
 
 
@@ -49,10 +50,14 @@ class SalesOrder(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
     sales_person = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True, blank=True)
     sales_partner = models.ForeignKey(SalesPartner, on_delete=models.SET_NULL, null=True, blank=True)
-    order_date = models.DateField(default=timezone.now)
+    order_date = models.DateField(default=timezone.localdate)
     delivery_date = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=30, choices=ORDER_STATUS_CHOICES, default='DRAFT')
     total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)
+    # Computed from the items: net_amount is their sum, tax_amount applies tax_template, total_amount is both
+    tax_template = models.ForeignKey(TaxTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     remarks = models.TextField(blank=True, null=True)
 
     def __str__(self):
@@ -64,6 +69,10 @@ class SalesOrderItem(models.Model):
     quantity = models.DecimalField(max_digits=12, decimal_places=3)
     rate = models.DecimalField(max_digits=14, decimal_places=2)
     amount = models.DecimalField(max_digits=14, decimal_places=2)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, null=True, blank=True)  # stock is reserved and delivered from here
+    delivered_qty = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    invoiced_qty = models.DecimalField(max_digits=12, decimal_places=3, default=0)
+    reserved_qty = models.DecimalField(max_digits=12, decimal_places=3, default=0)  # Stock still held for this line
 
     def __str__(self):
         return f"{self.quantity} x {self.item.name} in {self.sales_order.order_number}"
@@ -79,10 +88,14 @@ class Quotation(models.Model):
     quotation_number = models.CharField(max_length=100, unique=True)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
     sales_person = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True, blank=True)
-    quotation_date = models.DateField(default=timezone.now)
+    quotation_date = models.DateField(default=timezone.localdate)
     valid_until = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=30, choices=QUOTATION_STATUS_CHOICES, default='DRAFT')
     total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)
+    # Computed from the items: net_amount is their sum, tax_amount applies tax_template, total_amount is both
+    tax_template = models.ForeignKey(TaxTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     remarks = models.TextField(blank=True, null=True)
 
     def __str__(self):
@@ -111,10 +124,14 @@ class SalesInvoice(models.Model):
     invoice_number = models.CharField(max_length=100, unique=True)
     sales_order = models.ForeignKey(SalesOrder, on_delete=models.SET_NULL, null=True, blank=True)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
-    invoice_date = models.DateField(default=timezone.now)
+    invoice_date = models.DateField(default=timezone.localdate)
     due_date = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=30, choices=INVOICE_STATUS_CHOICES, default='DRAFT')
     total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)
+    # Computed from the items: net_amount is their sum, tax_amount applies tax_template, total_amount is both
+    tax_template = models.ForeignKey(TaxTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
     remarks = models.TextField(blank=True, null=True)
 
     def __str__(self):
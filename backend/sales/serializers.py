@@ -1,10 +1,15 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
 from rest_framework import serializers
-from rest_framework import serializers
+from inventory.models import Item, Warehouse
 from .models import (
     SalesPartner, ProductBundle, ProductBundleItem,
     SalesOrder, SalesOrderItem, Quotation, QuotationItem,
     SalesInvoice, SalesInvoiceItem, POSProfile, POSSettings, LoyaltyPointEntry
 )
+from .services import document_totals, line_amount
 
 
 
@@ -24,51 +29,224 @@ class ProductBundleSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductBundle
         fields = ['id', 'name', 'description', 'items']
-class SalesOrderItemSerializer(serializers.ModelSerializer):
+class DocumentLineMixin:
+    """
+    Item serializers never take `amount`: it is quantity times rate. Lines
+    can only be added to, changed on or moved between draft documents.
+    """
+    document_field = None
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Quantity must be greater than zero.")
+        return value
+
+    def validate_rate(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Rate cannot be negative.")
+        return value
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        documents = {attrs.get(self.document_field), getattr(self.instance, self.document_field, None)} - {None}
+        if any(document.status != 'DRAFT' for document in documents):
+            raise serializers.ValidationError("Items can only be changed while the document is a draft.")
+        quantity = attrs.get('quantity', getattr(self.instance, 'quantity', None))
+        rate = attrs.get('rate', getattr(self.instance, 'rate', None))
+        if quantity is not None and rate is not None:
+            attrs['amount'] = line_amount(quantity, rate)
+        return attrs
+
+
+class DocumentItemsMixin:
+    """
+    Writable nested `items` for sales documents. Line amounts, tax and
+    header totals are computed here; clients cannot set them. On update the
+    submitted items replace the stored ones: lines with an `id` are updated,
+    lines without one are created and missing lines are deleted, each with a
+    single bulk query, so the item count does not drive the query count.
+    """
+    item_model = None
+    document_field = None
+    references = {'item_id': Item}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if self.instance is not None and self.instance.status != 'DRAFT':
+            if 'tax_template' in attrs and attrs['tax_template'] != self.instance.tax_template:
+                raise serializers.ValidationError({'tax_template': "Tax can only be changed while the document is a draft."})
+            if attrs.get('items') is not None:
+                raise serializers.ValidationError({'items': "Items can only be changed while the document is a draft."})
+        items = attrs.get('items')
+        if items is None:
+            return attrs
+        errors = []
+        for field, model in self.references.items():
+            ids = {item[field] for item in items if item.get(field) is not None}
+            missing = ids - set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            if missing:
+                errors.append(f"Unknown {field.removesuffix('_id')} ID(s): {', '.join(str(pk) for pk in sorted(missing)[:50])}.")
+        if any(item.get('id') is None and not {'item_id', 'quantity', 'rate'} <= set(item) for item in items):
+            errors.append("New items need item, quantity and rate.")
+        line_ids = [item['id'] for item in items if item.get('id') is not None]
+        if len(line_ids) != len(set(line_ids)):
+            errors.append("Each item ID can appear only once.")
+        existing = set(self.instance.items.values_list('pk', flat=True)) if self.instance is not None else set()
+        unknown = set(line_ids) - existing
+        if unknown:
+            errors.append(f"Item ID(s) not on this document: {', '.join(str(pk) for pk in sorted(unknown)[:50])}.")
+        if errors:
+            raise serializers.ValidationError({'items': errors})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        lines = [self.item_model(**item) for item in validated_data.pop('items', [])]
+        document = self.Meta.model.objects.create(
+            **validated_data, **document_totals([line.amount for line in lines], validated_data.get('tax_template')),
+        )
+        for line in lines:
+            setattr(line, self.document_field, document)
+        self.item_model.objects.bulk_create(lines, batch_size=1000)
+        return document
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if items is None:
+            amounts = [instance.items.aggregate(total=Sum('amount'))['total'] or Decimal(0)]
+        else:
+            existing = self.item_model.objects.filter(**{self.document_field: instance}).in_bulk()
+            to_create, to_update, fields = [], [], set()
+            for data in items:
+                line_id = data.pop('id', None)
+                if line_id is None:
+                    to_create.append(self.item_model(**data, **{self.document_field: instance}))
+                    continue
+                line = existing.pop(line_id)
+                for field, value in data.items():
+                    setattr(line, field, value)
+                line.amount = line_amount(line.quantity, line.rate)
+                fields.update(data, ['amount'])
+                to_update.append(line)
+            self.item_model.objects.filter(pk__in=list(existing)).delete()
+            if to_update:
+                self.item_model.objects.bulk_update(to_update, sorted(fields), batch_size=1000)
+            self.item_model.objects.bulk_create(to_create, batch_size=1000)
+            amounts = [line.amount for line in to_update + to_create]
+        for field, value in document_totals(amounts, instance.tax_template).items():
+            setattr(instance, field, value)
+        instance.save()
+        return instance
+
+
+class SalesOrderItemSerializer(DocumentLineMixin, serializers.ModelSerializer):
+    document_field = 'sales_order'
+
     class Meta:
         model = SalesOrderItem
-        fields = ['id', 'sales_order', 'item', 'quantity', 'rate', 'amount']
+        fields = ['id', 'sales_order', 'item', 'quantity', 'rate', 'amount', 'warehouse', 'delivered_qty', 'invoiced_qty', 'reserved_qty']
+        read_only_fields = ['amount', 'delivered_qty', 'invoiced_qty', 'reserved_qty']
+
+
+class SalesOrderLineSerializer(SalesOrderItemSerializer):
+    # Plain IDs, checked in bulk by the order serializer rather than one query per line
+    id = serializers.IntegerField(required=False)
+    item = serializers.IntegerField(source='item_id')
+    warehouse = serializers.IntegerField(source='warehouse_id', required=False, allow_null=True)
 
+    class Meta(SalesOrderItemSerializer.Meta):
+        read_only_fields = ['sales_order', 'amount', 'delivered_qty', 'invoiced_qty', 'reserved_qty']
 
-class SalesOrderSerializer(serializers.ModelSerializer):
-    items = SalesOrderItemSerializer(many=True, read_only=True)
+
+class SalesOrderSerializer(DocumentItemsMixin, serializers.ModelSerializer):
+    items = SalesOrderLineSerializer(many=True, required=False)
+    item_model = SalesOrderItem
+    document_field = 'sales_order'
+    references = {'item_id': Item, 'warehouse_id': Warehouse}
 
     class Meta:
         model = SalesOrder
         fields = [
             'id', 'order_number', 'customer', 'sales_person', 'sales_partner',
-            'order_date', 'delivery_date', 'status', 'total_amount', 'remarks', 'items'
+            'order_date', 'delivery_date', 'status', 'tax_template', 'net_amount', 'tax_amount', 'total_amount',
+            'remarks', 'items'
         ]
-class QuotationItemSerializer(serializers.ModelSerializer):
+        read_only_fields = ['status', 'net_amount', 'tax_amount', 'total_amount']  # Status moves through the submit, deliver and cancel actions
+
+
+class QuotationItemSerializer(DocumentLineMixin, serializers.ModelSerializer):
+    document_field = 'quotation'
+
     class Meta:
         model = QuotationItem
         fields = ['id', 'quotation', 'item', 'quantity', 'rate', 'amount']
+        read_only_fields = ['amount']
+
 
+class QuotationLineSerializer(QuotationItemSerializer):
+    id = serializers.IntegerField(required=False)
+    item = serializers.IntegerField(source='item_id')
 
-class QuotationSerializer(serializers.ModelSerializer):
-    items = QuotationItemSerializer(many=True, read_only=True)
+    class Meta(QuotationItemSerializer.Meta):
+        read_only_fields = ['quotation', 'amount']
+
+
+class QuotationSerializer(DocumentItemsMixin, serializers.ModelSerializer):
+    items = QuotationLineSerializer(many=True, required=False)
+    item_model = QuotationItem
+    document_field = 'quotation'
 
     class Meta:
         model = Quotation
         fields = [
             'id', 'quotation_number', 'customer', 'sales_person',
-            'quotation_date', 'valid_until', 'status', 'total_amount', 'remarks', 'items'
+            'quotation_date', 'valid_until', 'status', 'tax_template', 'net_amount', 'tax_amount', 'total_amount',
+            'remarks', 'items'
         ]
-class SalesInvoiceItemSerializer(serializers.ModelSerializer):
+        read_only_fields = ['net_amount', 'tax_amount', 'total_amount']
+
+
+class SalesInvoiceItemSerializer(DocumentLineMixin, serializers.ModelSerializer):
+    document_field = 'sales_invoice'
+
     class Meta:
         model = SalesInvoiceItem
         fields = ['id', 'sales_invoice', 'item', 'quantity', 'rate', 'amount']
+        read_only_fields = ['amount']
 
 
-class SalesInvoiceSerializer(serializers.ModelSerializer):
-    items = SalesInvoiceItemSerializer(many=True, read_only=True)
+class SalesInvoiceLineSerializer(SalesInvoiceItemSerializer):
+    id = serializers.IntegerField(required=False)
+    item = serializers.IntegerField(source='item_id')
+
+    class Meta(SalesInvoiceItemSerializer.Meta):
+        read_only_fields = ['sales_invoice', 'amount']
+
+
+class SalesInvoiceSerializer(DocumentItemsMixin, serializers.ModelSerializer):
+    items = SalesInvoiceLineSerializer(many=True, required=False)
+    item_model = SalesInvoiceItem
+    document_field = 'sales_invoice'
 
     class Meta:
         model = SalesInvoice
         fields = [
             'id', 'invoice_number', 'sales_order', 'customer',
-            'invoice_date', 'due_date', 'status', 'total_amount', 'remarks', 'items'
+            'invoice_date', 'due_date', 'status', 'tax_template', 'net_amount', 'tax_amount', 'total_amount',
+            'remarks', 'items'
         ]
+        # Order invoices are raised through the sales order invoice action only
+        read_only_fields = ['sales_order', 'net_amount', 'tax_amount', 'total_amount']
+
+    def validate(self, attrs):
+        if self.instance is not None and self.instance.sales_order_id is not None:
+            raise serializers.ValidationError("Invoices raised from a sales order cannot be changed.")
+        return super().validate(attrs)
+
+
 class POSProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = POSProfile
@@ -85,3 +263,23 @@ class LoyaltyPointEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = LoyaltyPointEntry
         fields = ['id', 'customer', 'points', 'entry_date', 'remarks']
+
+
+class SalesOrderSubmitSerializer(serializers.Serializer):
+    warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all(), required=False, help_text="Warehouse for lines that have none")
+
+
+class SalesOrderLineQuantitySerializer(serializers.Serializer):
+    line = serializers.IntegerField(help_text="Sales order item ID")
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=3, min_value=0)
+
+
+class SalesOrderDeliverySerializer(serializers.Serializer):
+    lines = SalesOrderLineQuantitySerializer(many=True, required=False, help_text="Defaults to everything still undelivered")
+
+
+class SalesOrderInvoiceSerializer(serializers.Serializer):
+    lines = SalesOrderLineQuantitySerializer(many=True, required=False, help_text="Defaults to everything delivered but not invoiced")
+    invoice_number = serializers.CharField(max_length=100, required=False, help_text="Defaults to the order number and a sequence")
+    invoice_date = serializers.DateField(required=False, help_text="Defaults to today")
+    due_date = serializers.DateField(required=False)
@@ -0,0 +1,223 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from inventory.services import issue_reserved_stock, release_stock, reserve_stock
+from .models import SalesInvoice, SalesInvoiceItem, SalesOrder, SalesOrderItem
+
+LINE_CHUNK_SIZE = 200  # Order lines per conditional UPDATE
+CENT = Decimal('0.01')
+
+
+def line_amount(quantity, rate):
+    return (quantity * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def document_totals(amounts, tax_template=None):
+    """Header amounts of an order, quotation or invoice from its line amounts and tax template."""
+    net_amount = sum(amounts, Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+    tax_amount = Decimal(0)
+    if tax_template is not None:
+        tax_amount = (net_amount * tax_template.tax_rate / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+    return {'net_amount': net_amount, 'tax_amount': tax_amount, 'total_amount': net_amount + tax_amount}
+
+
+def refresh_document_totals(document):
+    """Recompute a document's header amounts from its stored items with one aggregate and one UPDATE."""
+    net_amount = document.items.aggregate(total=Sum('amount'))['total'] or Decimal(0)
+    totals = document_totals([net_amount], document.tax_template)
+    type(document).objects.filter(pk=document.pk).update(**totals)
+    for field, value in totals.items():
+        setattr(document, field, value)
+    return document
+
+
+def next_invoice_number(order):
+    """Order number plus one more than the highest numeric suffix already used for the order's invoices."""
+    prefix = f"{order.order_number}-"
+    suffixes = [
+        number.removeprefix(prefix)
+        for number in SalesInvoice.objects.filter(invoice_number__startswith=prefix).values_list('invoice_number', flat=True)
+    ]
+    return f"{prefix}{max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=0) + 1}"
+
+
+def _locked_order(order):
+    return SalesOrder.objects.select_for_update().get(pk=order.pk)
+
+
+def _require_status(order, statuses, action):
+    if order.status not in statuses:
+        raise ValidationError(f"Only {' or '.join(status.lower().replace('_', ' ') for status in statuses)} sales orders can be {action} (current status: {order.status}).")
+
+
+def _add_to_lines(field, quantities, from_reserved=False):
+    """
+    Add `quantities` ({line_id: qty}) to `field` of order lines with one
+    conditional UPDATE per chunk, matching only lines where the result stays
+    within the ordered quantity. With `from_reserved` the same quantities are
+    taken off the lines' reserved_qty, which must cover them. Returns the
+    number of lines updated.
+    """
+    items = list(quantities.items())
+    updated = 0
+    for offset in range(0, len(items), LINE_CHUNK_SIZE):
+        chunk = items[offset:offset + LINE_CHUNK_SIZE]
+        match = Q()
+        for line_id, qty in chunk:
+            match |= Q(pk=line_id, **{f"{field}__lte": F('quantity') - qty}) & (Q(reserved_qty__gte=qty) if from_reserved else Q())
+        case = Case(
+            *(When(pk=line_id, then=Value(qty)) for line_id, qty in chunk),
+            output_field=DecimalField(max_digits=12, decimal_places=3),
+        )
+        changes = {field: F(field) + case}
+        if from_reserved:
+            changes['reserved_qty'] = F('reserved_qty') - case
+        updated += SalesOrderItem.objects.filter(match).update(**changes)
+    return updated
+
+
+def _line_quantities(lines, quantities, outstanding, label):
+    """
+    Resolve requested {line_id: qty} against the order's `lines`; without a
+    request every line's outstanding quantity is taken. Rejects unknown
+    lines and quantities above what is outstanding.
+    """
+    if quantities is None:
+        quantities = {line_id: outstanding(line) for line_id, line in lines.items()}
+    errors = []
+    resolved = {}
+    for line_id, qty in quantities.items():
+        line = lines.get(line_id)
+        if line is None:
+            errors.append(f"Line {line_id} is not part of this order.")
+        elif qty < 0 or qty > outstanding(line):
+            errors.append(f"Line {line_id}: {qty} exceeds the {outstanding(line)} left to {label}.")
+        elif qty:
+            resolved[line_id] = qty
+    if errors:
+        raise ValidationError(errors)
+    if not resolved:
+        raise ValidationError(f"Nothing left to {label}.")
+    return resolved
+
+
+def _stock_quantities(lines, quantities):
+    """Sum line quantities per (item_id, warehouse_id)."""
+    totals = defaultdict(Decimal)
+    for line_id, qty in quantities.items():
+        line = lines[line_id]
+        totals[(line.item_id, line.warehouse_id)] += qty
+    return totals
+
+
+@transaction.atomic
+def submit_sales_order(order, warehouse=None):
+    """
+    Submit a draft sales order and reserve stock for all its lines. Lines
+    without a warehouse take `warehouse`. Reservations are made with
+    conditional bulk UPDATEs on StockBalance, so concurrent submissions
+    can never reserve more than is on hand; a shortage rejects the order.
+    """
+    order = _locked_order(order)
+    _require_status(order, ('DRAFT',), 'submitted')
+    if warehouse is not None:
+        order.items.filter(warehouse__isnull=True).update(warehouse=warehouse)
+    lines = {line.pk: line for line in SalesOrderItem.objects.filter(sales_order=order).only('id', 'item_id', 'warehouse_id', 'quantity')}
+    if not lines:
+        raise ValidationError("Sales order has no items.")
+    missing = sorted(line_id for line_id, line in lines.items() if line.warehouse_id is None)
+    if missing:
+        raise ValidationError(f"Set a warehouse on line(s) {', '.join(str(line_id) for line_id in missing)} or pass one to submit with.")
+
+    reserve_stock(_stock_quantities(lines, {line_id: line.quantity for line_id, line in lines.items()}))
+    # Each line records what it holds, so deliveries and cancellation release exactly that
+    SalesOrderItem.objects.filter(sales_order=order).update(reserved_qty=F('quantity'))
+    order.status = 'SUBMITTED'
+    order.save(update_fields=['status'])
+    return order
+
+
+@transaction.atomic
+def deliver_sales_order(order, quantities=None):
+    """
+    Deliver `quantities` ({line_id: qty}, by default everything still
+    undelivered) of a submitted order: delivered_qty on the lines and the
+    reserved stock are moved with conditional bulk UPDATEs and the stock
+    ledger is written. The order becomes partially delivered or delivered.
+    """
+    order = _locked_order(order)
+    _require_status(order, ('SUBMITTED', 'PARTIALLY_DELIVERED'), 'delivered')
+    lines = {line.pk: line for line in SalesOrderItem.objects.filter(sales_order=order).only('id', 'item_id', 'warehouse_id', 'quantity', 'delivered_qty')}
+    quantities = _line_quantities(lines, quantities, lambda line: line.quantity - line.delivered_qty, 'deliver')
+
+    if _add_to_lines('delivered_qty', quantities, from_reserved=True) != len(quantities):
+        raise ValidationError("Delivered or reserved quantities changed concurrently; reload the order and try again.")
+    issue_reserved_stock(
+        _stock_quantities(lines, quantities), reference_doc=order.order_number,
+        remarks=f"Delivery against sales order {order.order_number}",
+    )
+
+    undelivered = order.items.filter(delivered_qty__lt=F('quantity')).exists()
+    order.status = 'PARTIALLY_DELIVERED' if undelivered else 'DELIVERED'
+    order.save(update_fields=['status'])
+    return order
+
+
+@transaction.atomic
+def invoice_sales_order(order, quantities=None, invoice_number=None, invoice_date=None, due_date=None):
+    """
+    Raise a sales invoice for `quantities` ({line_id: qty}) of a submitted
+    order, by default everything delivered but not yet invoiced. Lines may
+    be billed up to their ordered quantity. invoiced_qty is moved with a
+    conditional bulk UPDATE and the invoice lines are bulk created. The
+    invoice is created submitted, so it cannot be edited or deleted behind
+    the order's back.
+    """
+    order = _locked_order(order)
+    _require_status(order, ('SUBMITTED', 'PARTIALLY_DELIVERED', 'DELIVERED'), 'invoiced')
+    lines = {line.pk: line for line in SalesOrderItem.objects.filter(sales_order=order).only('id', 'item_id', 'quantity', 'rate', 'delivered_qty', 'invoiced_qty')}
+    if quantities is None:
+        quantities = {line_id: line.delivered_qty - line.invoiced_qty for line_id, line in lines.items() if line.delivered_qty > line.invoiced_qty}
+    quantities = _line_quantities(lines, quantities, lambda line: line.quantity - line.invoiced_qty, 'invoice')
+
+    if _add_to_lines('invoiced_qty', quantities) != len(quantities):
+        raise ValidationError("Invoiced quantities changed concurrently; reload the order and try again.")
+
+    invoice_items = [
+        SalesInvoiceItem(item_id=lines[line_id].item_id, quantity=qty, rate=lines[line_id].rate, amount=line_amount(qty, lines[line_id].rate))
+        for line_id, qty in quantities.items()
+    ]
+    if invoice_number is None:
+        invoice_number = next_invoice_number(order)
+    try:
+        with transaction.atomic():
+            invoice = SalesInvoice.objects.create(
+                invoice_number=invoice_number, sales_order=order, customer_id=order.customer_id, status='SUBMITTED',
+                invoice_date=invoice_date or timezone.localdate(), due_date=due_date, tax_template_id=order.tax_template_id,
+                **document_totals([item.amount for item in invoice_items], order.tax_template),
+            )
+    except IntegrityError:
+        raise ValidationError(f"Invoice number {invoice_number} is already in use.")
+    for item in invoice_items:
+        item.sales_invoice = invoice
+    SalesInvoiceItem.objects.bulk_create(invoice_items, batch_size=1000)
+    return invoice
+
+
+@transaction.atomic
+def cancel_sales_order(order):
+    """Cancel a draft or submitted order, releasing the stock its lines still hold."""
+    order = _locked_order(order)
+    _require_status(order, ('DRAFT', 'SUBMITTED', 'PARTIALLY_DELIVERED'), 'cancelled')
+    if order.status != 'DRAFT':
+        lines = {line.pk: line for line in SalesOrderItem.objects.filter(sales_order=order, reserved_qty__gt=0).only('id', 'item_id', 'warehouse_id', 'reserved_qty')}
+        release_stock(_stock_quantities(lines, {line_id: line.reserved_qty for line_id, line in lines.items()}))
+        SalesOrderItem.objects.filter(pk__in=list(lines)).update(reserved_qty=0)
+    order.status = 'CANCELLED'
+    order.save(update_fields=['status'])
+    return order
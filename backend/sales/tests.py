@@ -1,3 +1,223 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounting.models import TaxCategory, TaxTemplate
+from crm.models import Customer
+from inventory.models import Item, StockBalance, StockLedgerEntry, Warehouse
+from inventory.services import apply_balance_deltas, issue_reserved_stock, release_stock, reserve_stock
+from .models import SalesOrder, SalesOrderItem
+from .services import cancel_sales_order, deliver_sales_order, invoice_sales_order, submit_sales_order
+
+
+class SalesTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = Customer.objects.create(name='Customer')
+        self.warehouse = Warehouse.objects.create(code='MAIN', name='Main')
+        self.items = [Item.objects.create(sku=f'SKU{index}', name=f'Item {index}') for index in range(3)]
+        StockBalance.objects.bulk_create([StockBalance(item=item, warehouse=self.warehouse, quantity=100) for item in self.items])
+        self.tax_template = TaxTemplate.objects.create(
+            name='VAT', tax_rate=Decimal('7.5'), tax_category=TaxCategory.objects.create(name='Sales tax'),
+        )
+
+    def create_order(self, **extra):
+        payload = {
+            'order_number': 'SO-1', 'customer': self.customer.pk, 'tax_template': self.tax_template.pk,
+            'items': [
+                {'item': item.pk, 'quantity': '3', 'rate': '1.35', 'warehouse': self.warehouse.pk, 'amount': '999'}
+                for item in self.items
+            ],
+            **extra,
+        }
+        response = self.client.post('/api/v1/sales/sales-orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['data']
+
+
+class DocumentTotalsTests(SalesTestCase):
+    def test_create_computes_line_and_header_amounts(self):
+        order = self.create_order(total_amount='1')
+        self.assertEqual([line['amount'] for line in order['items']], ['4.05'] * 3)
+        self.assertEqual((order['net_amount'], order['tax_amount'], order['total_amount']), ('12.15', '0.91', '13.06'))
+
+    def test_update_diffs_items(self):
+        order = self.create_order()
+        kept, _, _ = order['items']
+        response = self.client.patch(f"/api/v1/sales/sales-orders/{order['id']}/", {'items': [
+            {'id': kept['id'], 'quantity': '2'},
+            {'item': self.items[0].pk, 'quantity': '1', 'rate': '10', 'warehouse': self.warehouse.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        self.assertEqual(sorted(line['amount'] for line in data['items']), ['10.00', '2.70'])
+        self.assertEqual(data['net_amount'], '12.70')
+        self.assertEqual(SalesOrderItem.objects.filter(sales_order_id=order['id']).count(), 2)
+        self.assertTrue(SalesOrderItem.objects.filter(pk=kept['id'], quantity=2).exists())
+
+    def test_unknown_items_are_rejected(self):
+        order = self.create_order()
+        response = self.client.patch(f"/api/v1/sales/sales-orders/{order['id']}/", {'items': [
+            {'id': 999999, 'quantity': '1'}, {'item': 424242, 'quantity': '1', 'rate': '1'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SalesOrderItem.objects.filter(sales_order_id=order['id']).count(), 3)
+
+    def test_standalone_item_writes_refresh_totals(self):
+        order = self.create_order()
+        line = order['items'][0]
+        response = self.client.patch(f"/api/v1/sales/sales-order-items/{line['id']}/", {'quantity': '5'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(SalesOrder.objects.get(pk=order['id']).net_amount, Decimal('14.85'))
+
+    def test_quantities_must_be_positive_and_rates_not_negative(self):
+        for line in ({'quantity': '-5', 'rate': '2'}, {'quantity': '0', 'rate': '2'}, {'quantity': '1', 'rate': '-1'}):
+            response = self.client.post('/api/v1/sales/sales-orders/', {
+                'order_number': 'SO-BAD', 'customer': self.customer.pk,
+                'items': [{'item': self.items[0].pk, 'warehouse': self.warehouse.pk, **line}],
+            }, format='json')
+            self.assertEqual(response.status_code, 400, response.content)
+        self.assertFalse(SalesOrder.objects.filter(order_number='SO-BAD').exists())
+        line = self.create_order()['items'][0]
+        response = self.client.patch(f"/api/v1/sales/sales-order-items/{line['id']}/", {'quantity': '-1'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+
+
+class SubmittedOrderLineTests(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order()
+        submit_sales_order(SalesOrder.objects.get(pk=self.order['id']))
+        self.line = self.order['items'][0]
+
+    def test_nested_items_are_locked(self):
+        response = self.client.patch(f"/api/v1/sales/sales-orders/{self.order['id']}/", {'items': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_tax_is_locked(self):
+        response = self.client.patch(f"/api/v1/sales/sales-orders/{self.order['id']}/", {'tax_template': None}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(SalesOrder.objects.get(pk=self.order['id']).tax_amount, Decimal('0.91'))
+        response = self.client.patch(f"/api/v1/sales/sales-orders/{self.order['id']}/", {'remarks': 'Rush'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_standalone_item_update_is_rejected(self):
+        response = self.client.patch(f"/api/v1/sales/sales-order-items/{self.line['id']}/", {'quantity': '50'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SalesOrderItem.objects.get(pk=self.line['id']).quantity, Decimal('3'))
+
+    def test_standalone_item_create_and_delete_are_rejected(self):
+        response = self.client.post('/api/v1/sales/sales-order-items/', {
+            'sales_order': self.order['id'], 'item': self.items[0].pk, 'quantity': '1', 'rate': '1',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.delete(f"/api/v1/sales/sales-order-items/{self.line['id']}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SalesOrderItem.objects.filter(sales_order_id=self.order['id']).count(), 3)
+
+
+class StockReservationTests(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.key = (self.items[0].pk, self.warehouse.pk)
+
+    def balance(self):
+        return StockBalance.objects.get(item=self.items[0], warehouse=self.warehouse)
+
+    def test_reserved_stock_cannot_be_issued_elsewhere(self):
+        reserve_stock({self.key: Decimal('95')})
+        with self.assertRaises(ValidationError):
+            apply_balance_deltas({self.key: Decimal('-10')})
+        apply_balance_deltas({self.key: Decimal('-5')})
+        self.assertEqual(self.balance().quantity, Decimal('95'))
+
+    def test_reservations_never_exceed_stock(self):
+        reserve_stock({self.key: Decimal('60')})
+        with self.assertRaises(ValidationError):
+            reserve_stock({self.key: Decimal('60')})
+        self.assertEqual(self.balance().reserved_quantity, Decimal('60'))
+
+    def test_issue_and_release_reserved_stock(self):
+        reserve_stock({self.key: Decimal('30')})
+        issue_reserved_stock({self.key: Decimal('20')}, reference_doc='SO-1')
+        balance = self.balance()
+        self.assertEqual((balance.quantity, balance.reserved_quantity), (Decimal('80'), Decimal('10')))
+        self.assertEqual(StockLedgerEntry.objects.get(reference_doc='SO-1').quantity, Decimal('-20'))
+
+        with self.assertRaises(ValidationError):
+            issue_reserved_stock({self.key: Decimal('20')}, reference_doc='SO-1')
+        release_stock({self.key: Decimal('25')})
+        self.assertEqual(self.balance().reserved_quantity, Decimal('0'))
+
+
+class OrderPipelineTests(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = SalesOrder.objects.get(pk=self.create_order()['id'])
+        self.lines = list(self.order.items.order_by('pk'))
+
+    def balance(self, item):
+        return StockBalance.objects.get(item=item, warehouse=self.warehouse)
+
+    def test_submit_reserves_stock_per_line(self):
+        submit_sales_order(self.order)
+        self.assertEqual(self.balance(self.items[0]).reserved_quantity, Decimal('3'))
+        self.assertEqual(set(self.order.items.values_list('reserved_qty', flat=True)), {Decimal('3')})
+
+    def test_submit_cannot_oversell(self):
+        StockBalance.objects.filter(item=self.items[2]).update(reserved_quantity=99)
+        with self.assertRaises(ValidationError):
+            submit_sales_order(self.order)
+        self.assertEqual(self.balance(self.items[0]).reserved_quantity, 0)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'DRAFT')
+
+    def test_delivery_issues_reserved_stock(self):
+        submit_sales_order(self.order)
+        deliver_sales_order(self.order, {self.lines[0].pk: Decimal('2')})
+        balance = self.balance(self.items[0])
+        self.assertEqual((balance.quantity, balance.reserved_quantity), (Decimal('98'), Decimal('1')))
+        self.assertEqual(StockLedgerEntry.objects.get(item=self.items[0]).quantity, Decimal('-2'))
+        self.lines[0].refresh_from_db()
+        self.assertEqual((self.lines[0].delivered_qty, self.lines[0].reserved_qty), (Decimal('2'), Decimal('1')))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'PARTIALLY_DELIVERED')
+
+    def test_cancel_releases_what_each_line_holds(self):
+        submit_sales_order(self.order)
+        deliver_sales_order(self.order, {self.lines[0].pk: Decimal('2')})
+        # A line quantity changed behind the order's back must not change what is released
+        SalesOrderItem.objects.filter(pk=self.lines[1].pk).update(quantity=50)
+        cancel_sales_order(self.order)
+        self.assertEqual([self.balance(item).reserved_quantity for item in self.items], [0, 0, 0])
+        self.assertFalse(self.order.items.filter(reserved_qty__gt=0).exists())
+
+    def test_invoice_bills_delivered_quantities_with_tax(self):
+        submit_sales_order(self.order)
+        deliver_sales_order(self.order)
+        invoice = invoice_sales_order(self.order)
+        self.assertEqual((invoice.net_amount, invoice.tax_amount, invoice.total_amount), (Decimal('12.15'), Decimal('0.91'), Decimal('13.06')))
+        with self.assertRaises(ValidationError):
+            invoice_sales_order(self.order)
+
+    def test_order_invoices_are_locked_and_numbered_after_the_highest_suffix(self):
+        submit_sales_order(self.order)
+        deliver_sales_order(self.order)
+        first = invoice_sales_order(self.order, {self.lines[0].pk: Decimal('1')}, invoice_number='SO-1-7')
+        self.assertEqual(first.status, 'SUBMITTED')
+        self.assertEqual(invoice_sales_order(self.order, {self.lines[0].pk: Decimal('1')}).invoice_number, 'SO-1-8')
+        with self.assertRaises(ValidationError):
+            invoice_sales_order(self.order, {self.lines[0].pk: Decimal('1')}, invoice_number='SO-1-8')
+        self.lines[0].refresh_from_db()
+        self.assertEqual(self.lines[0].invoiced_qty, Decimal('2'))
 
-# Create your tests here.
+        response = self.client.delete(f"/api/v1/sales/sales-invoices/{first.pk}/")
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.patch(f"/api/v1/sales/sales-invoices/{first.pk}/", {'status': 'DRAFT'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.delete(f"/api/v1/sales/sales-invoice-items/{first.items.get().pk}/")
+        self.assertEqual(response.status_code, 400, response.content)
+        response = self.client.post(f"/api/v1/sales/sales-orders/{self.order.pk}/invoice/", {'invoice_number': 'SO-1-8'}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
@@ -1,4 +1,5 @@
-from rest_framework import viewsets, status, pagination
+from django.core.exceptions import ValidationError
+from rest_framework import viewsets, status, pagination, decorators, exceptions
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from .models import (
     SalesPartner,
@@ -17,13 +18,16 @@ from .serializers import (
     SalesOrderSerializer, SalesOrderItemSerializer,
     QuotationSerializer, QuotationItemSerializer,
     SalesInvoiceSerializer, SalesInvoiceItemSerializer,
-    POSProfileSerializer, POSSettingsSerializer, LoyaltyPointEntrySerializer
+    POSProfileSerializer, POSSettingsSerializer, LoyaltyPointEntrySerializer,
+    SalesOrderSubmitSerializer, SalesOrderDeliverySerializer, SalesOrderInvoiceSerializer
 )
+from .services import submit_sales_order, deliver_sales_order, invoice_sales_order, cancel_sales_order, refresh_document_totals
 
 from crm.serializers import CustomerGroupSerializer, CustomerSerializer, ContactSerializer, AddressSerializer, SalesPersonSerializer
 from inventory.serializers import ItemGroupSerializer, ItemSerializer
 
 from backend.utils.response import Response
+from backend.utils.tree import filter_by_tree
 from drf_spectacular.openapi import AutoSchema
 
 class CustomSchema(AutoSchema):
@@ -74,7 +78,7 @@ class CustomResponseModelViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
-        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+        return Response(data=serializer.data, code=status.HTTP_201_CREATED)
 
     @extend_schema(
         summary="Update an object",
@@ -104,7 +108,31 @@ class CustomResponseModelViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(code=status.HTTP_204_NO_CONTENT)
+
+
+class DocumentItemViewSet(CustomResponseModelViewSet):
+    """Item endpoints of a sales document; every write refreshes the document's totals."""
+    document_field = None
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        refresh_document_totals(getattr(serializer.instance, self.document_field))
+
+    def perform_update(self, serializer):
+        previous = getattr(serializer.instance, self.document_field)
+        super().perform_update(serializer)
+        document = getattr(serializer.instance, self.document_field)
+        refresh_document_totals(document)
+        if previous.pk != document.pk:
+            refresh_document_totals(previous)
+
+    def perform_destroy(self, instance):
+        document = getattr(instance, self.document_field)
+        if document.status != 'DRAFT':
+            raise exceptions.ValidationError("Items can only be removed while the document is a draft.")
+        super().perform_destroy(instance)
+        refresh_document_totals(document)
 
 
 # Now individual ViewSets for each model
@@ -144,11 +172,17 @@ class ItemGroupViewSet(CustomResponseModelViewSet):
     queryset = ItemGroup.objects.all()
     serializer_class = ItemGroupSerializer
 
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, '', ItemGroup, '')
+
 @extend_schema(summary="Manage Items", description="CRUD operations for Items", tags=["Sales"])
 class ItemViewSet(CustomResponseModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
 
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item_group')
+
 @extend_schema(summary="Manage Product Bundles", description="CRUD operations for Product Bundles", tags=["Sales"])
 class ProductBundleViewSet(CustomResponseModelViewSet):
     queryset = ProductBundle.objects.all()
@@ -159,10 +193,85 @@ class SalesOrderViewSet(CustomResponseModelViewSet):
     queryset = SalesOrder.objects.all()
     serializer_class = SalesOrderSerializer
 
+    def _line_quantities(self, data):
+        if 'lines' not in data:
+            return None
+        return {line['line']: line['quantity'] for line in data['lines']}
+
+    @extend_schema(
+        summary="Submit a sales order",
+        description="Submits a draft order and reserves stock for every line in its warehouse. Fails without reserving anything if any line is short of unreserved stock.",
+        request=SalesOrderSubmitSerializer,
+        responses=SalesOrderSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='submit')
+    def submit(self, request, pk=None):
+        serializer = SalesOrderSubmitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = submit_sales_order(self.get_object(), warehouse=serializer.validated_data.get('warehouse'))
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=self.get_serializer(order).data, message="Sales order submitted")
+
+    @extend_schema(
+        summary="Deliver a sales order",
+        description="Ships some or all undelivered quantities from the stock reserved for the order and records them on its lines.",
+        request=SalesOrderDeliverySerializer,
+        responses=SalesOrderSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='deliver')
+    def deliver(self, request, pk=None):
+        serializer = SalesOrderDeliverySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = deliver_sales_order(self.get_object(), self._line_quantities(serializer.validated_data))
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=self.get_serializer(order).data, message="Sales order delivered")
+
+    @extend_schema(
+        summary="Invoice a sales order",
+        description="Raises a sales invoice for some or all of the order's delivered but uninvoiced quantities and records them on its lines.",
+        request=SalesOrderInvoiceSerializer,
+        responses=SalesInvoiceSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='invoice')
+    def invoice(self, request, pk=None):
+        serializer = SalesOrderInvoiceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            invoice = invoice_sales_order(
+                self.get_object(), self._line_quantities(data), invoice_number=data.get('invoice_number'),
+                invoice_date=data.get('invoice_date'), due_date=data.get('due_date'),
+            )
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=SalesInvoiceSerializer(invoice).data, message="Sales invoice created", code=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary="Cancel a sales order",
+        description="Cancels a draft or submitted order and releases the stock reserved for its undelivered quantities.",
+        request=None,
+        responses=SalesOrderSerializer
+    )
+    @decorators.action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request, pk=None):
+        try:
+            order = cancel_sales_order(self.get_object())
+        except ValidationError as exc:
+            return Response(success=False, message=' '.join(exc.messages), code=status.HTTP_400_BAD_REQUEST)
+        return Response(data=self.get_serializer(order).data, message="Sales order cancelled")
+
 @extend_schema(summary="Manage Sales Order Items", description="CRUD operations for Sales Order Items", tags=["Sales"])
-class SalesOrderItemViewSet(CustomResponseModelViewSet):
+class SalesOrderItemViewSet(DocumentItemViewSet):
     queryset = SalesOrderItem.objects.all()
     serializer_class = SalesOrderItemSerializer
+    document_field = 'sales_order'
+
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item__item_group')
 
 @extend_schema(summary="Manage Quotations", description="CRUD operations for Quotations", tags=["Sales"])
 class QuotationViewSet(CustomResponseModelViewSet):
@@ -170,19 +279,32 @@ class QuotationViewSet(CustomResponseModelViewSet):
     serializer_class = QuotationSerializer
 
 @extend_schema(summary="Manage Quotation Items", description="CRUD operations for Quotation Items", tags=["Sales"])
-class QuotationItemViewSet(CustomResponseModelViewSet):
+class QuotationItemViewSet(DocumentItemViewSet):
     queryset = QuotationItem.objects.all()
     serializer_class = QuotationItemSerializer
+    document_field = 'quotation'
+
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item__item_group')
 
 @extend_schema(summary="Manage Sales Invoices", description="CRUD operations for Sales Invoices", tags=["Sales"])
 class SalesInvoiceViewSet(CustomResponseModelViewSet):
     queryset = SalesInvoice.objects.all()
     serializer_class = SalesInvoiceSerializer
 
+    def perform_destroy(self, instance):
+        if instance.sales_order_id is not None or instance.status != 'DRAFT':
+            raise exceptions.ValidationError("Only draft invoices that were not raised from a sales order can be deleted.")
+        super().perform_destroy(instance)
+
 @extend_schema(summary="Manage Sales Invoice Items", description="CRUD operations for Sales Invoice Items", tags=["Sales"])
-class SalesInvoiceItemViewSet(CustomResponseModelViewSet):
+class SalesInvoiceItemViewSet(DocumentItemViewSet):
     queryset = SalesInvoiceItem.objects.all()
     serializer_class = SalesInvoiceItemSerializer
+    document_field = 'sales_invoice'
+
+    def get_queryset(self):
+        return filter_by_tree(super().get_queryset(), self.request.GET, 'item_group', ItemGroup, 'item__item_group')
 
 @extend_schema(summary="Manage POS Profiles", description="CRUD operations for POS Profiles", tags=["Sales"])
 class POSProfileViewSet(CustomResponseModelViewSet):